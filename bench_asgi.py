@@ -0,0 +1,113 @@
+"""
+Concurrent click-to-call requests handled by one worker process while
+Twilio takes --latency seconds to answer (simulated by the fake Twilio
+transports). Compares:
+
+  wsgi sync     a sync gunicorn worker: one request at a time
+  asgi sync     the old DRF view under ASGI: every request holds a thread
+                while it waits
+  asgi async    MakeCallView awaiting Twilio on the event loop
+
+Every call writes a CallRecord, so run it against a scratch database.
+
+    python bench_asgi.py --requests 50 --latency 0.25
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import django
+from asgiref.sync import ThreadSensitiveContext
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import include, path
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from telecommunications.calls import place_call
+from telecommunications.fake import FakeAsyncTwilioHttpClient, FakeTwilioHttpClient
+from telecommunications.records import open_call_record
+from users.tokens import RoleRefreshToken
+
+
+class LegacyMakeCallView(APIView):
+    # The synchronous view MakeCallView replaced, minus its error handling
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        record = open_call_record(request.user, request.data['agent_number'], request.data['customer_number'])
+        call = place_call(record)
+        return Response({'success': True, 'call_sid': call.sid, 'call_id': record.pk})
+
+
+urlpatterns = [
+    path('legacy/call/', LegacyMakeCallView.as_view()),
+    path('', include('medmap_backend.urls')),
+]
+
+TWILIO = {
+    'ROOT_URLCONF': __name__,
+    'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+    'TWILIO_AUTH_TOKEN': 'bench',
+    'TWILIO_PHONE_NUMBER': '+15550000000',
+    'TWILIO_HTTP_CLIENT': 'telecommunications.fake.FakeTwilioHttpClient',
+    'TWILIO_ASYNC_HTTP_CLIENT': 'telecommunications.fake.FakeAsyncTwilioHttpClient',
+}
+BODY = {'agent_number': '+27110000001', 'customer_number': '+27110000002'}
+
+
+def report(name, count, elapsed, statuses):
+    print(f"{name:<11} {count} requests in {elapsed:6.2f}s  {count / elapsed:7.1f} req/s  statuses {sorted(set(statuses))}")
+
+
+def run_wsgi(count, token):
+    client = Client()
+    start = time.perf_counter()
+    statuses = [
+        client.post('/legacy/call/', BODY, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}').status_code
+        for _ in range(count)
+    ]
+    report('wsgi sync', count, time.perf_counter() - start, statuses)
+
+
+async def run_asgi(name, url, count, token):
+    client = AsyncClient()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async def request():
+        # ASGIHandler gives each request its own context; the test client does not
+        async with ThreadSensitiveContext():
+            return await client.post(url, BODY, content_type='application/json', headers=headers)
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[request() for _ in range(count)])
+    report(name, count, time.perf_counter() - start, [response.status_code for response in responses])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.25, help='Seconds Twilio takes to answer')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    logging.disable(logging.WARNING)
+    user = get_user_model().objects.filter(is_active=True).first()
+    if user is None:
+        raise SystemExit('Needs a user in the database')
+    token = RoleRefreshToken.for_user(user).access_token
+    FakeTwilioHttpClient.latency = FakeAsyncTwilioHttpClient.latency = args.latency
+
+    print(f"{args.requests} concurrent calls, Twilio latency {args.latency * 1e3:.0f} ms")
+    with override_settings(**TWILIO):
+        run_wsgi(args.requests, token)
+        asyncio.run(run_asgi('asgi sync', '/legacy/call/', args.requests, token))
+        asyncio.run(run_asgi('asgi async', '/api/telecommunications/call/', args.requests, token))
@@ -0,0 +1,109 @@
+"""
+Queries per request with the old authentication chain (JWT, DRF token,
+session on every view, database-backed sessions) against the current
+per-view profiles. The legacy views are mounted from this module's own
+urlpatterns so both run through the full middleware stack.
+"""
+import logging
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import include, path
+from rest_framework import permissions
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from twilio.request_validator import RequestValidator
+
+from bookings.views import BookingViewSet
+from doctors.models import Doctor
+from medmap_notifications.views import NotificationViewSet
+from telecommunications.views import CallStatusCallbackView
+from users.tokens import RoleRefreshToken
+
+LEGACY_AUTH = [JWTAuthentication, TokenAuthentication, SessionAuthentication]
+LEGACY_SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+AUTH_TOKEN = 'bench-auth-token'
+
+urlpatterns = [
+    path('legacy/taken_slots/', BookingViewSet.as_view(
+        {'get': 'taken_slots'}, authentication_classes=LEGACY_AUTH, permission_classes=[permissions.AllowAny],
+    )),
+    path('legacy/notifications/', NotificationViewSet.as_view({'get': 'list'}, authentication_classes=LEGACY_AUTH)),
+    path('legacy/voice/status/', CallStatusCallbackView.as_view(authentication_classes=LEGACY_AUTH)),
+    path('', include('medmap_backend.urls')),
+]
+
+
+def measure(client, method, url, repeat=200, **extra):
+    getattr(client, method)(url, **extra)  # warm caches
+    # Counted with an execute wrapper: Django clears connection.queries at request start
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        response = getattr(client, method)(url, **extra)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        getattr(client, method)(url, **extra)
+    elapsed = (time.perf_counter() - start) / repeat
+    return response.status_code, len(queries), elapsed
+
+
+def report(name, legacy, current):
+    print(f"{name:<34} legacy {legacy[1]} queries {legacy[2] * 1e3:6.2f} ms ({legacy[0]})"
+          f"   current {current[1]} queries {current[2] * 1e3:6.2f} ms ({current[0]})")
+
+
+def browser_client(session_engine, staff):
+    # A browser that is also logged into the admin sends its session cookie everywhere
+    with override_settings(SESSION_ENGINE=session_engine):
+        client = Client()
+        client.force_login(staff)
+    return client
+
+
+if __name__ == '__main__':
+    setup_test_environment()
+    logging.disable(logging.WARNING)
+    User = get_user_model()
+    staff = User.objects.filter(is_staff=True).first()
+    user = User.objects.filter(is_staff=False).first()
+    doctor = Doctor.objects.first()
+    if not (staff and user and doctor):
+        raise SystemExit('Needs a staff user, a regular user and a doctor in the database')
+
+    with override_settings(ROOT_URLCONF=__name__, TWILIO_AUTH_TOKEN=AUTH_TOKEN, TWILIO_VALIDATE_SIGNATURES=True):
+        slots = f"taken_slots/?doctor={doctor.pk}&date=2026-01-01"
+        with override_settings(SESSION_ENGINE=LEGACY_SESSION_ENGINE):
+            legacy = measure(browser_client(LEGACY_SESSION_ENGINE, staff), 'get', f'/legacy/{slots}')
+        current = measure(browser_client(settings.SESSION_ENGINE, staff), 'get', f'/api/bookings/bookings/{slots}')
+        report('taken_slots (admin cookie present)', legacy, current)
+
+        bearer = {'HTTP_AUTHORIZATION': f'Bearer {RoleRefreshToken.for_user(user).access_token}'}
+        client = Client()
+        report(
+            'notification list (JWT)',
+            measure(client, 'get', '/legacy/notifications/', **bearer),
+            measure(client, 'get', '/api/notifications/notifications/', **bearer),
+        )
+
+        fields = {'CallSid': 'CA' + '0' * 32, 'CallStatus': 'ringing'}
+        legacy_url = '/legacy/voice/status/?job=missing'
+        current_url = '/api/telecommunications/voice/status/?job=missing'
+        validator = RequestValidator(AUTH_TOKEN)
+        signed = {'HTTP_X_TWILIO_SIGNATURE': validator.compute_signature(f"{settings.BACKEND_URL}{current_url}", fields)}
+        report(
+            'Twilio status callback',
+            measure(client, 'post', legacy_url, data=fields),
+            measure(client, 'post', current_url, data=fields, **signed),
+        )
+        forged = client.post(current_url, fields, HTTP_X_TWILIO_SIGNATURE='forged')
+        print(f"forged Twilio signature -> {forged.status_code}")
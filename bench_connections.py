@@ -0,0 +1,99 @@
+"""
+Request latency under worker churn, with and without persistent database
+connections. Each simulated worker is a forked process that serves
+--max-requests requests and exits, as gunicorn does with max_requests, so
+every worker pays for its first connection. Run against the real database
+with DATABASE_URL; SQLite connects too cheaply to show much.
+
+    python bench_connections.py --workers 8 --max-requests 200
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from django.db import close_old_connections, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import include, path
+from rest_framework import permissions
+
+from bookings.views import BookingViewSet
+from core.connections import connection_stats
+from doctors.models import Doctor
+
+urlpatterns = [
+    # taken_slots without its throttle, so the run measures the database and not the limiter
+    path('bench/taken_slots/', BookingViewSet.as_view(
+        {'get': 'taken_slots'}, permission_classes=[permissions.AllowAny], throttle_classes=[],
+    )),
+    path('', include('medmap_backend.urls')),
+]
+
+MODES = {
+    'per-request connections': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'persistent + health checks': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+def worker(mode, url, max_requests, results):
+    connections['default'].settings_dict.update(MODES[mode])
+    opened = connection_stats()['databases']['default']['opened']  # Inherited from the parent
+    client = Client()
+    timings = []
+    with override_settings(ROOT_URLCONF=__name__):
+        for _ in range(max_requests):
+            start = time.perf_counter()
+            response = client.get(url)
+            # The test client skips this request_finished handler; a real server runs it
+            close_old_connections()
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+    results.put((timings, connection_stats()['databases']['default']['opened'] - opened))
+
+
+def run(mode, url, workers, max_requests, concurrency):
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.SimpleQueue()
+    timings = []
+    opened = started = finished = 0
+    start = time.perf_counter()
+    while finished < workers:
+        while started < workers and started - finished < concurrency:
+            ctx.Process(target=worker, args=(mode, url, max_requests, results)).start()
+            started += 1
+        worker_timings, worker_opened = results.get()
+        timings.extend(worker_timings)
+        opened += worker_opened
+        finished += 1
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(timings, n=100)
+    print(f"{mode:<28} p50 {quantiles[49] * 1e3:6.2f} ms  p95 {quantiles[94] * 1e3:6.2f} ms  "
+          f"p99 {quantiles[98] * 1e3:6.2f} ms  {len(timings) / elapsed:7.1f} req/s  {opened} connections")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8, help='Worker lifetimes to simulate')
+    parser.add_argument('--max-requests', type=int, default=200, help='Requests per worker before it is recycled')
+    parser.add_argument('--concurrency', type=int, default=2, help='Workers alive at once')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    logging.disable(logging.WARNING)
+    doctor = Doctor.objects.first()
+    if doctor is None:
+        raise SystemExit('Needs a doctor in the database')
+    url = f'/bench/taken_slots/?doctor={doctor.pk}&date=2026-01-01'
+    print(f"{connections['default'].vendor}: {args.workers} workers x {args.max_requests} requests")
+    connections.close_all()  # Nothing shared across the fork
+    for mode in MODES:
+        run(mode, url, args.workers, args.max_requests, args.concurrency)
@@ -0,0 +1,104 @@
+"""
+Signup and login throughput per password hasher profile. "legacy" replays the
+old signup: create_user, then set_password and a second save.
+Also checks that a login under a new preferred hasher upgrades the stored
+hash without revoking the user's tokens. Everything runs in a rolled-back
+transaction.
+"""
+import os
+import time
+import uuid
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from importlib.util import find_spec
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import transaction
+from django.test import override_settings
+
+from users.serializers import UserSerializer
+from users.tokens import RoleTokenObtainPairSerializer
+
+User = get_user_model()
+PASSWORD = 'correct-horse-battery'
+
+PROFILES = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+REQUIRES = {'argon2': 'argon2', 'bcrypt': 'bcrypt'}
+
+
+def hashers(preferred):
+    return [PROFILES[preferred]] + [hasher for name, hasher in PROFILES.items() if name != preferred]
+
+
+def legacy_signup(data):
+    data = dict(data)
+    password = data.pop('password')
+    user = User.objects.create_user(**data)
+    user.set_password(password)
+    user.save()
+    return user
+
+
+def signup(data):
+    serializer = UserSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def login(email):
+    serializer = RoleTokenObtainPairSerializer(data={'username': email, 'password': PASSWORD})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def rate(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return len(args) / (time.perf_counter() - start)
+
+
+def signup_data():
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    return {'username': email, 'email': email, 'password': PASSWORD, 'is_patient': True}
+
+
+def bench(name, create, repeat):
+    with override_settings(PASSWORD_HASHERS=hashers('pbkdf2' if name == 'legacy' else name)):
+        data = [signup_data() for _ in range(repeat)]
+        signups = rate(create, data)
+        logins = rate(login, [row['email'] for row in data])
+    print(f"{name:<8} signup {signups:8.1f}/s   login {logins:8.1f}/s")
+
+
+def check_rehash():
+    user = User.objects.create_user(username='bench-rehash@example.com', email='bench-rehash@example.com')
+    User.objects.filter(pk=user.pk).update(password=make_password(PASSWORD, hasher='pbkdf2_sha256'))
+    version = User.objects.get(pk=user.pk).token_version
+    with override_settings(PASSWORD_HASHERS=hashers('md5')):
+        login(user.email)
+        user.refresh_from_db()
+        print(f"rehash on login: pbkdf2_sha256 -> {identify_hasher(user.password).algorithm}, "
+              f"token_version {version} -> {user.token_version}")
+
+
+if __name__ == '__main__':
+    with transaction.atomic():
+        bench('legacy', legacy_signup, 10)
+        for name in PROFILES:
+            if name in REQUIRES and find_spec(REQUIRES[name]) is None:
+                print(f"{name:<8} skipped ({REQUIRES[name]} not installed)")
+                continue
+            bench(name, signup, 200 if name == 'md5' else 10)
+        check_rehash()
+        transaction.set_rollback(True)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import timeit
+import urllib.parse
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from payments.services import PayFastService
+
+# Payload from test_signature.py; the signature vectors are checked in payments/tests.py
+GOLDEN_DATA = {
+    'amount': '39.00',
+    'cancel_url': 'https://medmap.co.za/memberships?status=cancelled',
+    'custom_str1': 'membership_47_premium',
+    'email_address': 'kuhlulamadumo@gmail.com',
+    'item_name': 'Premium membership (quarterly)',
+    'merchant_id': '32963323',
+    'merchant_key': '16d8hpaaicfyc',
+    'name_first': 'Kuhlula',
+    'name_last': 'Madumo',
+    'notify_url': 'https://medmap-backend-6t7y.onrender.com/api/payments/notify/',
+    'return_url': 'https://medmap.co.za/memberships?status=success'
+}
+
+
+def reference_signature(data, passphrase=None):
+    # Same algorithm as test_signature.generate_signature, without the print
+    payload = ""
+    for key in sorted(data.keys()):
+        if data[key] is not None and data[key] != "":
+            value = urllib.parse.quote_plus(str(data[key]))
+            payload += f"{key}={value}&"
+    if payload.endswith('&'):
+        payload = payload[:-1]
+    if passphrase:
+        payload += f"&passphrase={urllib.parse.quote_plus(passphrase)}"
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def legacy_form():
+    # The inline assembly previously done in CreateMembershipPaymentView, plus generate_payment_url
+    service = PayFastService()
+    data = {
+        "merchant_id": service.merchant_id,
+        "merchant_key": service.merchant_key,
+        "return_url": GOLDEN_DATA['return_url'],
+        "cancel_url": GOLDEN_DATA['cancel_url'],
+        "notify_url": GOLDEN_DATA['notify_url'],
+        "amount": f"{39.0:.2f}",
+        "item_name": GOLDEN_DATA['item_name'],
+        "custom_str1": GOLDEN_DATA['custom_str1'],
+        "email_address": GOLDEN_DATA['email_address'],
+        "name_first": GOLDEN_DATA['name_first'],
+        "name_last": GOLDEN_DATA['name_last'],
+    }
+    clean_data = {k: v for k, v in data.items() if v is not None and v != ""}
+    clean_data['signature'] = reference_signature(clean_data, service.passphrase)
+    query = "&".join(
+        f"{key}={urllib.parse.quote_plus(str(clean_data[key]))}" for key in sorted(clean_data.keys())
+    )
+    return clean_data, f"{service.base_url}/eng/process?{query}"
+
+
+def builder_form():
+    form = PayFastService().build_payment_form(
+        amount=39.0,
+        item_name=GOLDEN_DATA['item_name'],
+        return_url=GOLDEN_DATA['return_url'],
+        cancel_url=GOLDEN_DATA['cancel_url'],
+        email=GOLDEN_DATA['email_address'],
+        first_name=GOLDEN_DATA['name_first'],
+        last_name=GOLDEN_DATA['name_last'],
+        custom_str1=GOLDEN_DATA['custom_str1'],
+        notify_url=GOLDEN_DATA['notify_url'],
+    )
+    return form.data, form.url
+
+
+if __name__ == '__main__':
+    legacy_data, legacy_url = legacy_form()
+    data, url = builder_form()
+    assert data == legacy_data, "form data differs from legacy assembly"
+    assert url == legacy_url, "payment URL differs from legacy assembly"
+    print("OK   builder output matches legacy form assembly")
+
+    print("--- Benchmark (form data + URL) ---")
+    number = 20000
+    for name, func in (('legacy', legacy_form), ('builder', builder_form)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<8} {seconds / number * 1e6:8.2f} us/form")
@@ -0,0 +1,103 @@
+"""
+How long a web worker takes to serve its first request: started cold, as
+each gunicorn worker was before preload_app, or forked from a master that
+has already loaded the app and gunicorn.conf.py's PRELOAD_IMPORTS.
+
+    python bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+
+TWILIO = {
+    'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+    'TWILIO_AUTH_TOKEN': 'bench',
+    'TWILIO_PHONE_NUMBER': '+15550000000',
+    'TWILIO_HTTP_CLIENT': 'telecommunications.fake.FakeTwilioHttpClient',
+}
+
+
+def load_app():
+    django.setup()
+    from django.urls import get_resolver
+    get_resolver().url_patterns  # Imports every view
+
+
+def first_request():
+    from django.test import Client, override_settings
+    from telecommunications.client import get_twilio_client
+    with override_settings(**TWILIO):
+        get_twilio_client().calls  # Loads the Twilio resources
+    response = Client().get('/api/bookings/bookings/taken_slots/?doctor=1&date=2026-01-01')
+    assert response.status_code == 200, response.status_code
+
+
+def cold_worker():
+    # Child process: everything a worker without preload does
+    start = time.perf_counter()
+    load_app()
+    timings = {'app': time.perf_counter() - start}
+    timings['twilio loaded'] = 'twilio.rest' in sys.modules
+    start = time.perf_counter()
+    first_request()
+    timings['first request'] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+
+def run_cold():
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, '--cold-worker'], check=True, capture_output=True, text=True,
+    ).stdout
+    return time.perf_counter() - start, json.loads(output.splitlines()[-1])
+
+
+def run_forked():
+    read, write = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        first_request()
+        os.write(write, b'.')
+        os._exit(0)
+    os.read(read, 1)
+    elapsed = time.perf_counter() - start
+    os.waitpid(pid, 0)
+    os.close(read)
+    os.close(write)
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cold-worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.cold_worker:
+        cold_worker()
+        raise SystemExit
+
+    cold = [run_cold() for _ in range(args.runs)]
+    timings = cold[-1][1]
+    print(f"cold worker    {statistics.median(elapsed for elapsed, _ in cold) * 1e3:7.1f} ms to first response "
+          f"(loading the app {timings['app'] * 1e3:.0f} ms, "
+          f"first request {timings['first request'] * 1e3:.0f} ms)")
+    print(f"               twilio.rest loaded by the app: {timings['twilio loaded']}")
+
+    # The master: load the app and warm the lazy imports once, then fork
+    load_app()
+    for module in runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))['PRELOAD_IMPORTS']:
+        __import__(module)
+    from django.db import connections
+    connections.close_all()
+    forked = [run_forked() for _ in range(args.runs)]
+    print(f"forked worker  {statistics.median(forked) * 1e3:7.1f} ms to first response")
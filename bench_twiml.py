@@ -0,0 +1,74 @@
+import json
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from django.conf import settings
+from django.test import RequestFactory
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from twilio.twiml.voice_response import Dial, VoiceResponse
+
+from telecommunications.views import ConnectCallView, IncomingCallView
+
+# Form fields Twilio posts to a voice webhook
+TWILIO_PARAMS = {
+    'CallSid': 'CA' + '0' * 32,
+    'AccountSid': 'AC' + '0' * 32,
+    'From': '+27820000000',
+    'To': '+27110000000',
+    'CallStatus': 'ringing',
+    'Direction': 'inbound',
+}
+
+
+class LegacyIncomingCallView(APIView):
+    # IncomingCallView before TwiML caching: rebuilt per call, rendered by DRF
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        response = VoiceResponse()
+        support_number = getattr(settings, 'SUPPORT_PHONE_NUMBER', None)
+        if support_number:
+            response.say("Welcome to MedMap. Connecting you to support.", voice='alice')
+            dial = Dial()
+            dial.number(support_number)
+            response.append(dial)
+        else:
+            response.say("Welcome to MedMap. Our support line is currently unavailable. Please try again later.", voice='alice')
+        return Response(str(response), content_type='application/xml')
+
+
+def burst(view, path, calls):
+    factory = RequestFactory()
+    start = time.perf_counter()
+    for _ in range(calls):
+        response = view(factory.post(path, TWILIO_PARAMS))
+        if hasattr(response, 'render'):
+            response.render()
+    return (time.perf_counter() - start) / calls, response
+
+
+def twiml_body(response):
+    body = response.content.decode()
+    # DRF's JSON renderer wrapped the legacy XML in a JSON string
+    return json.loads(body) if body.startswith('"') else body
+
+
+if __name__ == '__main__':
+    calls = 5000
+    print(f"--- Burst of {calls} inbound calls ---")
+    legacy_cost, legacy_response = burst(LegacyIncomingCallView.as_view(), '/api/telecommunications/voice/incoming/', calls)
+    cached_cost, cached_response = burst(IncomingCallView.as_view(), '/api/telecommunications/voice/incoming/', calls)
+    assert twiml_body(legacy_response) == twiml_body(cached_response), "TwiML differs from legacy view"
+    print(f"legacy   {legacy_cost * 1e6:8.2f} us/call  Content-Type: {legacy_response['Content-Type']}")
+    print(f"cached   {cached_cost * 1e6:8.2f} us/call  Content-Type: {cached_response['Content-Type']}")
+
+    connect_cost, connect_response = burst(ConnectCallView.as_view(), '/api/telecommunications/voice/connect/?customer_number=%2B27820000000', calls)
+    print(f"connect  {connect_cost * 1e6:8.2f} us/call")
+    print(connect_response.content.decode())
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.reminders import REMINDER_WINDOWS, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue 24h and 2h reminders for upcoming confirmed bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep scheduling until interrupted')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between runs when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            for kind in REMINDER_WINDOWS:
+                sent = send_due_reminders(kind, batch_size=options['batch_size'])
+                if sent or not options['loop']:
+                    self.stdout.write(f"Queued {sent} {kind} reminder(s)")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_booking_fee_booking_consultation_fee_and_more'),
+        ('doctors', '0007_alter_doctorschedule_unique_together'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('24h', '24 hours before'), ('2h', '2 hours before')], max_length=10)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'status'], name='bookings_bo_appoint_993292_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookingreminder',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='bookings.booking'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookingreminder',
+            unique_together={('booking', 'kind')},
+        ),
+    ]
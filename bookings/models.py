@@ -25,6 +25,30 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['appointment_date', 'appointment_time', 'status']),
+        ]
 
     def __str__(self):
         return f"Booking {self.id} - {self.user} with {self.doctor}"
+
+
+class BookingReminder(models.Model):
+    """
+    Records that a reminder of a given kind went out for a booking, so the
+    scheduler never sends it twice.
+    """
+    KIND_CHOICES = (
+        ('24h', '24 hours before'),
+        ('2h', '2 hours before'),
+    )
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['booking', 'kind']
+
+    def __str__(self):
+        return f"{self.kind} reminder for booking {self.booking_id}"
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from medmap_notifications.events import BookingReminderDue, dispatch
+from .models import Booking, BookingReminder
+
+# kind -> (send when the appointment starts within this many hours, but not sooner than)
+REMINDER_WINDOWS = {
+    '24h': (timedelta(hours=24), timedelta(hours=2)),
+    '2h': (timedelta(hours=2), timedelta(0)),
+}
+
+
+def starts_between(start, end):
+    """
+    Q matching bookings whose appointment_date/appointment_time fall in
+    (start, end]. Both bounds are local datetimes at most a day apart, so
+    this stays a range scan on the (date, time, status) index.
+    """
+    if start.date() == end.date():
+        return Q(appointment_date=start.date(), appointment_time__gt=start.time(), appointment_time__lte=end.time())
+    return (
+        Q(appointment_date=start.date(), appointment_time__gt=start.time())
+        | Q(appointment_date__gt=start.date(), appointment_date__lt=end.date())
+        | Q(appointment_date=end.date(), appointment_time__lte=end.time())
+    )
+
+
+def due_reminders(kind, now=None):
+    upper, lower = REMINDER_WINDOWS[kind]
+    now = timezone.localtime(now)
+    already_sent = BookingReminder.objects.filter(booking=OuterRef('pk'), kind=kind)
+    return (
+        Booking.objects
+        .filter(starts_between(now + lower, now + upper), status='confirmed')
+        .filter(~Exists(already_sent))
+        .order_by('appointment_date', 'appointment_time')
+    )
+
+
+def send_due_reminders(kind, now=None, batch_size=500):
+    """
+    Create reminder notifications and queue emails (and SMS to verified
+    numbers) for every confirmed booking entering the `kind` window.
+    Reminders already recorded in BookingReminder are skipped, so each run
+    only does new work.
+
+    Overlapping runs don't send twice: each batch of bookings is locked
+    (other runs skip locked rows), then read again, so bookings another run
+    reminded while holding them are left out.
+    """
+    fields = (
+        'pk', 'user_id', 'user__email', 'user__first_name',
+        'doctor__user__last_name', 'appointment_date', 'appointment_time',
+        'user__phone_number', 'user__phone_verified',
+    )
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            booking_ids = list(
+                due_reminders(kind, now).select_for_update(skip_locked=True, of=('self',))
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not booking_ids:
+                break
+            batch = list(due_reminders(kind, now).filter(pk__in=booking_ids).values_list(*fields))
+
+            BookingReminder.objects.bulk_create(
+                [BookingReminder(booking_id=row[0], kind=kind) for row in batch],
+                ignore_conflicts=True,
+            )
+            dispatch(*(
+                BookingReminderDue(
+                    booking_id=booking_id, user_id=user_id, email=email, first_name=first_name,
+                    doctor_last_name=doctor_name, appointment_date=date, appointment_time=time, kind=kind,
+                    phone_number=phone_number if phone_verified else '',
+                )
+                for booking_id, user_id, email, first_name, doctor_name, date, time, phone_number, phone_verified in batch
+            ))
+        total += len(batch)
+    return total
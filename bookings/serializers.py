@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Booking
+from .transitions import TRANSITIONS, can_transition
 from doctors.serializers import DoctorSerializer
 from users.serializers import UserSerializer
 
@@ -15,3 +16,20 @@ class BookingSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['user', 'created_at', 'updated_at']
+
+    def validate_status(self, value):
+        if self.instance and value != self.instance.status and not can_transition(self.instance.status, value):
+            raise serializers.ValidationError(f"Cannot change status from {self.instance.status} to {value}.")
+        return value
+
+
+class BulkTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=list(TRANSITIONS))
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    doctor = serializers.IntegerField(min_value=1, required=False)
+    appointment_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and 'doctor' not in attrs and 'appointment_date' not in attrs:
+            raise serializers.ValidationError("Provide ids, doctor or appointment_date.")
+        return attrs
@@ -1,3 +1,174 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from doctors.models import Doctor
+from medmap_notifications.models import Notification, OutboundEmail
+from . import reminders
+from .models import Booking, BookingReminder
+from .reminders import send_due_reminders, starts_between
+
+URL = '/api/bookings/bookings/bulk_transition/'
+
+
+class BulkTransitionTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        patient = User.objects.create_user(username='patient', password='x', is_patient=True)
+        doctor_user = User.objects.create_user(username='doctor', password='x', is_doctor=True)
+        doctor = Doctor.objects.create(user=doctor_user, speciality='GP', city='Durban', province='KZN')
+        self.booking = Booking.objects.create(
+            user=patient, doctor=doctor,
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9),
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_moves_matching_bookings(self):
+        response = self.client.post(URL, {'status': 'confirmed', 'ids': [self.booking.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'status': 'confirmed', 'updated': 1})
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+
+    def test_invalid_input_is_a_400(self):
+        for data in (
+            {'status': 'archived', 'ids': [self.booking.pk]},
+            {'status': 'confirmed'},
+            {'status': 'confirmed', 'ids': []},
+            {'status': 'confirmed', 'ids': self.booking.pk},
+            {'status': 'confirmed', 'ids': ['one']},
+            {'status': 'confirmed', 'appointment_date': '05/01/2026'},
+            {'status': 'confirmed', 'doctor': 'x'},
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(URL, data, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+
+
+class UpdateTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        patient = User.objects.create_user(username='patient', password='x', is_patient=True)
+        doctor_user = User.objects.create_user(username='doctor', password='x', is_doctor=True)
+        doctor = Doctor.objects.create(user=doctor_user, speciality='GP', city='Durban', province='KZN')
+        self.booking = Booking.objects.create(
+            user=patient, doctor=doctor, notes='Before',
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9),
+        )
+        self.url = f'/api/bookings/bookings/{self.booking.pk}/'
+        self.client.force_authenticate(staff)
+
+    def test_status_change_goes_through_the_state_machine(self):
+        response = self.client.patch(self.url, {'status': 'confirmed', 'notes': 'After'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.notes), ('confirmed', 'After'))
+
+    def test_invalid_status_change_is_a_400(self):
+        response = self.client.patch(self.url, {'status': 'completed', 'notes': 'After'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.data)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.notes), ('pending', 'Before'))
+
+    def test_concurrent_status_change_rolls_back_the_update(self):
+        # Another request cancels the booking after this one validated
+        with mock.patch('bookings.transitions.bulk_transition', return_value=0):
+            response = self.client.patch(self.url, {'status': 'confirmed', 'notes': 'After'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.data)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.notes, 'Before')
+
+
+class ReminderTests(TestCase):
+    # 2026-01-05 10:00 in Africa/Johannesburg
+    NOW = timezone.make_aware(datetime.datetime(2026, 1, 5, 10))
+
+    def setUp(self):
+        User = get_user_model()
+        self.patient = User.objects.create_user(
+            username='patient', email='patient@example.com', password='x', first_name='Pat', is_patient=True,
+        )
+        doctor_user = User.objects.create_user(username='doctor', password='x', last_name='Khumalo', is_doctor=True)
+        self.doctor = Doctor.objects.create(user=doctor_user, speciality='GP', city='Durban', province='KZN')
+
+    def book(self, date, time, status='confirmed'):
+        return Booking.objects.create(
+            user=self.patient, doctor=self.doctor, status=status, appointment_date=date, appointment_time=time,
+        )
+
+    def reminders(self):
+        return Notification.objects.filter(type='booking_reminder')
+
+    def test_starts_between(self):
+        day, next_day = datetime.date(2026, 1, 5), datetime.date(2026, 1, 6)
+        bookings = {
+            'before': self.book(day, datetime.time(10)),
+            'same_day': self.book(day, datetime.time(23, 30)),
+            'after_midnight': self.book(next_day, datetime.time(9)),
+            'at_end': self.book(next_day, datetime.time(10)),
+            'after': self.book(next_day, datetime.time(10, 30)),
+        }
+        start, end = timezone.localtime(self.NOW), timezone.localtime(self.NOW) + datetime.timedelta(hours=24)
+        same_day_end = start.replace(hour=23, minute=59)
+        self.assertEqual(
+            set(Booking.objects.filter(starts_between(start, end)).values_list('pk', flat=True)),
+            {bookings[name].pk for name in ('same_day', 'after_midnight', 'at_end')},
+        )
+        self.assertEqual(
+            list(Booking.objects.filter(starts_between(start, same_day_end)).values_list('pk', flat=True)),
+            [bookings['same_day'].pk],
+        )
+
+    def test_windows(self):
+        in_20h = self.book(datetime.date(2026, 1, 6), datetime.time(6))
+        in_1h = self.book(datetime.date(2026, 1, 5), datetime.time(11))
+        self.book(datetime.date(2026, 1, 5), datetime.time(12), status='pending')
+        self.book(datetime.date(2026, 1, 7), datetime.time(9))  # More than 24h away
+
+        self.assertEqual(send_due_reminders('24h', now=self.NOW), 1)
+        self.assertEqual(send_due_reminders('2h', now=self.NOW), 1)
+        self.assertEqual(
+            set(BookingReminder.objects.values_list('booking_id', 'kind')), {(in_20h.pk, '24h'), (in_1h.pk, '2h')},
+        )
+        self.assertEqual(self.reminders().count(), 2)
+        self.assertEqual(OutboundEmail.objects.filter(subject='Appointment Reminder').count(), 2)
+
+    def test_reminders_are_sent_once(self):
+        self.book(datetime.date(2026, 1, 6), datetime.time(6))
+        self.assertEqual(send_due_reminders('24h', now=self.NOW), 1)
+        self.assertEqual(send_due_reminders('24h', now=self.NOW + datetime.timedelta(hours=1)), 0)
+        self.assertEqual(self.reminders().count(), 1)
+
+    def test_booking_reminded_by_another_run_is_not_sent_again(self):
+        booking = self.book(datetime.date(2026, 1, 6), datetime.time(6))
+        due = reminders.due_reminders
+
+        def due_then_other_run(kind, now=None):
+            # Another run reminds the booking just after this run picked it
+            if not BookingReminder.objects.exists():
+                BookingReminder.objects.create(booking=booking, kind=kind)
+                return Booking.objects.filter(pk=booking.pk)
+            return due(kind, now)
+
+        with mock.patch.object(reminders, 'due_reminders', side_effect=due_then_other_run):
+            self.assertEqual(send_due_reminders('24h', now=self.NOW), 0)
+        self.assertEqual(self.reminders().count(), 0)
 
-# Create your tests here.
+    def test_command(self):
+        self.book(datetime.date(2026, 1, 6), datetime.time(6))
+        out = StringIO()
+        with mock.patch('django.utils.timezone.now', return_value=self.NOW):
+            call_command('send_booking_reminders', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['Queued 1 24h reminder(s)', 'Queued 0 2h reminder(s)'])
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.utils import timezone
+
+from medmap_notifications.events import BookingStatusChanged, dispatch
+from medmap_notifications.pubsub import publish_on_commit
+from .models import Booking
+
+# status -> statuses it may move to
+TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('completed', 'cancelled'),
+    'cancelled': (),
+    'completed': (),
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def sources_for(target):
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def bulk_transition(queryset, target, **fields):
+    """
+    Move every booking in `queryset` that may legally reach `target` with a
+    single UPDATE, then insert all resulting notifications in one batch.
+    Bookings in other states are left untouched. Extra `fields` (e.g.
+    payment_status) are written in the same UPDATE. Returns the number of
+    bookings moved.
+    """
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f"Unknown booking status: {target}")
+    sources = sources_for(target)
+    if not sources:
+        return 0
+
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(status__in=sources)
+            .select_for_update(of=('self',))
+            .values_list(
+                'pk', 'user_id', 'doctor__user_id',
+                'appointment_date', 'appointment_time', 'user__phone_number', 'user__phone_verified',
+            )
+        )
+        if not rows:
+            return 0
+        updated = Booking.objects.filter(pk__in=[row[0] for row in rows], status__in=sources).update(
+            status=target, updated_at=timezone.now(), **fields
+        )
+        dispatch(*(
+            BookingStatusChanged(
+                booking_id=pk, user_id=user_id, doctor_user_id=doctor_user_id, status=target,
+                appointment_date=date, appointment_time=time,
+                phone_number=phone_number if phone_verified else '',
+            )
+            for pk, user_id, doctor_user_id, date, time, phone_number, phone_verified in rows
+        ))
+        publish_on_commit(
+            (recipient_id, 'booking', {'id': row[0], 'status': target, **fields})
+            for row in rows
+            for recipient_id in (row[1], row[2])
+        )
+    return updated
+
+
+def transition(booking, target, **fields):
+    """
+    Move a single booking to `target`, raising InvalidTransition if the
+    state machine does not allow it. The instance is updated in place.
+    """
+    if not can_transition(booking.status, target):
+        raise InvalidTransition(f"Cannot move booking from {booking.status} to {target}")
+    if not bulk_transition(Booking.objects.filter(pk=booking.pk), target, **fields):
+        raise InvalidTransition(f"Booking {booking.pk} changed status concurrently")
+    booking.refresh_from_db(fields=['status', 'updated_at', *fields])
+    return booking
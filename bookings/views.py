@@ -1,18 +1,29 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
+from core.authentication import PUBLIC
+from core.replicas import ReplicaReadMixin
+from core.throttling import IPBucketThrottle
 from .models import Booking
-from .serializers import BookingSerializer
+from .serializers import BookingSerializer, BulkTransitionSerializer
+from .transitions import InvalidTransition, bulk_transition, transition
 from decimal import Decimal
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['user', 'doctor', 'status', 'appointment_date']
     ordering_fields = ['created_at', 'appointment_date']
+    # Reads authenticate from token claims (see users.authentication)
+    stateless_auth = True
+    throttle_scopes = {'taken_slots': 'slots'}
+    # Public and unauthenticated, so not pinned: a slot booked moments ago can look free until the replica catches up
+    replica_actions = ('taken_slots',)
 
     def get_queryset(self):
         user = self.request.user
@@ -21,10 +32,11 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         from django.db.models import Q
         return Booking.objects.filter(
-            Q(user=user) | Q(doctor__user=user)
+            Q(user_id=user.pk) | Q(doctor__user_id=user.pk)
         )
 
-    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=['get'], authentication_classes=PUBLIC, permission_classes=[permissions.AllowAny],
+            throttle_classes=[IPBucketThrottle])
     def taken_slots(self, request):
         """
         Publicly accessible endpoint to check availability.
@@ -40,9 +52,50 @@ class BookingViewSet(viewsets.ModelViewSet):
             appointment_date=date
         ).exclude(status='cancelled')
         
-        times = bookings.values_list('appointment_time', flat=True)
+        # Evaluated here, while the view still reads from the replica
+        times = list(bookings.values_list('appointment_time', flat=True))
         return Response({'taken_slots': times}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def bulk_transition(self, request):
+        """
+        Move many bookings to a new status at once, e.g. complete all of
+        today's confirmed bookings or cancel a doctor's bookings on a leave day.
+        Filters: ids, doctor, appointment_date. Staff may act on any booking,
+        doctors only on their own.
+        """
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target = serializer.validated_data['status']
+        ids = serializer.validated_data.get('ids')
+        doctor_id = serializer.validated_data.get('doctor')
+        date = serializer.validated_data.get('appointment_date')
+
+        bookings = Booking.objects.all()
+        if not request.user.is_staff:
+            bookings = bookings.filter(doctor__user_id=request.user.pk)
+        if ids:
+            bookings = bookings.filter(pk__in=ids)
+        if doctor_id:
+            bookings = bookings.filter(doctor_id=doctor_id)
+        if date:
+            bookings = bookings.filter(appointment_date=date)
+
+        updated = bulk_transition(bookings, target)
+        return Response({'status': target, 'updated': updated}, status=status.HTTP_200_OK)
+
+    def perform_update(self, serializer):
+        # Status changes go through the state machine so notifications are batched with the update.
+        # validate_status already checked the move; a concurrent change rolls the other fields back too
+        target = serializer.validated_data.pop('status', None)
+        try:
+            with transaction.atomic():
+                booking = serializer.save()
+                if target and target != booking.status:
+                    transition(booking, target)
+        except InvalidTransition as exc:
+            raise ValidationError({'status': [str(exc)]})
+
     def perform_create(self, serializer):
         doctor = serializer.validated_data.get('doctor')
         booking_fee = Decimal('10.00')
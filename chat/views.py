@@ -9,10 +9,12 @@ from django.db.models import Q
 class ChatSessionViewSet(viewsets.ModelViewSet):
     serializer_class = ChatSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Reads authenticate from token claims (see users.authentication)
+    stateless_auth = True
 
     def get_queryset(self):
         user = self.request.user
-        return ChatSession.objects.filter(Q(patient=user) | Q(doctor=user)).order_by('-updated_at')
+        return ChatSession.objects.filter(Q(patient_id=user.pk) | Q(doctor_id=user.pk)).order_by('-updated_at')
 
     def perform_create(self, serializer):
         # Handle session creation logic
@@ -0,0 +1,71 @@
+"""
+Exercise read-replica routing with two SQLite databases: a copy of the
+scratch database serves as the replica. Prints which alias served each
+request, before and after the user writes (reads stay on the primary while
+the user is pinned).
+
+    DATABASE_URL=sqlite:////tmp/primary.sqlite3 python check_replica.py
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import dj_database_url
+
+primary = dj_database_url.config(default='sqlite:///db.sqlite3')['NAME']
+replica = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+shutil.copyfile(primary, replica)
+os.environ['REPLICA_DATABASE_URL'] = f'sqlite:///{replica}'
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+django.setup()
+
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from doctors.models import Doctor
+from users.tokens import RoleRefreshToken
+
+
+def served_by(client, method, url, **extra):
+    used = set()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(
+                lambda execute, sql, params, many, context, alias=alias: used.add(alias) or execute(sql, params, many, context)
+            ))
+        response = getattr(client, method)(url, **extra)
+    print(f"{method.upper():<6} {url:<58} {response.status_code}  {', '.join(sorted(used)) or '-'}")
+    return response
+
+
+if __name__ == '__main__':
+    setup_test_environment()
+    logging.disable(logging.WARNING)
+    User = get_user_model()
+    staff = User.objects.filter(is_staff=True).first()
+    doctor = Doctor.objects.select_related('user').first()
+    if not (staff and doctor):
+        raise SystemExit('Needs a staff user and a doctor in the database')
+
+    client = Client()
+    served_by(client, 'get', '/api/doctors/doctors/')
+    served_by(client, 'get', f'/api/doctors/doctors/{doctor.pk}/')
+    served_by(client, 'get', f'/api/bookings/bookings/taken_slots/?doctor={doctor.pk}&date=2026-01-01')
+
+    admin = Client()
+    admin.force_login(staff)
+    served_by(admin, 'get', '/api/system/settings/analytics_dashboard/')
+
+    bearer = {'HTTP_AUTHORIZATION': f'Bearer {RoleRefreshToken.for_user(doctor.user).access_token}'}
+    served_by(client, 'get', f'/api/doctors/doctors/{doctor.pk}/', **bearer)
+    served_by(client, 'patch', f'/api/doctors/doctors/{doctor.pk}/', data={'bio': doctor.bio}, content_type='application/json', **bearer)
+    served_by(client, 'get', f'/api/doctors/doctors/{doctor.pk}/', **bearer)
+    served_by(client, 'get', f'/api/doctors/doctors/{doctor.pk}/')
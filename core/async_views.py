@@ -0,0 +1,89 @@
+"""
+Async counterpart of DRF's APIView for I/O-bound endpoints.
+
+DRF views are synchronous, so under ASGI every request holds a worker
+thread until it returns, including the time spent waiting on Twilio or
+another remote API. AsyncAPIView handlers are `async def` and await that
+I/O instead. Authentication, permissions, throttling and parsing still use
+the DRF classes; the parts that query the database run in a thread. Handlers
+return a JsonResponse, and errors use DRF's {"detail": ...} format.
+"""
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import JWT_ONLY
+
+
+class AsyncAPIView(View):
+    authentication_classes = JWT_ONLY
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Like APIView: token authentication needs no CSRF protection
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[authenticator() for authenticator in self.authentication_classes],
+            parser_context={'view': self, 'args': args, 'kwargs': kwargs},
+        )
+        self.request = request
+        try:
+            await sync_to_async(self.initial)(request)
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None or request.method.lower() not in self.http_method_names:
+                raise exceptions.MethodNotAllowed(request.method)
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def initial(self, request):
+        request.user  # Authenticates
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+        self.check_throttles(request)
+
+    def check_throttles(self, request):
+        # As in APIView: every throttle is checked, and the longest wait is reported
+        waits = [throttle.wait() for throttle in self.get_throttles() if not throttle.allow_request(request, self)]
+        if waits:
+            raise exceptions.Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+    def get_throttles(self):
+        return [throttle() for throttle in self.throttle_classes]
+
+    def handle_exception(self, request, exc):
+        authenticate_header = None
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            if request.authenticators:
+                authenticate_header = request.authenticators[0].authenticate_header(request)
+            if not authenticate_header:
+                exc.status_code = 403
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = json_response(data, status=exc.status_code)
+        if authenticate_header:
+            response['WWW-Authenticate'] = authenticate_header
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
@@ -0,0 +1,21 @@
+"""
+Authenticator profiles for views that should not run the full default chain.
+
+Set a view's (or @action's) authentication_classes to one of these:
+
+    PUBLIC         no authentication at all: public reads and webhooks that
+                   verify their own payload (e.g. PayFast ITN)
+    JWT_ONLY       bearer tokens only (the API default)
+    ADMIN_SESSION  JWT, then the Django admin session, for staff tools used
+                   from the browsable API
+
+Webhook signature profiles live with the integration they verify, e.g.
+telecommunications.signatures.TWILIO_WEBHOOK.
+"""
+from rest_framework.authentication import SessionAuthentication
+
+from users.authentication import RoleJWTAuthentication
+
+PUBLIC = []
+JWT_ONLY = [RoleJWTAuthentication]
+ADMIN_SESSION = [RoleJWTAuthentication, SessionAuthentication]
@@ -0,0 +1,73 @@
+"""
+Per-process database connection metrics.
+
+Counts connections opened per alias against requests served, so the reuse
+rate of persistent connections (and the reconnects caused by health checks,
+CONN_MAX_AGE expiry or worker restarts) can be read off a live worker.
+Figures cover only the process that answers.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_started_at = time.monotonic()
+_requests = 0
+_opened = Counter()
+
+
+@receiver(request_started)
+def count_request(sender, **kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    connection.opened_at = time.monotonic()
+    with _lock:
+        _opened[connection.alias] += 1
+
+
+def server_connections(connection):
+    # Backends connected to this database, from any process (or from PgBouncer)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+
+def connection_stats():
+    now = time.monotonic()
+    databases = {}
+    for alias in connections:
+        connection = connections[alias]
+        opened = _opened[alias]
+        # This thread's connection only; each worker thread holds its own
+        connected = connection.connection is not None
+        opened_at = getattr(connection, 'opened_at', None)
+        stats = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'server_side_cursors': not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS', False),
+            'opened': opened,
+            'requests_per_connection': round(_requests / opened, 1) if opened else None,
+            'connected': connected,
+            'connection_age': round(now - opened_at, 1) if connected and opened_at else None,
+        }
+        if connection.vendor == 'postgresql':
+            stats['server_connections'] = server_connections(connection)
+        databases[alias] = stats
+    return {
+        'pid': os.getpid(),
+        'uptime': round(now - _started_at, 1),
+        'requests': _requests,
+        'databases': databases,
+    }
@@ -1,209 +1,364 @@
-from django.core.management.base import BaseCommand
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+from itertools import islice
+
+import requests
 from django.contrib.auth import get_user_model
-from doctors.models import Doctor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from bookings.models import Booking
+from doctors.models import Doctor
+from memberships.entitlements import invalidate_entitlements
 from memberships.models import Membership
-import os
-import requests
-import json
-from datetime import datetime
 
 User = get_user_model()
 
+TABLES = ('doctors', 'bookings', 'memberships')
+DOCTOR_FIELDS = ['speciality', 'city', 'province', 'price', 'years_experience', 'bio', 'verified', 'languages', 'updated_at']
+# Rows without languages leave an existing doctor's languages alone
+DOCTOR_FIELDS_WITHOUT_LANGUAGES = [field for field in DOCTOR_FIELDS if field != 'languages']
+# start_date is auto_now_add, so an upsert would reset it; upsert_memberships writes it separately
+MEMBERSHIP_FIELDS = ['tier', 'status', 'end_date', 'updated_at']
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class SupabaseClient:
+    """
+    Paged reads from Supabase over one pooled, retrying HTTP session.
+    """
+
+    def __init__(self, url, key, page_size, pool_size):
+        self.url = url.rstrip('/')
+        self.page_size = page_size
+        self.session = requests.Session()
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json',
+        })
+
+    def fetch_auth_users(self):
+        """
+        All auth users. The GoTrue admin API pages with ?page=&per_page=.
+        """
+        users = []
+        page = 1
+        while True:
+            response = self.session.get(
+                f"{self.url}/auth/v1/admin/users",
+                params={'page': page, 'per_page': self.page_size},
+                timeout=30,
+            )
+            response.raise_for_status()
+            data = response.json()
+            batch = data.get('users', []) if isinstance(data, dict) else data
+            users.extend(batch)
+            if len(batch) < self.page_size:
+                return users
+            page += 1
+
+    def fetch_table(self, table, offset=0):
+        """
+        Yield (offset, rows) pages of a PostgREST table from `offset` on.
+        Pages are requested with Range headers in primary-key order so
+        offsets stay stable between runs.
+        """
+        while True:
+            response = self.session.get(
+                f"{self.url}/rest/v1/{table}",
+                params={'select': '*', 'order': 'id.asc'},
+                headers={'Range-Unit': 'items', 'Range': f"{offset}-{offset + self.page_size - 1}"},
+                timeout=30,
+            )
+            if response.status_code == 416:  # Range starts past the last row
+                return
+            response.raise_for_status()
+            rows = response.json()
+            if rows:
+                yield offset, rows
+            if len(rows) < self.page_size:
+                return
+            offset += len(rows)
+
+
+class Prefetch:
+    """
+    Iterates `pages` on a pool thread, at most `depth` pages ahead of the
+    reader, so tables download concurrently without being held in memory.
+    """
+    DONE = object()
+
+    def __init__(self, executor, pages, depth=2):
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        executor.submit(self.fill, pages)
+
+    def fill(self, pages):
+        try:
+            for page in pages:
+                if not self.put(page):
+                    return
+        except Exception as e:
+            self.put(e)
+        else:
+            self.put(self.DONE)
+
+    def put(self, item):
+        # Gives up once the reader has stopped, so the pool can shut down
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def stop(self):
+        self.stopped.set()
+
+    def __iter__(self):
+        while (item := self.queue.get()) is not self.DONE:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class Checkpoint:
+    """
+    Per-table offset of the next unprocessed row, saved after every page.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def offset(self, table):
+        return self.state.get(table, 0)
+
+    def advance(self, table, offset):
+        self.state[table] = offset
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class Command(BaseCommand):
     help = 'Migrate data (Doctors, Bookings, Memberships) from Supabase'
 
-    def handle(self, *args, **kwargs):
-        supabase_url = os.environ.get('SUPABASE_URL')
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=os.environ.get('SUPABASE_URL'), help='Defaults to SUPABASE_URL')
+        parser.add_argument('--page-size', type=int, default=1000, help='Rows requested per Range page')
+        parser.add_argument('--workers', type=int, default=4, help='Tables fetched concurrently')
+        parser.add_argument('--checkpoint', default='.migrate_data_checkpoint.json', help='Progress file used to resume')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        supabase_url = options['url']
         service_role_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
 
         if not supabase_url or not service_role_key:
             self.stdout.write(self.style.ERROR('SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY missing in .env'))
             return
 
-        headers = {
-            'apikey': service_role_key,
-            'Authorization': f'Bearer {service_role_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=representation'
-        }
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['restart']:
+            checkpoint.clear()
+        elif checkpoint.state:
+            self.stdout.write(f"Resuming from checkpoint: {checkpoint.state}")
 
-        # 1. Build User Map (Supabase UUID -> Django User)
-        self.stdout.write("Fetching Supabase users to build map...")
-        users_url = f"{supabase_url}/auth/v1/admin/users"
-        try:
-            response = requests.get(users_url, headers=headers)
-            if response.status_code != 200:
-                self.stdout.write(self.style.ERROR(f"Failed to fetch users: {response.text}"))
-                return
-            
-            sb_users = response.json().get('users', [])
-            uuid_to_user = {}
-            for u in sb_users:
-                email = u.get('email')
-                if email:
-                    try:
-                        django_user = User.objects.get(email=email)
-                        uuid_to_user[u['id']] = django_user
-                    except User.DoesNotExist:
-                        self.stdout.write(self.style.WARNING(f"User {email} not found in Django DB"))
-            
-            self.stdout.write(f"Mapped {len(uuid_to_user)} users.")
+        client = SupabaseClient(supabase_url, service_role_key, options['page_size'], options['workers'] + 1)
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error fetching users: {e}"))
-            return
+        # Fetch every table at once; pages are written as they arrive, in dependency order
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            users_future = executor.submit(client.fetch_auth_users)
+            pages = {
+                table: Prefetch(executor, client.fetch_table(table, checkpoint.offset(table)))
+                for table in TABLES
+            }
+            try:
+                self.migrate_tables(client, checkpoint, users_future, pages)
+            except requests.RequestException as e:
+                raise CommandError(f"Error fetching from Supabase: {e}")
+            finally:
+                for prefetch in pages.values():
+                    prefetch.stop()
 
-        # 2. Migrate Doctors
-        self.stdout.write("Migrating Doctors...")
-        try:
-            # Assuming 'doctors' table in Supabase has columns matching or similar
-            # user_id is likely a UUID referencing auth.users
-            response = requests.get(f"{supabase_url}/rest/v1/doctors?select=*", headers=headers)
-            doctors_data = response.json()
-            
-            for d in doctors_data:
-                user_id = d.get('user_id') or d.get('user') # check column name
-                if not user_id or user_id not in uuid_to_user:
-                    self.stdout.write(self.style.WARNING(f"Doctor skipped (unknown user): {d.get('id')}"))
-                    continue
-                
-                django_user = uuid_to_user[user_id]
-                
-                # Check if doctor profile exists
-                doctor, created = Doctor.objects.get_or_create(user=django_user)
-                
-                # Update fields
-                doctor.speciality = d.get('speciality') or 'General Practitioner'
-                doctor.city = d.get('city') or ''
-                doctor.province = d.get('province') or ''
-                doctor.price = d.get('price') or d.get('consultation_fee') or 0.00
-                doctor.years_experience = d.get('years_experience') or 0
-                doctor.bio = d.get('bio') or ''
-                doctor.verified = d.get('verified', False)
-                
-                # Image URL handling (Supabase likely stores full URL or path)
-                image_url = d.get('image_url') or d.get('image')
-                # We can't easily download and save the image here without more work, 
-                # so we'll skip image migration or store the URL in a temporary field if we had one.
-                # For now, skip image.
-                
-                doctor.save()
-                
-                # If 'languages' is a field in Supabase, handle it
-                if 'languages' in d:
-                    doctor.languages = d['languages']
-                    doctor.save()
-                    
-                status_str = "Created" if created else "Updated"
-                self.stdout.write(f"{status_str} Doctor profile for {django_user.email}")
+        self.stdout.write(self.style.SUCCESS('Migration complete'))
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error migrating doctors: {e}"))
+    def migrate_tables(self, client, checkpoint, users_future, pages):
+        uuid_to_user_id = self.map_users(users_future.result())
+        self.stdout.write(f"Mapped {len(uuid_to_user_id)} users.")
 
-        # 3. Migrate Bookings
-        self.stdout.write("Migrating Bookings...")
-        try:
-            response = requests.get(f"{supabase_url}/rest/v1/bookings?select=*", headers=headers)
-            bookings_data = response.json()
-            
-            for b in bookings_data:
-                patient_id = b.get('patient_id') or b.get('user_id')
-                doctor_id_sb = b.get('doctor_id') # This might be the doctor TABLE id, or user id
-                
-                if not patient_id or patient_id not in uuid_to_user:
-                    continue
-
-                patient_user = uuid_to_user[patient_id]
-                
-                # Resolve Doctor
-                # If doctor_id_sb refers to the 'doctors' table ID (integer usually in Supabase public schema if auto-inc)
-                # We need to find the corresponding Django Doctor. 
-                # BUT, we don't know the Supabase Doctor ID -> Django Doctor ID mapping.
-                # If Supabase doctor_id is a UUID (user_id), we can map it.
-                # If it's an int, we might need to assume order or fetch doctor by user_id.
-                
-                # Heuristic: Try to find a Django Doctor whose user matches the Supabase Doctor's user
-                # We need to fetch the Supabase Doctor record to get their User ID if we only have Doctor ID.
-                # OR we build a map of Supabase Doctor ID -> Django Doctor Object.
-                
-                # Let's build Supabase Doctor ID -> Django Doctor map
-                # We can do this by re-iterating the doctors_data we fetched above.
-                
-                pass # Logic continues below
-
-            # Build SB Doctor ID Map
-            sb_doctor_id_map = {} # sb_id -> django_doctor_obj
-            for d in doctors_data:
-                u_id = d.get('user_id') or d.get('user')
-                if u_id in uuid_to_user:
-                    d_user = uuid_to_user[u_id]
-                    try:
-                        doc_obj = Doctor.objects.get(user=d_user)
-                        sb_doctor_id_map[d['id']] = doc_obj
-                    except Doctor.DoesNotExist:
-                        pass
-            
-            # Now process bookings
-            for b in bookings_data:
-                patient_id = b.get('patient_id') or b.get('user_id')
-                doctor_id_sb = b.get('doctor_id')
-                
-                if patient_id not in uuid_to_user:
-                    continue
-                if doctor_id_sb not in sb_doctor_id_map:
-                    continue
-                    
-                patient_user = uuid_to_user[patient_id]
-                doctor_obj = sb_doctor_id_map[doctor_id_sb]
-                
-                # Create Booking
-                # Handle Date/Time
-                date_str = b.get('appointment_date')
-                time_str = b.get('appointment_time')
-                
-                if not date_str or not time_str:
-                    continue
-                
-                booking, created = Booking.objects.get_or_create(
-                    user=patient_user,
-                    doctor=doctor_obj,
-                    appointment_date=date_str,
-                    appointment_time=time_str,
-                    defaults={
-                        'status': b.get('status', 'pending'),
-                        'notes': b.get('notes') or b.get('patient_notes') or ''
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Created Booking: {patient_user} with {doctor_obj}")
+        # Bookings refer to Supabase doctor ids, so map every doctor row, including ones done in an earlier run
+        sb_doctor_to_user = {}
+        if checkpoint.offset('doctors'):
+            sb_doctor_to_user = self.map_doctors(client.fetch_table('doctors'), uuid_to_user_id)
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error migrating bookings: {e}"))
+        migrations = (
+            ('doctors', lambda rows: self.upsert_doctors(rows, uuid_to_user_id, sb_doctor_to_user)),
+            ('bookings', lambda rows: self.insert_bookings(rows, uuid_to_user_id, sb_doctor_to_user)),
+            ('memberships', lambda rows: self.upsert_memberships(rows, uuid_to_user_id)),
+        )
+        for table, migrate in migrations:
+            written = 0
+            for offset, rows in pages[table]:
+                with transaction.atomic():
+                    written += migrate(rows)
+                checkpoint.advance(table, offset + len(rows))
+            self.stdout.write(f"{table}: {written} row(s) written")
 
-        # 4. Migrate Memberships
-        self.stdout.write("Migrating Memberships...")
-        try:
-            response = requests.get(f"{supabase_url}/rest/v1/memberships?select=*", headers=headers)
-            memberships_data = response.json()
-            
-            for m in memberships_data:
-                user_id = m.get('user_id')
-                if not user_id or user_id not in uuid_to_user:
-                    continue
-                
-                user = uuid_to_user[user_id]
-                
-                Membership.objects.update_or_create(
-                    user=user,
-                    defaults={
-                        'tier': m.get('tier', 'free'),
-                        'status': m.get('status', 'active'),
-                        'start_date': m.get('start_date') or datetime.now(),
-                        'end_date': m.get('end_date')
-                    }
-                )
-                self.stdout.write(f"Updated Membership for {user.email}")
+    def map_users(self, sb_users):
+        """
+        Supabase auth UUID -> Django user id, matching on email in chunks.
+        """
+        uuid_by_email = {u['email']: u['id'] for u in sb_users if u.get('email')}
+        mapping = {}
+        for emails in chunked(uuid_by_email, 1000):
+            for email, pk in User.objects.filter(email__in=emails).values_list('email', 'pk'):
+                mapping.setdefault(uuid_by_email[email], pk)
+        missing = len(uuid_by_email) - len(mapping)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} Supabase user(s) not found in Django DB"))
+        return mapping
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error migrating memberships: {e}"))
+    @staticmethod
+    def map_doctors(pages, uuid_to_user_id):
+        doctors = {}
+        for _, rows in pages:
+            for d in rows:
+                user_id = uuid_to_user_id.get(d.get('user_id') or d.get('user'))
+                if user_id:
+                    doctors[d['id']] = user_id
+        return doctors
+
+    def upsert_doctors(self, rows, uuid_to_user_id, sb_doctor_to_user):
+        with_languages, without_languages = [], []
+        for d in rows:
+            user_id = uuid_to_user_id.get(d.get('user_id') or d.get('user'))
+            if not user_id:
+                self.stdout.write(self.style.WARNING(f"Doctor skipped (unknown user): {d.get('id')}"))
+                continue
+            sb_doctor_to_user[d['id']] = user_id
+            # Images are not migrated; Supabase only has a URL for them
+            doctor = Doctor(
+                user_id=user_id,
+                speciality=d.get('speciality') or 'General Practitioner',
+                city=d.get('city') or '',
+                province=d.get('province') or '',
+                price=d.get('price') or d.get('consultation_fee') or 0.00,
+                years_experience=d.get('years_experience') or 0,
+                bio=d.get('bio') or '',
+                verified=d.get('verified', False),
+            )
+            if d.get('languages') is not None:
+                doctor.languages = d['languages']
+                with_languages.append(doctor)
+            else:
+                without_languages.append(doctor)
+        for doctors, update_fields in (
+            (with_languages, DOCTOR_FIELDS),
+            (without_languages, DOCTOR_FIELDS_WITHOUT_LANGUAGES),
+        ):
+            Doctor.objects.bulk_create(
+                doctors, update_conflicts=True, unique_fields=['user'], update_fields=update_fields,
+            )
+        return len(with_languages) + len(without_languages)
+
+    @staticmethod
+    def insert_bookings(rows, uuid_to_user_id, sb_doctor_to_user):
+        """
+        Create bookings not already present (same patient, doctor, date and time).
+        Rows with unparseable dates are skipped. Bulk inserts send no booking
+        notifications.
+        """
+        doctor_ids = dict(Doctor.objects.filter(user_id__in=set(sb_doctor_to_user.values())).values_list('user_id', 'pk'))
+        candidates = {}
+        for b in rows:
+            user_id = uuid_to_user_id.get(b.get('patient_id') or b.get('user_id'))
+            doctor_id = doctor_ids.get(sb_doctor_to_user.get(b.get('doctor_id')))
+            date_str, time_str = b.get('appointment_date'), b.get('appointment_time')
+            if not (user_id and doctor_id and date_str and time_str):
+                continue
+            try:
+                # Accepts HH:MM as well as HH:MM:SS; any UTC offset is dropped, as the column has none
+                appointment_time = time.fromisoformat(time_str).replace(tzinfo=None)
+                key = (user_id, doctor_id, datetime.fromisoformat(date_str).date(), appointment_time)
+            except ValueError:
+                continue
+            candidates.setdefault(key, b)
+
+        existing = set(
+            Booking.objects.filter(
+                user_id__in={key[0] for key in candidates},
+                appointment_date__in={key[2] for key in candidates},
+            ).values_list('user_id', 'doctor_id', 'appointment_date', 'appointment_time')
+        )
+        bookings = [
+            Booking(
+                user_id=user_id, doctor_id=doctor_id, appointment_date=appointment_date, appointment_time=appointment_time,
+                status=b.get('status', 'pending'),
+                notes=b.get('notes') or b.get('patient_notes') or '',
+            )
+            for (user_id, doctor_id, appointment_date, appointment_time), b in candidates.items()
+            if (user_id, doctor_id, appointment_date, appointment_time) not in existing
+        ]
+        Booking.objects.bulk_create(bookings)
+        return len(bookings)
+
+    @staticmethod
+    def upsert_memberships(rows, uuid_to_user_id):
+        """
+        Upsert memberships, then write Supabase's start_date where it has one:
+        auto_now_add stamps inserts with now(), and bulk_update skips pre_save.
+        Memberships without one keep the date they were first migrated on.
+        """
+        memberships = {}
+        start_dates = {}
+        for m in rows:
+            user_id = uuid_to_user_id.get(m.get('user_id'))
+            if not user_id:
+                continue
+            memberships[user_id] = Membership(
+                user_id=user_id,
+                tier=m.get('tier', 'free'),
+                status=m.get('status', 'active'),
+                end_date=m.get('end_date'),
+            )
+            if m.get('start_date'):
+                start_dates[user_id] = m['start_date']
+        Membership.objects.bulk_create(
+            memberships.values(), update_conflicts=True, unique_fields=['user'], update_fields=MEMBERSHIP_FIELDS,
+        )
+        dated = []
+        for user_id, start_date in start_dates.items():
+            membership = memberships[user_id]
+            membership.start_date = start_date
+            dated.append(membership)
+        Membership.objects.bulk_update(dated, ['start_date'])
+        invalidate_entitlements(*memberships)
+        return len(memberships)
@@ -0,0 +1,40 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from rest_framework.permissions import SAFE_METHODS
+
+from .replicas import pin_to_primary
+
+
+class ReplicaPinMiddleware:
+    """
+    After a successful write, keep the user's reads on the primary for a
+    few seconds so they see it despite replica lag. DRF views set
+    request.user during the view, so it is checked on the way out.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # request.user may still be the lazy session user, which queries the database
+            await sync_to_async(self.pin_writer)(request, response)
+        return response
+
+    @staticmethod
+    def pin_writer(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
@@ -0,0 +1,87 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless code opts in: views with ReplicaReadMixin
+(for the actions in `replica_actions`), or anything inside read_from_replica().
+Without a 'replica' database configured, everything stays on the primary.
+
+Replicas lag the primary, so a user who has just written is pinned to the
+primary for REPLICA_PIN_SECONDS (see core.middleware.ReplicaPinMiddleware)
+and reads their own writes. The pin lives in the cache; a per-process cache
+would hide it from the worker serving the next read, so without a shared
+cache signed-in users always read from the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = 'replica'
+PIN_KEY = 'replica_pin:{}'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pin_to_primary(user_id):
+    if settings.CACHE_SHARED:
+        cache.set(PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    if user_id is None:
+        return False
+    return not settings.CACHE_SHARED or cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_ALIAS in connections.databases:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replication brings the schema over
+        return db != REPLICA_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe requests of `replica_actions` from the replica, unless
+    the user wrote recently.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            self.action in self.replica_actions
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user.pk)
+        ):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
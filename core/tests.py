@@ -0,0 +1,307 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import TestCase, override_settings
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from bookings.models import Booking
+from doctors.models import Doctor
+from memberships.models import Membership
+from .replicas import REPLICA_ALIAS, ReplicaRouter, _use_replica, read_from_replica
+from .throttling import ScopedBucketThrottle
+
+SUPABASE = {
+    'users': [
+        {'id': 'uuid-doc', 'email': 'doc@example.com'},
+        {'id': 'uuid-ann', 'email': 'ann@example.com'},
+        {'id': 'uuid-bob', 'email': 'bob@example.com'},
+    ],
+    'doctors': [{'id': 1, 'user_id': 'uuid-doc', 'speciality': 'GP', 'city': 'Durban', 'province': 'KZN'}],
+    'bookings': [
+        {'id': 1, 'patient_id': 'uuid-ann', 'doctor_id': 1, 'appointment_date': '2026-01-05', 'appointment_time': '09:00:00'},
+        {'id': 2, 'patient_id': 'uuid-bob', 'doctor_id': 1, 'appointment_date': '2026-01-05', 'appointment_time': '10:00:00'},
+        # PostgREST returns HH:MM:SS, but older rows were written as HH:MM
+        {'id': 3, 'patient_id': 'uuid-ann', 'doctor_id': 1, 'appointment_date': '2026-01-06', 'appointment_time': '09:30'},
+    ],
+    'memberships': [
+        {'id': 1, 'user_id': 'uuid-ann', 'tier': 'premium', 'status': 'active', 'start_date': '2025-03-01T00:00:00+00:00'},
+        {'id': 2, 'user_id': 'uuid-bob', 'tier': 'premium', 'status': 'active'},
+    ],
+}
+
+
+class SupabaseStub(BaseHTTPRequestHandler):
+    """
+    The GoTrue admin users list and PostgREST Range paging, from SUPABASE.
+    Paths in `fail` answer 404.
+    """
+    fail = set()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path in self.fail:
+            return self.reply(404, {'message': 'Not found'})
+        if url.path == '/auth/v1/admin/users':
+            query = parse_qs(url.query)
+            page, per_page = int(query['page'][0]), int(query['per_page'][0])
+            return self.reply(200, {'users': SUPABASE['users'][(page - 1) * per_page:page * per_page]})
+
+        rows = SUPABASE[url.path.rsplit('/', 1)[1]]
+        start, end = map(int, self.headers['Range'].split('-'))
+        if start >= len(rows):
+            return self.reply(416, [])
+        self.reply(206, rows[start:end + 1])
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class MigrateDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SupabaseStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        User = get_user_model()
+        for user in SUPABASE['users']:
+            User.objects.create_user(username=user['email'], email=user['email'], password='x')
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        self.addCleanup(SupabaseStub.fail.clear)
+
+    def migrate(self):
+        out = StringIO()
+        with mock.patch.dict(os.environ, {'SUPABASE_SERVICE_ROLE_KEY': 'service-role'}):
+            call_command(
+                'migrate_data', url=f'http://127.0.0.1:{self.server.server_port}', page_size=2,
+                checkpoint=self.checkpoint, stdout=out,
+            )
+        return out.getvalue()
+
+    def read_checkpoint(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def test_migrates_every_table(self):
+        out = self.migrate()
+        self.assertEqual(out.count('Migration complete'), 1)
+        self.assertEqual(Doctor.objects.get().user.email, 'doc@example.com')
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertTrue(Booking.objects.filter(appointment_time=dt_time(9, 30)).exists())
+        self.assertEqual(Membership.objects.filter(tier='premium').count(), 2)
+        self.assertEqual(self.read_checkpoint(), {'doctors': 1, 'bookings': 3, 'memberships': 2})
+
+    def test_rerun_keeps_membership_start_dates(self):
+        self.migrate()
+        ann = Membership.objects.get(user__email='ann@example.com')
+        bob = Membership.objects.get(user__email='bob@example.com')
+        self.assertEqual(ann.start_date, datetime(2025, 3, 1, tzinfo=dt_timezone.utc))
+
+        os.remove(self.checkpoint)
+        self.migrate()
+        self.assertEqual(Membership.objects.get(pk=ann.pk).start_date, ann.start_date)
+        self.assertEqual(Membership.objects.get(pk=bob.pk).start_date, bob.start_date)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_doctor_languages_are_kept_when_missing(self):
+        Doctor.objects.create(
+            user=get_user_model().objects.get(email='doc@example.com'), speciality='GP', city='Durban', province='KZN',
+            languages=['Zulu', 'English'],
+        )
+        self.migrate()
+        self.assertEqual(Doctor.objects.get().languages, ['Zulu', 'English'])
+
+        doctor = {**SUPABASE['doctors'][0], 'languages': ['Xhosa']}
+        os.remove(self.checkpoint)
+        with mock.patch.dict(SUPABASE, {'doctors': [doctor]}):
+            self.migrate()
+        self.assertEqual(Doctor.objects.get().languages, ['Xhosa'])
+
+    def test_resumes_after_a_failed_page(self):
+        SupabaseStub.fail.add('/rest/v1/memberships')
+        with self.assertRaises(CommandError):
+            self.migrate()
+        # Pages written before the failure are checkpointed one by one
+        self.assertEqual(self.read_checkpoint(), {'doctors': 1, 'bookings': 3})
+        self.assertFalse(Membership.objects.exists())
+
+        SupabaseStub.fail.clear()
+        with mock.patch('core.management.commands.migrate_data.Command.insert_bookings') as insert_bookings:
+            self.migrate()
+        insert_bookings.assert_not_called()
+        self.assertEqual(Membership.objects.count(), 2)
+        self.assertEqual(self.read_checkpoint(), {'doctors': 1, 'bookings': 3, 'memberships': 2})
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_stay_on_the_primary_without_a_replica(self):
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Doctor))
+
+    def test_opted_in_reads_use_the_replica(self):
+        with mock.patch.dict(connections.databases, {REPLICA_ALIAS: connections.databases['default']}):
+            self.assertIsNone(self.router.db_for_read(Doctor))
+            with read_from_replica():
+                self.assertEqual(self.router.db_for_read(Doctor), REPLICA_ALIAS)
+                with read_from_replica(False):
+                    self.assertIsNone(self.router.db_for_read(Doctor))
+            self.assertEqual(self.router.db_for_write(Doctor), 'default')
+
+    def test_schema_is_not_migrated_on_the_replica(self):
+        self.assertTrue(self.router.allow_migrate('default', 'doctors'))
+        self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, 'doctors'))
+
+
+class ReplicaReadMixinTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='doctor', password='x', is_doctor=True)
+        self.doctor = Doctor.objects.create(user=self.user, speciality='GP', city='Durban', province='KZN')
+
+    def list_reads_replica(self):
+        """
+        Whether the doctor list ran inside the replica context.
+        """
+        seen = []
+        with mock.patch.object(ReplicaRouter, 'db_for_read', lambda router, model, **hints: seen.append(_use_replica.get())):
+            self.assertEqual(self.client.get('/api/doctors/doctors/').status_code, 200)
+        return any(seen)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_writer_is_pinned_to_the_primary(self):
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.list_reads_replica())
+
+        response = self.client.patch(f'/api/doctors/doctors/{self.doctor.pk}/', {'city': 'Cape Town'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.list_reads_replica())
+
+        cache.clear()  # The pin expires
+        self.assertTrue(self.list_reads_replica())
+
+    @override_settings(CACHE_SHARED=False)
+    def test_without_shared_cache_signed_in_users_read_the_primary(self):
+        self.assertTrue(self.list_reads_replica())
+        self.client.force_authenticate(self.user)
+        self.assertFalse(self.list_reads_replica())
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowCache:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __getattr__(self, name):
+        method = getattr(self.cache, name)
+
+        def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            time.sleep(0.01)
+            return result
+        return call
+
+
+class ThrottledView:
+    throttle_scope = 'test'
+
+
+class ScopedBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock()
+        # The cache's expiry reads the same clock
+        for patcher in (
+            mock.patch.object(ScopedBucketThrottle, 'timer', self.clock),
+            mock.patch('time.time', self.clock),
+            mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'test': '3/min'}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = APIRequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def take(self, count=1):
+        throttles = [ScopedBucketThrottle() for _ in range(count)]
+        return [throttle.allow_request(self.request, ThrottledView()) for throttle in throttles], throttles[-1]
+
+    def test_allows_a_burst_up_to_the_capacity(self):
+        allowed, throttle = self.take(4)
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertEqual(throttle.wait(), 20)
+
+    def test_refills_one_token_per_interval(self):
+        self.take(3)
+        self.clock.now += 19
+        self.assertEqual(self.take()[0], [False])
+        self.clock.now += 1
+        self.assertEqual(self.take(2)[0], [True, False])
+
+    def test_refill_stops_at_the_capacity(self):
+        self.take(3)
+        self.clock.now += 600
+        self.assertEqual(self.take(4)[0], [True, True, True, False])
+
+    def test_denied_requests_take_no_tokens(self):
+        self.take(10)
+        self.clock.now += 20
+        self.assertEqual(self.take()[0], [True])
+
+    def test_clients_have_separate_buckets(self):
+        self.take(3)
+        self.request.META['REMOTE_ADDR'] = '10.0.0.2'
+        self.assertEqual(self.take()[0], [True])
+
+    def test_concurrent_requests_share_the_capacity(self):
+        barrier = threading.Barrier(12)
+
+        def take():
+            throttle = ScopedBucketThrottle()
+            barrier.wait()
+            return throttle.allow_request(self.request, ThrottledView())
+
+        # A round trip per cache call, so the requests interleave
+        with mock.patch.object(ScopedBucketThrottle, 'cache', SlowCache(cache)):
+            with ThreadPoolExecutor(max_workers=12) as executor:
+                allowed = list(executor.map(lambda _: take(), range(12)))
+        self.assertEqual(allowed.count(True), 3)
@@ -0,0 +1,102 @@
+"""
+Token-bucket throttling kept in the shared cache.
+
+Each client gets a bucket holding up to N tokens that refills at N per
+period, so short bursts are allowed while the sustained rate is capped.
+
+The bucket is stored as the time it will be full again, in milliseconds,
+and each request moves that time on by one token's refill with an atomic
+cache.incr, so concurrent requests can't both take the last token. The
+key expires when the bucket is full again, so a missing key means a full
+bucket and cache.add starts a new one. No database access.
+
+Rates use DRF's format and live in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+Views pick a scope with `throttle_scope`, or per action with
+`throttle_scopes = {'create': 'register', ...}`. Views without a scope are
+not throttled.
+"""
+import math
+import time
+from contextlib import suppress
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """
+    '60/min' -> (60, 60). The period is read from its first letter, as in DRF.
+    """
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class ScopedBucketThrottle(BaseThrottle):
+    cache = cache
+    timer = time.time
+    cache_format = 'throttle:{scope}:{ident}'
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', None) or {}
+        return scopes.get(getattr(view, 'action', None), getattr(view, 'throttle_scope', None))
+
+    def get_ident(self, request):
+        """
+        Authenticated users are limited per account, everyone else per IP.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{super().get_ident(request)}"
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+
+        capacity, period = parse_rate(rate)
+        # Rounded down, so a full bucket always holds `capacity` tokens
+        interval = max(1, period * 1000 // capacity)
+        key = self.cache_format.format(scope=scope, ident=self.get_ident(request))
+        now = round(self.timer() * 1000)
+
+        full_at = self.take_token(key, now, interval)
+        if full_at - now > period * 1000:
+            # The bucket was empty; give the token back
+            with suppress(ValueError):
+                self.cache.decr(key, interval)
+            self.wait_seconds = (full_at - now - period * 1000) / 1000
+            return False
+        # incr keeps the key's expiry, so move it to the new full time
+        self.cache.touch(key, math.ceil((full_at - now) / 1000))
+        return True
+
+    def take_token(self, key, now, interval):
+        """
+        Take a token from the bucket at `key` and return when it will be full again.
+        """
+        try:
+            return self.cache.incr(key, interval)
+        except ValueError:
+            pass
+        if self.cache.add(key, now + interval, math.ceil(interval / 1000)):
+            return now + interval
+        # Another request started the bucket first
+        return self.cache.incr(key, interval)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPBucketThrottle(ScopedBucketThrottle):
+    """
+    Always per IP, even for authenticated requests, e.g. for signup.
+    """
+
+    def get_ident(self, request):
+        return f"ip:{BaseThrottle.get_ident(self, request)}"
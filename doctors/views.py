@@ -2,16 +2,18 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from core.replicas import ReplicaReadMixin
 from .models import Doctor, DoctorSchedule
 from .serializers import DoctorSerializer, DoctorScheduleSerializer
 
-class DoctorViewSet(viewsets.ModelViewSet):
+class DoctorViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['speciality', 'city', 'province', 'user__first_name', 'user__last_name', 'practice_name']
     filterset_fields = ['user', 'city', 'province', 'speciality', 'is_available']
+    throttle_scope = 'doctors'
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -0,0 +1,70 @@
+"""
+Gunicorn settings for the web process (see Procfile).
+
+The app is imported once in the master and forked (preload_app), so
+workers share its memory copy-on-write and serve their first request
+without importing anything. Modules the app imports lazily, so management
+commands and the queue workers skip them, are preloaded here too.
+
+Environment:
+    WEB_WORKER_CLASS   uvicorn (default, serves the ASGI app), gthread or sync
+    WEB_CONCURRENCY    worker processes; defaults from the CPU count
+    WEB_THREADS        threads per gthread worker (default 4)
+    WEB_MAX_REQUESTS   requests before a worker is replaced (default 1000, 0 disables)
+"""
+import importlib
+import os
+
+UVICORN = 'uvicorn.workers.UvicornWorker'
+WORKER_CLASSES = {'uvicorn': UVICORN, 'gthread': 'gthread', 'sync': 'sync'}
+
+
+def cpu_count():
+    try:
+        # The CPUs this process may run on, which a container can limit
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# The async views need an event loop: on thread workers every request would start its own, with
+# its own Twilio connection pool, and long-polls and streams would each hold a thread. The ASGI
+# app doesn't keep database connections between requests (see asgi.py); pool them with PgBouncer.
+worker_class = WORKER_CLASSES[os.getenv('WEB_WORKER_CLASS', 'uvicorn')]
+wsgi_app = 'medmap_backend.asgi:application' if worker_class == UVICORN else 'medmap_backend.wsgi:application'
+
+# Imported lazily by the app; importing them before the fork shares them with every worker
+PRELOAD_IMPORTS = [
+    'twilio.rest.api.v2010',  # Client.calls and Client.messages
+    'twilio.http.http_client',
+]
+if worker_class == UVICORN:
+    PRELOAD_IMPORTS.append('twilio.http.async_http_client')  # aiohttp, for the async views
+
+# An event loop keeps a core busy while requests wait on I/O; sync and thread workers need more processes for that
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or (cpu_count() if worker_class == UVICORN else 2 * cpu_count() + 1)
+# More than one thread would turn a sync worker into gthread
+threads = int(os.getenv('WEB_THREADS', 4)) if worker_class == 'gthread' else 1
+
+# Replace workers now and then to bound slow memory growth; the jitter keeps them from restarting together
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+errorlog = '-'
+
+
+def when_ready(server):
+    # Runs in the master after the app has loaded, before the workers fork
+    for module in PRELOAD_IMPORTS:
+        importlib.import_module(module)
+    # A database socket opened while loading would be shared by every worker
+    from django.db import connections
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    # Recycled workers (max_requests) and restarts finish the calls they queued instead of dropping them
+    from telecommunications.calls import get_executor
+    if get_executor.cache_info().currsize:
+        get_executor().shutdown(wait=True)
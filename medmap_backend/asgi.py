@@ -3,5 +3,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings')
+# Under ASGI the sync code of each request runs on a new thread, and so on a new
+# database connection. Persistent ones would pile up, one per request, so close
+# them after each request; pool with PgBouncer instead.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -1,5 +1,7 @@
+from importlib.util import find_spec
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -49,6 +51,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'memberships.middleware.EntitlementsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,13 +79,37 @@ WSGI_APPLICATION = 'medmap_backend.wsgi.application'
 
 import dj_database_url
 
+# Persistent connections are checked before reuse, so a database restart costs one
+# reconnect instead of failed requests. DB_CONN_MAX_AGE=0 closes after each request,
+# which the ASGI app defaults to (see asgi.py).
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///db.sqlite3',
-        conn_max_age=600
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        conn_health_checks=os.getenv('DB_CONN_HEALTH_CHECKS', 'True').strip() == 'True',
     )
 }
 
+# Optional read replica for directory and analytics reads (see core/replicas.py)
+REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL', '').strip()
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+        test_options={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# How long a user's reads stay on the primary after they write; cover the replication lag
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Behind PgBouncer in transaction mode, server-side cursors (used by iterator())
+# would not survive the pooler handing the next statement to another backend.
+DB_POOLER = os.getenv('DB_POOLER', '').strip().lower()
+if DB_POOLER == 'pgbouncer':
+    for database in DATABASES.values():
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -89,21 +117,97 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing. PASSWORD_HASHER picks the algorithm for new hashes (argon2, bcrypt
+# or pbkdf2); argon2 and bcrypt need their optional packages and fall back to pbkdf2.
+# Every listed hasher still verifies, and older hashes are upgraded on the next login.
+# Tests use the fast, insecure md5 hasher unless PASSWORD_HASHER says otherwise.
+TESTING = sys.argv[1:2] == ['test']
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'md5' if TESTING else 'argon2').strip().lower()
+_PASSWORD_HASHERS = {
+    'argon2': ('django.contrib.auth.hashers.Argon2PasswordHasher', 'argon2'),
+    'bcrypt': ('django.contrib.auth.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+    'pbkdf2': ('django.contrib.auth.hashers.PBKDF2PasswordHasher', None),
+    'md5': ('django.contrib.auth.hashers.MD5PasswordHasher', None),
+}
+_hasher, _module = _PASSWORD_HASHERS.get(PASSWORD_HASHER, _PASSWORD_HASHERS['pbkdf2'])
+if _module and find_spec(_module) is None:
+    _hasher = _PASSWORD_HASHERS['pbkdf2'][0]
+PASSWORD_HASHERS = [_hasher] + [
+    hasher for hasher in (
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        # Plain bcrypt, for hashes imported from Supabase (see import_users)
+        'django.contrib.auth.hashers.BCryptPasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ) if hasher != _hasher
+]
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        # JWT only; views pick other profiles from core.authentication
+        'users.authentication.RoleJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Only views that declare a throttle scope are limited (see core/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.ScopedBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'slots': os.getenv('THROTTLE_SLOTS', '60/min'),
+        'doctors': os.getenv('THROTTLE_DOCTORS', '120/min'),
+        'register': os.getenv('THROTTLE_REGISTER', '10/hour'),
+        'verification': os.getenv('THROTTLE_VERIFICATION', '5/hour'),
+        'phone_code': os.getenv('THROTTLE_PHONE_CODE', '5/hour'),
+        'calls': os.getenv('THROTTLE_CALLS', '10/min'),
+    },
+    # Proxies in front of the app (Render adds one); used to find the client IP in X-Forwarded-For
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
 }
 
+# Shared cache for throttling, entitlements, counters etc. Falls back to per-process memory.
+REDIS_URL = os.getenv('REDIS_URL', '').strip()
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# A per-process cache can't carry an invalidation to the other workers, so values
+# that must change everywhere at once are cached briefly, or not at all, without Redis
+CACHE_SHARED = bool(REDIS_URL)
+ENTITLEMENTS_CACHE_SECONDS = int(os.getenv('ENTITLEMENTS_CACHE_SECONDS', 3600 if CACHE_SHARED else 30))
+
+# Sessions are only used by the admin. They stay in the database so a staff session can be
+# revoked server-side; a shared cache saves the session-table read per request
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if CACHE_SHARED else 'django.contrib.sessions.backends.db',
+)
+
+# Pub/sub backend for the notification stream (see medmap_notifications.pubsub)
+NOTIFICATIONS_PUBSUB_BACKEND = os.getenv(
+    'NOTIFICATIONS_PUBSUB_BACKEND',
+    'medmap_notifications.pubsub.RedisBroker' if REDIS_URL else 'medmap_notifications.pubsub.InProcessBroker',
+)
+
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Tokens carry role claims and a revocation version (see users/tokens.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.tokens.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.RoleTokenRefreshSerializer',
 }
 
 LANGUAGE_CODE = 'en-us'
@@ -178,10 +282,20 @@ PASSPHRASE = os.getenv('PASSPHRASE', 'MedMap.2025.').strip()
 PAYFAST_SANDBOX = os.getenv('PAYFAST_SANDBOX', 'False').strip() == 'True'
 
 BACKEND_URL = os.getenv('BACKEND_URL', 'https://medmap-backend-6t7y.onrender.com')
-PAYFAST_NOTIFY_URL = f"{BACKEND_URL}/api/payments/notify/"
+PAYFAST_NOTIFY_URL = os.getenv('PAYFAST_NOTIFY_URL', f"{BACKEND_URL}/api/payments/notify/")
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://medmap.co.za').rstrip('/')  # Used for links in emails
 
 # Twilio
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '').strip()
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '').strip()
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '').strip()
 SUPPORT_PHONE_NUMBER = os.getenv('SUPPORT_PHONE_NUMBER', '').strip()  # The number to forward inbound calls to
+TWILIO_VALIDATE_SIGNATURES = os.getenv('TWILIO_VALIDATE_SIGNATURES', 'True').strip() == 'True'
+# Dotted paths to twilio HttpClients; empty uses the pooled TwilioHttpClient / AsyncTwilioHttpClient.
+# Set to 'telecommunications.fake.FakeTwilioHttpClient' / '...FakeAsyncTwilioHttpClient' to keep tests/dev off the network.
+TWILIO_HTTP_CLIENT = os.getenv('TWILIO_HTTP_CLIENT', '').strip()
+TWILIO_ASYNC_HTTP_CLIENT = os.getenv('TWILIO_ASYNC_HTTP_CLIENT', '').strip()
+TWILIO_HTTP_TIMEOUT = float(os.getenv('TWILIO_HTTP_TIMEOUT', '10'))
+TWILIO_CALL_WORKERS = int(os.getenv('TWILIO_CALL_WORKERS', '4'))  # Threads placing async calls
+TWILIO_MESSAGING_SERVICE_SID = os.getenv('TWILIO_MESSAGING_SERVICE_SID', '').strip()  # Sends SMS from the service's number pool
+TWILIO_SMS_PER_SECOND = float(os.getenv('TWILIO_SMS_PER_SECOND', '1'))  # Sender throughput; 1/s per long code
@@ -5,4 +5,5 @@ class MedmapNotificationsConfig(AppConfig):
     name = 'medmap_notifications'
 
     def ready(self):
+        import medmap_notifications.handlers
         import medmap_notifications.signals
@@ -0,0 +1,86 @@
+"""
+Per-user unread counters and change versions kept in the cache.
+
+The unread count is filled from the database on a miss and then adjusted
+in place. The version is bumped whenever a user receives notifications,
+which long-polling clients watch for.
+
+Both only work if every process shares the cache: notifications are created
+by other workers and by commands like send_booking_reminders. Without a
+shared cache (CACHE_SHARED) they are read from the database instead, and
+the version is the id of the user's newest notification.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Notification
+
+UNREAD_KEY = 'notifications:unread:{user_id}'
+VERSION_KEY = 'notifications:version:{user_id}'
+UNREAD_TIMEOUT = 60 * 60 * 24
+
+
+def get_unread_count(user_id):
+    if not settings.CACHE_SHARED:
+        return Notification.objects.filter(recipient_id=user_id, read=False).count()
+    key = UNREAD_KEY.format(user_id=user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        cache.set(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def get_version(user_id):
+    if not settings.CACHE_SHARED:
+        return Notification.objects.filter(recipient_id=user_id).aggregate(version=Max('pk'))['version'] or 0
+    return cache.get(VERSION_KEY.format(user_id=user_id), 0)
+
+
+def _incr(key, delta):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Not cached: the next read recomputes it from the database
+        return None
+
+
+def record_created(recipient_ids):
+    """
+    Count new unread notifications and wake long-pollers, once the
+    surrounding transaction commits.
+    """
+    if not settings.CACHE_SHARED:
+        return
+    counts = Counter(recipient_ids)
+    if not counts:
+        return
+
+    def apply():
+        for user_id, count in counts.items():
+            _incr(UNREAD_KEY.format(user_id=user_id), count)
+            version_key = VERSION_KEY.format(user_id=user_id)
+            cache.add(version_key, 0, None)
+            _incr(version_key, 1)
+
+    transaction.on_commit(apply)
+
+
+def record_read(user_id, count=1):
+    if count and settings.CACHE_SHARED:
+        transaction.on_commit(lambda: _incr(UNREAD_KEY.format(user_id=user_id), -count))
+
+
+def reset_unread(user_id):
+    if settings.CACHE_SHARED:
+        transaction.on_commit(lambda: cache.set(UNREAD_KEY.format(user_id=user_id), 0, UNREAD_TIMEOUT))
+
+
+def invalidate(*user_ids):
+    if settings.CACHE_SHARED:
+        keys = [UNREAD_KEY.format(user_id=user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,137 @@
+"""
+Typed notification events and their dispatcher.
+
+Producers (signals, the booking state machine, schedulers) describe what
+happened as event objects and call dispatch(). Registered handlers turn
+each event into notifications and emails on a shared Batch, which is
+written with one INSERT per table (notifications, emails, SMS).
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import Notification
+from telecommunications.sms import queue_sms
+from .services import create_notifications, queue_emails
+
+
+@dataclass(frozen=True)
+class UserRegistered:
+    user_id: int
+    email: str
+    first_name: str
+    last_name: str
+
+
+@dataclass(frozen=True)
+class BookingCreated:
+    booking_id: int
+    user_id: int
+    user_email: str
+    user_first_name: str
+    user_last_name: str
+    doctor_user_id: int
+    doctor_email: str
+    doctor_last_name: str
+    appointment_date: date
+    appointment_time: time
+    status: str
+
+
+@dataclass(frozen=True)
+class BookingStatusChanged:
+    booking_id: int
+    user_id: int
+    doctor_user_id: int
+    status: str
+    appointment_date: date = None
+    appointment_time: time = None
+    phone_number: str = ''  # Patient's number, only when verified
+
+
+@dataclass(frozen=True)
+class BookingReminderDue:
+    booking_id: int
+    user_id: int
+    email: str
+    first_name: str
+    doctor_last_name: str
+    appointment_date: date
+    appointment_time: time
+    kind: str
+    phone_number: str = ''  # Only when verified
+
+
+@dataclass(frozen=True)
+class MembershipExpiring:
+    user_id: int
+    email: str
+    first_name: str
+    tier: str
+    end_date: datetime
+
+
+class Batch:
+    """
+    Collects the side effects of one dispatch() call.
+    """
+
+    def __init__(self):
+        self.notifications = []
+        self.emails = []
+        self.sms = []
+        self._admin_ids = None
+
+    @property
+    def admin_ids(self):
+        # Looked up at most once per dispatch, however many events need it
+        if self._admin_ids is None:
+            self._admin_ids = list(get_user_model().objects.filter(is_superuser=True).values_list('pk', flat=True))
+        return self._admin_ids
+
+    def notify(self, recipient_id, type, title, message, data=None):
+        if recipient_id:
+            self.notifications.append(Notification(
+                recipient_id=recipient_id, type=type, title=title, message=message, data=data,
+            ))
+
+    def email(self, to, subject, body):
+        if to:
+            self.emails.append((to, subject, body))
+
+    def text(self, to, body):
+        if to:
+            self.sms.append((to, body))
+
+    def flush(self):
+        with transaction.atomic():
+            create_notifications(self.notifications)
+            queue_emails(self.emails)
+            queue_sms(self.sms)
+        return self
+
+
+_handlers = {}
+
+
+def handler(event_type):
+    """
+    Register a function(event, batch) to run for every event of `event_type`.
+    """
+    def register(func):
+        _handlers.setdefault(event_type, []).append(func)
+        return func
+    return register
+
+
+def dispatch(*events):
+    """
+    Run the handlers for `events` and write everything they produced in one batch.
+    """
+    batch = Batch()
+    for event in events:
+        for func in _handlers.get(type(event), ()):
+            func(event, batch)
+    return batch.flush()
@@ -0,0 +1,96 @@
+from django.utils import timezone
+
+from .events import (
+    BookingCreated, BookingReminderDue, BookingStatusChanged, MembershipExpiring, UserRegistered, handler,
+)
+
+SIGN_OFF = '\n\nBest regards,\nThe MedMap Team'
+
+
+@handler(UserRegistered)
+def user_registered(event, batch):
+    batch.email(
+        event.email,
+        'Welcome to MedMap!',
+        f'Hi {event.first_name},\n\nWelcome to MedMap! We are excited to have you on board.{SIGN_OFF}',
+    )
+    for admin_id in batch.admin_ids:
+        batch.notify(
+            admin_id, 'user_registered', 'New User Registration',
+            f'New user registered: {event.first_name} {event.last_name} ({event.email})',
+            {'user_id': event.user_id},
+        )
+
+
+@handler(BookingCreated)
+def booking_created(event, batch):
+    when = f'{event.appointment_date} at {event.appointment_time}'
+    patient_name = f'{event.user_first_name} {event.user_last_name}'
+    batch.email(
+        event.user_email,
+        'Booking Confirmation',
+        f'Hi {event.user_first_name},\n\nYour appointment with Dr. {event.doctor_last_name} on {when} has been booked.\n\nStatus: {event.status}{SIGN_OFF}',
+    )
+    batch.email(
+        event.doctor_email,
+        'New Appointment Booking',
+        f'Hi Dr. {event.doctor_last_name},\n\nYou have a new appointment with {patient_name} on {when}.{SIGN_OFF}',
+    )
+    data = {'booking_id': event.booking_id}
+    for admin_id in batch.admin_ids:
+        batch.notify(
+            admin_id, 'booking_created', 'New Booking',
+            f'New booking: {event.user_first_name} with Dr. {event.doctor_last_name}', data,
+        )
+    batch.notify(
+        event.doctor_user_id, 'booking_created', 'New Appointment',
+        f'New appointment with {patient_name}', data,
+    )
+
+
+@handler(BookingStatusChanged)
+def booking_status_changed(event, batch):
+    data = {'booking_id': event.booking_id}
+    if event.status == 'confirmed':
+        batch.notify(event.user_id, 'booking_approved', 'Booking Confirmed', 'Your booking has been confirmed.', data)
+        if event.appointment_date:
+            batch.text(
+                event.phone_number,
+                f'MedMap: your appointment on {event.appointment_date:%d %b} at {event.appointment_time:%H:%M} is confirmed.',
+            )
+    elif event.status == 'cancelled':
+        batch.notify(event.user_id, 'booking_cancelled', 'Booking Cancelled', 'Your booking was cancelled.', data)
+        batch.notify(event.doctor_user_id, 'booking_cancelled', 'Booking Cancelled', 'A booking with you was cancelled.', data)
+
+
+@handler(BookingReminderDue)
+def booking_reminder_due(event, batch):
+    when = f'{event.appointment_date:%d %B %Y} at {event.appointment_time:%H:%M}'
+    batch.notify(
+        event.user_id, 'booking_reminder', 'Appointment Reminder',
+        f'Reminder: your appointment with Dr. {event.doctor_last_name} is on {when}.',
+        {'booking_id': event.booking_id, 'kind': event.kind},
+    )
+    batch.email(
+        event.email,
+        'Appointment Reminder',
+        f'Hi {event.first_name},\n\nThis is a reminder of your appointment with Dr. {event.doctor_last_name} on {when}.{SIGN_OFF}',
+    )
+    batch.text(
+        event.phone_number,
+        f'MedMap reminder: appointment with Dr. {event.doctor_last_name} on {event.appointment_date:%d %b} at {event.appointment_time:%H:%M}.',
+    )
+
+
+@handler(MembershipExpiring)
+def membership_expiring(event, batch):
+    batch.notify(
+        event.user_id, 'membership_expiring', 'Membership Renewal',
+        'Your MedMap membership expires soon. Renew to keep your benefits.',
+    )
+    batch.email(
+        event.email,
+        'Your MedMap membership is expiring',
+        f'Hi {event.first_name},\n\nYour {event.tier} membership expires on {timezone.localtime(event.end_date):%d %B %Y}. '
+        f'Renew now to keep your benefits.{SIGN_OFF}',
+    )
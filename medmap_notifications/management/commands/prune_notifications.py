@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from medmap_notifications.models import Notification
+
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'type', 'title', 'message', 'read', 'created_at', 'data')
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the notification retention policy: archive notifications older than '
+        '--archive-days to gzipped JSONL, and delete read notifications older than --read-days'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int, default=90, help='Delete read notifications older than this')
+        parser.add_argument('--archive-days', type=int, default=365, help='Archive and delete all notifications older than this (0 disables)')
+        parser.add_argument('--archive-dir', default=os.path.join(settings.BASE_DIR, 'archive', 'notifications'))
+        parser.add_argument('--batch-size', type=int, default=5000, help='Primary-key range deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be removed without deleting')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        now = timezone.now()
+
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing will be archived or deleted'))
+
+        read_cutoff = now - timedelta(days=options['read_days'])
+        read_expired = Notification.objects.filter(created_at__lt=read_cutoff, read=True)
+
+        if options['archive_days']:
+            cutoff = now - timedelta(days=options['archive_days'])
+            # Anything older is handled (and counted) by the archive pass
+            read_expired = read_expired.filter(created_at__gte=cutoff)
+            archive_path = None
+            if not self.dry_run:
+                os.makedirs(options['archive_dir'], exist_ok=True)
+                archive_path = os.path.join(options['archive_dir'], f"notifications-{now:%Y%m%dT%H%M%S}.jsonl.gz")
+            archived = self.prune(Notification.objects.filter(created_at__lt=cutoff), archive_path)
+            self.stdout.write(f"Archived {archived} notification(s) older than {options['archive_days']} days")
+            if archived and archive_path:
+                self.stdout.write(f"  -> {archive_path}")
+
+        deleted = self.prune(read_expired)
+        self.stdout.write(f"Deleted {deleted} read notification(s) older than {options['read_days']} days")
+
+    def prune(self, queryset, archive_path=None):
+        """
+        Delete `queryset` in consecutive primary-key ranges so each DELETE
+        touches at most batch_size rows and holds its locks briefly.
+        Rows are appended to `archive_path` before they are deleted.
+        """
+        bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return 0
+
+        archive = gzip.open(archive_path, 'at', encoding='utf-8') if archive_path else None
+        total = 0
+        try:
+            for start in range(bounds['low'], bounds['high'] + 1, self.batch_size):
+                window = queryset.filter(pk__gte=start, pk__lt=start + self.batch_size)
+                if self.dry_run:
+                    total += window.count()
+                    continue
+
+                if archive:
+                    for row in window.values(*ARCHIVE_FIELDS):
+                        archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                    archive.flush()
+
+                # Unread counters are invalidated by the post_delete receiver
+                deleted, _ = window.delete()
+                total += deleted
+        finally:
+            if archive:
+                archive.close()
+        return total
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medmap_notifications', '0002_alter_notification_type_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('booking_created', 'Booking Created'), ('booking_approved', 'Booking Approved'), ('booking_cancelled', 'Booking Cancelled'), ('booking_reminder', 'Booking Reminder'), ('user_registered', 'User Registered'), ('doctor_approved', 'Doctor Approved'), ('membership_expiring', 'Membership Expiring'), ('system', 'System')], default='system', max_length=50),
+        ),
+    ]
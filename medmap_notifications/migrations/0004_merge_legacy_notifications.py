@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The legacy `notifications` app was never installed, so there is no
+    # notifications_notification table to merge. Kept empty because later
+    # migrations depend on it and databases may have recorded it as applied.
+
+    dependencies = [
+        ('medmap_notifications', '0003_alter_notification_type'),
+    ]
+
+    operations = []
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medmap_notifications', '0004_merge_legacy_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='medmap_noti_created_c85e92_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.3 on 2026-10-19 12:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medmap_notifications', '0005_notification_medmap_noti_created_c85e92_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboundemail',
+            name='medmap_noti_status_21203a_idx',
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='medmap_noti_status_6d263b_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class Notification(models.Model):
@@ -7,8 +8,10 @@ class Notification(models.Model):
         ('booking_created', 'Booking Created'),
         ('booking_approved', 'Booking Approved'),
         ('booking_cancelled', 'Booking Cancelled'),
+        ('booking_reminder', 'Booking Reminder'),
         ('user_registered', 'User Registered'),
         ('doctor_approved', 'Doctor Approved'),
+        ('membership_expiring', 'Membership Expiring'),
         ('system', 'System'),
     )
 
@@ -22,6 +25,41 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.type} - {self.recipient}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Outbox for transactional email. Rows are queued inside the request or
+    job that produces them and delivered in batches by send_queued_emails.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a queued email is due, or when a 'sending' claim expires
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
@@ -0,0 +1,191 @@
+"""
+Lightweight publish/subscribe for pushing events to connected users.
+
+The backend is chosen with settings.NOTIFICATIONS_PUBSUB_BACKEND:
+RedisBroker when REDIS_URL is set, which reaches subscribers in every
+process, otherwise InProcessBroker, which only reaches the publishing
+process. Streams on a broker that isn't `cross_process` also poll the
+database, so notifications and booking changes made elsewhere still arrive.
+
+Async streams (under ASGI) use asubscribe(); their messages are handed to
+the event loop instead of a thread-blocking queue.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'medmap_notifications.pubsub.InProcessBroker'
+
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.SimpleQueue()
+
+    def get(self, timeout=None):
+        """
+        Return the next (event, data) message, or None after `timeout` seconds.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, message):
+        self.queue.put(message)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncSubscription(Subscription):
+    """
+    A subscription read from an event loop. Must be created on that loop.
+    """
+
+    def __init__(self, broker, user_id):
+        super().__init__(broker, user_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def put(self, message):
+        # Publishers run in other threads
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBroker:
+    """
+    Fan-out to subscribers of the current process.
+    Other backends must implement subscribe(), asubscribe(), unsubscribe() and publish(),
+    and set `cross_process` if publish() reaches other processes.
+    """
+    cross_process = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id, subscription_class=Subscription):
+        subscription = subscription_class(self, user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def asubscribe(self, user_id):
+        return self.subscribe(user_id, AsyncSubscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event, data):
+        self.deliver(user_id, event, data)
+
+    def deliver(self, user_id, event, data):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put((event, data))
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through a Redis channel that every process listens on. Each
+    process runs one listener thread, started by its first subscriber, that
+    hands messages to the local subscriptions.
+    """
+    cross_process = True
+    CHANNEL = 'notifications:events'
+    RECONNECT_SECONDS = 1
+
+    def __init__(self):
+        super().__init__()
+        import redis
+        self.redis = redis.Redis.from_url(settings.REDIS_URL)
+        self._listener = None
+
+    def subscribe(self, user_id, subscription_class=Subscription):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='pubsub-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id, subscription_class)
+
+    def publish(self, user_id, event, data):
+        self.redis.publish(self.CHANNEL, json.dumps([user_id, event, data], cls=DjangoJSONEncoder))
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    self.deliver(*json.loads(message['data']))
+            except Exception:
+                # Streams still catch up on notifications from the database meanwhile
+                logger.exception("Notification pub/sub listener lost its connection")
+                time.sleep(self.RECONNECT_SECONDS)
+
+
+@lru_cache(maxsize=1)
+def get_broker():
+    return import_string(getattr(settings, 'NOTIFICATIONS_PUBSUB_BACKEND', DEFAULT_BACKEND))()
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    if setting == 'NOTIFICATIONS_PUBSUB_BACKEND':
+        get_broker.cache_clear()
+
+
+def publish_on_commit(messages):
+    """
+    Publish (user_id, event, data) messages once the current transaction commits.
+    """
+    messages = [message for message in messages if message[0]]
+    if not messages:
+        return
+
+    def publish():
+        broker = get_broker()
+        for user_id, event, data in messages:
+            broker.publish(user_id, event, data)
+
+    transaction.on_commit(publish)
@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import counters
+from .models import Notification, OutboundEmail
+from .pubsub import publish_on_commit
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+MAX_EMAIL_ATTEMPTS = 3
+# A batch still 'sending' after this long belongs to a worker that died; it is picked up again
+EMAIL_CLAIM_TIMEOUT = timedelta(minutes=10)
+# Wait before retry n (1-based), so a short SMTP outage doesn't use up every attempt
+EMAIL_RETRY_DELAYS = (timedelta(minutes=1), timedelta(minutes=10))
+
+
+def create_notifications(notifications):
+    """
+    Insert a batch of prepared (unsaved) Notification instances.
+    """
+    created = Notification.objects.bulk_create(notifications)
+    counters.record_created(notification.recipient_id for notification in created)
+    publish_on_commit(
+        (notification.recipient_id, 'notification', NotificationSerializer(notification).data)
+        for notification in created
+    )
+    return created
+
+
+def queue_emails(messages):
+    """
+    Queue (to, subject, body) tuples in the outbox with one INSERT.
+    Messages without a recipient address are dropped.
+    """
+    emails = [
+        OutboundEmail(to=to, subject=subject, body=body)
+        for to, subject, body in messages
+        if to
+    ]
+    return OutboundEmail.objects.bulk_create(emails)
+
+
+def send_queued_emails(batch_size=100):
+    """
+    Deliver one batch of due emails over a single SMTP connection.
+    Returns (sent, failed) counts. Failed emails are retried after
+    EMAIL_RETRY_DELAYS until MAX_EMAIL_ATTEMPTS is reached.
+    """
+    now = timezone.now()
+    # Claims left behind by a worker that died mid-batch, with no attempts left
+    OutboundEmail.objects.filter(
+        status='sending', next_attempt_at__lte=now, attempts__gte=MAX_EMAIL_ATTEMPTS,
+    ).update(status='failed', error='Delivery was interrupted')
+
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=('queued', 'sending'), next_attempt_at__lte=now)
+            .order_by('pk')[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+        # The claim is a lease: next_attempt_at is when another worker may take the batch over
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status='sending', attempts=F('attempts') + 1, next_attempt_at=now + EMAIL_CLAIM_TIMEOUT,
+        )
+
+    sent_ids = []
+    failed = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.to],
+                connection=connection,
+            )
+            try:
+                message.send()
+                sent_ids.append(email.pk)
+            except Exception as e:
+                schedule_retry(email, e)
+                failed.append(email)
+    except Exception as e:
+        # Could not connect at all: put the remainder of the batch back
+        logger.error(f"Error opening email connection: {e}")
+        pending = {email.pk for email in failed} | set(sent_ids)
+        for email in emails:
+            if email.pk not in pending:
+                schedule_retry(email, e)
+                failed.append(email)
+    finally:
+        connection.close()
+
+    if sent_ids:
+        OutboundEmail.objects.filter(pk__in=sent_ids).update(status='sent', sent_at=timezone.now(), error='')
+    if failed:
+        OutboundEmail.objects.bulk_update(failed, ['status', 'error', 'next_attempt_at'])
+
+    return len(sent_ids), len(failed)
+
+
+def schedule_retry(email, error):
+    # email.attempts is the count before this batch's claim
+    attempts = email.attempts + 1
+    email.error = str(error)
+    if attempts < MAX_EMAIL_ATTEMPTS:
+        email.status = 'queued'
+        email.next_attempt_at = timezone.now() + EMAIL_RETRY_DELAYS[min(attempts, len(EMAIL_RETRY_DELAYS)) - 1]
+    else:
+        email.status = 'failed'
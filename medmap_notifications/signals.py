@@ -1,97 +1,73 @@
-from django.db.models.signals import post_save
+import logging
+
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from bookings.models import Booking
+from . import counters
+from .events import BookingCreated, UserRegistered, dispatch
 from .models import Notification
+from .pubsub import publish_on_commit
+from .serializers import NotificationSerializer
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=User)
 def user_created(sender, instance, created, **kwargs):
-    if kwargs.get('raw', False):
+    if kwargs.get('raw', False) or not created:
         return
 
-    if created:
-        # 1. Welcome Email to User
-        try:
-            send_mail(
-                subject='Welcome to MedMap!',
-                message=f'Hi {instance.first_name},\n\nWelcome to MedMap! We are excited to have you on board.\n\nBest regards,\nThe MedMap Team',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Failed to send welcome email: {e}")
+    try:
+        dispatch(UserRegistered(
+            user_id=instance.id,
+            email=instance.email,
+            first_name=instance.first_name,
+            last_name=instance.last_name,
+        ))
+    except Exception as e:
+        logger.error(f"Failed to dispatch user registration notifications: {e}")
 
-        # 2. Notification to Admin
-        try:
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    recipient=admin,
-                    type='user_registered',
-                    title='New User Registration',
-                    message=f'New user registered: {instance.first_name} {instance.last_name} ({instance.email})',
-                    data={'user_id': instance.id}
-                )
-        except Exception as e:
-            print(f"Failed to create admin notification for user registration: {e}")
 
 @receiver(post_save, sender=Booking)
 def booking_created(sender, instance, created, **kwargs):
-    if kwargs.get('raw', False):
+    if kwargs.get('raw', False) or not created:
         return
 
-    if created:
-        # 1. Email to Patient
-        try:
-            send_mail(
-                subject='Booking Confirmation',
-                message=f'Hi {instance.user.first_name},\n\nYour appointment with Dr. {instance.doctor.user.last_name} on {instance.appointment_date} at {instance.appointment_time} has been booked.\n\nStatus: {instance.status}\n\nBest regards,\nThe MedMap Team',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.user.email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Failed to send booking email to patient: {e}")
+    try:
+        patient = instance.user
+        doctor_user = instance.doctor.user
+        dispatch(BookingCreated(
+            booking_id=instance.id,
+            user_id=patient.id,
+            user_email=patient.email,
+            user_first_name=patient.first_name,
+            user_last_name=patient.last_name,
+            doctor_user_id=doctor_user.id,
+            doctor_email=doctor_user.email,
+            doctor_last_name=doctor_user.last_name,
+            appointment_date=instance.appointment_date,
+            appointment_time=instance.appointment_time,
+            status=instance.status,
+        ))
+    except Exception as e:
+        logger.error(f"Failed to dispatch booking notifications: {e}")
+
 
-        # 2. Email to Doctor
-        try:
-            send_mail(
-                subject='New Appointment Booking',
-                message=f'Hi Dr. {instance.doctor.user.last_name},\n\nYou have a new appointment with {instance.user.first_name} {instance.user.last_name} on {instance.appointment_date} at {instance.appointment_time}.\n\nBest regards,\nThe MedMap Team',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.doctor.user.email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Failed to send booking email to doctor: {e}")
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    # Bulk inserts and bulk updates maintain the counters themselves
+    if created:
+        if not instance.read:
+            counters.record_created([instance.recipient_id])
+        publish_on_commit([(instance.recipient_id, 'notification', NotificationSerializer(instance).data)])
+    else:
+        counters.invalidate(instance.recipient_id)
 
-        # 3. Notification to Admin
-        try:
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    recipient=admin,
-                    type='booking_created',
-                    title='New Booking',
-                    message=f'New booking: {instance.user.first_name} with Dr. {instance.doctor.user.last_name}',
-                    data={'booking_id': instance.id}
-                )
-        except Exception as e:
-            print(f"Failed to create admin notification: {e}")
 
-        # 4. In-app Notification to Doctor
-        try:
-            Notification.objects.create(
-                recipient=instance.doctor.user,
-                type='booking_created',
-                title='New Appointment',
-                message=f'New appointment with {instance.user.first_name} {instance.user.last_name}',
-                data={'booking_id': instance.id}
-            )
-        except Exception as e:
-            print(f"Failed to create doctor notification: {e}")
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # Every delete path: the API, admin and cascade deletes, prune_notifications
+    if not instance.read:
+        counters.invalidate(instance.recipient_id)
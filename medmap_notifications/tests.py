@@ -1,3 +1,286 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from bookings.models import Booking
+from bookings.transitions import bulk_transition
+from doctors.models import Doctor
+from telecommunications.models import OutboundSMS
+from users.tokens import RoleRefreshToken
+from . import counters, events, handlers
+from .events import BookingReminderDue, UserRegistered
+from .models import Notification, OutboundEmail
+from .views import BookingWatch
+from .services import EMAIL_CLAIM_TIMEOUT, MAX_EMAIL_ATTEMPTS, create_notifications, queue_emails, send_queued_emails
+
+
+class SendQueuedEmailsTests(TestCase):
+    def test_sends_queued_emails(self):
+        queue_emails([('a@example.com', 'Hello', 'Body'), ('', 'Dropped', 'No address')])
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+
+    def test_failed_email_waits_before_retrying(self):
+        queue_emails([('a@example.com', 'Hello', 'Body')])
+        with mock.patch.object(EmailMessage, 'send', side_effect=OSError('refused')):
+            self.assertEqual(send_queued_emails(), (0, 1))
+            # Not due yet, so the same run doesn't burn the next attempt
+            self.assertEqual(send_queued_emails(), (0, 0))
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.error), ('queued', 1, 'refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), (1, 0))
+
+    def test_last_attempt_fails_the_email(self):
+        queue_emails([('a@example.com', 'Hello', 'Body')])
+        OutboundEmail.objects.update(attempts=MAX_EMAIL_ATTEMPTS - 1)
+        with mock.patch.object(EmailMessage, 'send', side_effect=OSError('refused')):
+            self.assertEqual(send_queued_emails(), (0, 1))
+        self.assertEqual(OutboundEmail.objects.get().status, 'failed')
+
+    def test_stale_claim_is_taken_over(self):
+        queue_emails([('a@example.com', 'Hello', 'Body')])
+        OutboundEmail.objects.update(status='sending', attempts=1, next_attempt_at=timezone.now() + EMAIL_CLAIM_TIMEOUT)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_emails(), (1, 0))
+        self.assertEqual(OutboundEmail.objects.get().attempts, 2)
+
+    def test_stale_claim_without_attempts_left_fails(self):
+        queue_emails([('a@example.com', 'Hello', 'Body')])
+        OutboundEmail.objects.update(
+            status='sending', attempts=MAX_EMAIL_ATTEMPTS, next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(send_queued_emails(), (0, 0))
+        self.assertEqual(OutboundEmail.objects.get().status, 'failed')
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='patient', password='x')
+
+    def notification(self):
+        return Notification(recipient=self.user, title='Booking confirmed', message='See you soon')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_without_shared_cache_reads_the_database(self):
+        self.assertEqual((counters.get_unread_count(self.user.pk), counters.get_version(self.user.pk)), (0, 0))
+        # As if another process had created it: nothing here hears about it
+        Notification.objects.bulk_create([self.notification()])
+        self.assertEqual(counters.get_unread_count(self.user.pk), 1)
+        self.assertEqual(counters.get_version(self.user.pk), Notification.objects.get().pk)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_with_shared_cache_adjusts_cached_values(self):
+        self.assertEqual(counters.get_unread_count(self.user.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_notifications([self.notification(), self.notification()])
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_unread_count(self.user.pk), 2)
+            self.assertEqual(counters.get_version(self.user.pk), 1)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_deletes_invalidate_the_unread_count(self):
+        notification = Notification.objects.create(recipient=self.user, title='Reminder', message='Tomorrow at 9')
+        old = Notification.objects.create(recipient=self.user, title='Welcome', message='Hello')
+        Notification.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(counters.get_unread_count(self.user.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.delete()
+        self.assertEqual(counters.get_unread_count(self.user.pk), 1)
+
+        with tempfile.TemporaryDirectory() as archive_dir, self.captureOnCommitCallbacks(execute=True):
+            call_command('prune_notifications', archive_dir=archive_dir, stdout=mock.Mock())
+        self.assertEqual(counters.get_unread_count(self.user.pk), 0)
+
+
+class StreamTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.patient = User.objects.create_user(username='patient', password='x', is_patient=True)
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='doctor', password='x', is_doctor=True),
+            speciality='GP', city='Durban', province='KZN',
+        )
+        self.booking = Booking.objects.create(
+            user=self.patient, doctor=doctor,
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9),
+        )
+        self.access = str(RoleRefreshToken.for_user(self.patient).access_token)
+
+    def ticket(self):
+        response = self.client.post('/api/notifications/stream/ticket/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['ticket']
+
+    def test_stream_opens_with_a_ticket(self):
+        response = self.client.get(f'/api/notifications/stream/?ticket={self.ticket()}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(next(iter(response.streaming_content)), b'retry: 3000\n\n')
+        response.close()
+
+    def test_tokens_are_not_interchangeable(self):
+        response = self.client.get(f'/api/notifications/stream/?ticket={self.access}')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/api/notifications/notifications/', HTTP_AUTHORIZATION=f'Bearer {self.ticket()}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_booking_watch_reports_changes_once(self):
+        watch = BookingWatch(self.patient.pk)
+        self.assertEqual(watch.changes(), [])
+
+        bulk_transition(Booking.objects.filter(pk=self.booking.pk), 'confirmed')
+        self.assertEqual(watch.changes(), [{'id': self.booking.pk, 'status': 'confirmed', 'payment_status': 'unpaid'}])
+        self.assertEqual(watch.changes(), [])
+
+        # Already delivered through the broker
+        watch.seen({'id': self.booking.pk, 'status': 'completed'})
+        bulk_transition(Booking.objects.filter(pk=self.booking.pk), 'completed')
+        self.assertEqual(watch.changes(), [])
+
+    @mock.patch('medmap_notifications.views.THREADED_MAX_WAIT_SECONDS', 0.2)
+    def test_long_poll_is_capped_on_thread_workers(self):
+        # The test client makes WSGI requests, as gthread workers do
+        started = time.monotonic()
+        response = self.client.get('/api/notifications/unread_count/?wait=30', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+
+class LongPollTests(TransactionTestCase):
+    # Each ASGI request runs its database work on its own thread and connection
+    def setUp(self):
+        cache.clear()
+        self.patient = get_user_model().objects.create_user(username='patient', password='x', is_patient=True)
+        self.access = str(RoleRefreshToken.for_user(self.patient).access_token)
+
+    @override_settings(CACHE_SHARED=False)
+    async def test_long_poll_wakes_on_the_broker(self):
+        async def notify():
+            await asyncio.sleep(0.2)
+            # Not thread-sensitive: that thread is busy serving the request
+            await sync_to_async(create_notifications, thread_sensitive=False)([
+                Notification(recipient=self.patient, title='Booking confirmed', message='See you soon'),
+            ])
+
+        started = time.monotonic()
+        with mock.patch.object(counters, 'get_version', wraps=counters.get_version) as get_version:
+            response, _ = await asyncio.gather(
+                self.async_client.get(
+                    '/api/notifications/unread_count/?wait=20', headers={'Authorization': f'Bearer {self.access}'},
+                ),
+                notify(),
+            )
+        self.assertEqual(response.json()['unread_count'], 1)
+        self.assertLess(time.monotonic() - started, 3)
+        # Woken by the broker, not by polling the database every POLL_INTERVAL_SECONDS
+        self.assertEqual(get_version.call_count, 2)
+
+    @override_settings(CACHE_SHARED=False)
+    async def test_database_version_is_checked_sparingly(self):
+        with mock.patch.object(counters, 'get_version', wraps=counters.get_version) as get_version:
+            response = await self.async_client.get(
+                '/api/notifications/unread_count/?wait=1', headers={'Authorization': f'Bearer {self.access}'},
+            )
+        self.assertEqual(response.json(), {'unread_count': 0, 'version': 0})
+        # Once on arrival and once when the wait runs out
+        self.assertEqual(get_version.call_count, 2)
+
+
+@dataclass(frozen=True)
+class Pinged:
+    user_id: int
+
+
+class EventsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create_user(username=f'patient{i}', email=f'patient{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        User.objects.create_user(username='admin', password='x', is_staff=True, is_superuser=True)
+        # Drop what registering them produced
+        Notification.objects.all().delete()
+        OutboundEmail.objects.all().delete()
+
+    def reminder(self, user, phone_number=''):
+        return BookingReminderDue(
+            booking_id=1, user_id=user.pk, email=user.email, first_name='Pat', doctor_last_name='Khumalo',
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9), kind='24h',
+            phone_number=phone_number,
+        )
+
+    def test_handlers_are_registered(self):
+        self.assertEqual(events._handlers[BookingReminderDue], [handlers.booking_reminder_due])
+        self.assertEqual(events._handlers[UserRegistered], [handlers.user_registered])
+
+    def test_handlers_run_in_registration_order_on_one_batch(self):
+        calls = []
+        with mock.patch.dict(events._handlers):
+            @events.handler(Pinged)
+            def first(event, batch):
+                calls.append(('first', event, batch))
+                batch.notify(event.user_id, 'general', 'Ping', 'First')
+
+            @events.handler(Pinged)
+            def second(event, batch):
+                calls.append(('second', event, batch))
+
+            batch = events.dispatch(Pinged(self.users[0].pk), Pinged(self.users[1].pk))
+        self.assertNotIn(Pinged, events._handlers)
+
+        self.assertEqual(
+            [(name, event) for name, event, _ in calls],
+            [('first', Pinged(self.users[0].pk)), ('second', Pinged(self.users[0].pk)),
+             ('first', Pinged(self.users[1].pk)), ('second', Pinged(self.users[1].pk))],
+        )
+        self.assertTrue(all(call[2] is batch for call in calls))
+        self.assertEqual(Notification.objects.filter(type='general').count(), 2)
+
+    def test_events_without_handlers_write_nothing(self):
+        batch = events.dispatch(Pinged(self.users[0].pk))
+        self.assertEqual((batch.notifications, batch.emails, batch.sms), ([], [], []))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_batch_writes_one_insert_per_table(self):
+        reminders = [self.reminder(user, phone_number='+27820000002' if i else '') for i, user in enumerate(self.users)]
+        # SAVEPOINT, one INSERT each for notifications, emails and SMS, RELEASE
+        with self.assertNumQueries(5):
+            batch = events.dispatch(*reminders)
+        self.assertEqual((len(batch.notifications), len(batch.emails), len(batch.sms)), (3, 3, 2))
+        self.assertEqual(Notification.objects.filter(type='booking_reminder').count(), 3)
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+        self.assertEqual(OutboundSMS.objects.count(), 2)
+
+    def test_admins_are_looked_up_once_per_dispatch(self):
+        registered = [
+            UserRegistered(user_id=user.pk, email=user.email, first_name='Pat', last_name='Doe') for user in self.users
+        ]
+        # The admin lookup, then SAVEPOINT, notifications, emails, RELEASE (no SMS to insert)
+        with self.assertNumQueries(5):
+            events.dispatch(*registered)
+        self.assertEqual(Notification.objects.filter(type='user_registered').count(), 3)
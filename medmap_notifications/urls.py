@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificationViewSet
+from .views import NotificationStreamView, NotificationViewSet, StreamTicketView, UnreadCountView
 
 router = DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    path('stream/', NotificationStreamView.as_view(), name='notification-stream'),
+    path('stream/ticket/', StreamTicketView.as_view(), name='notification-stream-ticket'),
+    path('unread_count/', UnreadCountView.as_view(), name='notification-unread-count'),
+    path('notifications/unread_count/', UnreadCountView.as_view()),
     path('', include(router.urls)),
 ]
@@ -1,24 +1,294 @@
-from rest_framework import viewsets, permissions, status
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, permissions, renderers
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from bookings.models import Booking
+from core.async_views import AsyncAPIView, json_response
+from core.authentication import JWT_ONLY
+from users.authentication import StreamTicketAuthentication
+from users.tokens import StreamTicket
+from . import counters
 from .models import Notification
+from .pubsub import get_broker
 from .serializers import NotificationSerializer
 
+MAX_WAIT_SECONDS = 30
+POLL_INTERVAL_SECONDS = 0.5
+# Without a shared cache each version check is a database aggregate, so held requests check less often
+DB_POLL_INTERVAL_SECONDS = 5
+
+STREAM_SECONDS = 300
+# On thread workers (WSGI) a held request holds one of the worker's few threads, so holds are short there
+THREADED_MAX_WAIT_SECONDS = 5
+THREADED_STREAM_SECONDS = 25
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_RETRY_MS = 3000
+
+
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Only paginates when ?limit= is given, so existing clients still get a plain list
+    pagination_class = LimitOffsetPagination
+    # Reads authenticate from token claims (see users.authentication)
+    stateless_auth = True
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient_id=self.request.user.pk)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.read = True
-        notification.save()
+        if Notification.objects.filter(pk=notification.pk, read=False).update(read=True):
+            counters.record_read(request.user.pk)
         return Response({'status': 'marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().update(read=True)
+        self.get_queryset().filter(read=False).update(read=True)
+        counters.reset_unread(request.user.pk)
         return Response({'status': 'all marked as read'})
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class NotificationStreamView(APIView):
+    """
+    Server-Sent Events stream of the user's new notifications ("notification")
+    and booking status changes ("booking").
+
+    Messages arrive through the pub/sub broker. Notifications the broker
+    missed are picked up from the database when the user's version changes;
+    with a broker that doesn't reach other processes, booking changes are
+    polled from the database too. The stream ends after STREAM_SECONDS (or
+    THREADED_STREAM_SECONDS when it holds a worker thread) and EventSource
+    reconnects, resuming from the Last-Event-ID header.
+
+    EventSource can't send an Authorization header: browsers POST to
+    stream/ticket/ and open stream/?ticket=. A ticket lasts 60 seconds, so
+    the automatic reconnect fails once it has expired; clients should close
+    the EventSource on error and reopen it with a fresh ticket.
+    """
+    authentication_classes = [*JWT_ONLY, StreamTicketAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [renderers.JSONRenderer, EventStreamRenderer]
+    stateless_auth = True
+
+    def get(self, request):
+        user_id = request.user.pk
+        last_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_id')
+        if last_id and last_id.isdigit():
+            last_id = int(last_id)
+        else:
+            last_id = Notification.objects.filter(recipient_id=user_id).aggregate(last=Max('pk'))['last'] or 0
+
+        # Django buffers a generator of the other kind whole, which would never end
+        events = self.astream(user_id, last_id) if isinstance(request._request, ASGIRequest) else self.stream(user_id, last_id)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream(self, user_id, last_id):
+        broker = get_broker()
+        bookings = None if broker.cross_process else BookingWatch(user_id)
+        with broker.subscribe(user_id) as subscription:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            version = counters.get_version(user_id)
+            started = last_beat = time.monotonic()
+
+            while time.monotonic() - started < THREADED_STREAM_SECONDS:
+                message = subscription.get(timeout=POLL_INTERVAL_SECONDS * 2)
+                if message:
+                    event, data = message
+                    if event == 'notification':
+                        if data['id'] <= last_id:
+                            continue
+                        last_id = data['id']
+                        yield format_event(event, data, event_id=last_id)
+                    else:
+                        if bookings and event == 'booking':
+                            bookings.seen(data)
+                        yield format_event(event, data)
+                    last_beat = time.monotonic()
+                    continue
+
+                current = counters.get_version(user_id)
+                if current != version:
+                    version = current
+                    for last_id, data in missed_notifications(user_id, last_id):
+                        yield format_event('notification', data, event_id=last_id)
+                        last_beat = time.monotonic()
+
+                if bookings:
+                    for data in bookings.changes():
+                        yield format_event('booking', data)
+                        last_beat = time.monotonic()
+
+                if time.monotonic() - last_beat >= STREAM_HEARTBEAT_SECONDS:
+                    last_beat = time.monotonic()
+                    yield ": keepalive\n\n"
+
+    async def astream(self, user_id, last_id):
+        """
+        stream() for ASGI servers. Waiting for messages holds no thread;
+        only the cache and database reads run in one.
+        """
+        get_version = sync_to_async(counters.get_version)
+        broker = get_broker()
+        bookings = None if broker.cross_process else BookingWatch(user_id)
+        async with broker.asubscribe(user_id) as subscription:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            version = await get_version(user_id)
+            started = last_beat = time.monotonic()
+
+            while time.monotonic() - started < STREAM_SECONDS:
+                message = await subscription.get(timeout=POLL_INTERVAL_SECONDS * 2)
+                if message:
+                    event, data = message
+                    if event == 'notification':
+                        if data['id'] <= last_id:
+                            continue
+                        last_id = data['id']
+                        yield format_event(event, data, event_id=last_id)
+                    else:
+                        if bookings and event == 'booking':
+                            bookings.seen(data)
+                        yield format_event(event, data)
+                    last_beat = time.monotonic()
+                    continue
+
+                current = await get_version(user_id)
+                if current != version:
+                    version = current
+                    for last_id, data in await sync_to_async(missed_notifications)(user_id, last_id):
+                        yield format_event('notification', data, event_id=last_id)
+                        last_beat = time.monotonic()
+
+                if bookings:
+                    for data in await sync_to_async(bookings.changes)():
+                        yield format_event('booking', data)
+                        last_beat = time.monotonic()
+
+                if time.monotonic() - last_beat >= STREAM_HEARTBEAT_SECONDS:
+                    last_beat = time.monotonic()
+                    yield ": keepalive\n\n"
+
+
+class StreamTicketView(APIView):
+    """
+    Issue a StreamTicket for opening the notification stream from a browser.
+    """
+    authentication_classes = JWT_ONLY
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            'ticket': str(StreamTicket.for_token(request.auth)),
+            'expires_in': int(StreamTicket.lifetime.total_seconds()),
+        })
+
+
+def missed_notifications(user_id, last_id):
+    notifications = Notification.objects.filter(recipient_id=user_id, pk__gt=last_id).order_by('pk')[:50]
+    return [(notification.pk, NotificationSerializer(notification).data) for notification in notifications]
+
+
+class BookingWatch:
+    """
+    Booking status changes read from the database, for streams whose broker
+    doesn't reach this process. Changes the broker already delivered are
+    not repeated.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.since = timezone.now()
+        self.sent = {}
+
+    def seen(self, data):
+        self.sent[data['id']] = data['status']
+
+    def changes(self):
+        rows = (
+            Booking.objects
+            .filter(Q(user_id=self.user_id) | Q(doctor__user_id=self.user_id), updated_at__gt=self.since)
+            .order_by('updated_at')
+            .values('id', 'status', 'payment_status', 'updated_at')[:50]
+        )
+        changes = []
+        for row in rows:
+            self.since = row.pop('updated_at')
+            if self.sent.get(row['id']) != row['status']:
+                self.seen(row)
+                changes.append(row)
+        return changes
+
+
+class UnreadCountView(AsyncAPIView):
+    """
+    Unread badge, served from the cache when it is shared (see counters).
+    With ?wait=N (max 30, or 5 on thread workers) the request is held
+    until a new notification arrives or N seconds pass. Pass the last seen
+    `version` as ?since= to return immediately if something arrived in
+    between. Held requests wake on the pub/sub broker and otherwise check
+    the version every POLL_INTERVAL_SECONDS, or DB_POLL_INTERVAL_SECONDS
+    when that check is a database query.
+
+    Async so that held requests do not each pin a worker thread.
+    """
+    # Reads authenticate from token claims (see users.authentication)
+    stateless_auth = True
+
+    async def get(self, request):
+        user_id = request.user.pk
+        get_version = sync_to_async(counters.get_version)
+        version = await get_version(user_id)
+
+        try:
+            max_wait = MAX_WAIT_SECONDS if isinstance(request._request, ASGIRequest) else THREADED_MAX_WAIT_SECONDS
+            wait = min(float(request.query_params.get('wait', 0)), max_wait)
+        except ValueError:
+            return json_response({'error': 'wait must be a number'}, status=400)
+
+        if wait > 0:
+            since = request.query_params.get('since')
+            baseline = int(since) if since and since.isdigit() else version
+            deadline = time.monotonic() + wait
+            interval = POLL_INTERVAL_SECONDS if settings.CACHE_SHARED else DB_POLL_INTERVAL_SECONDS
+            # The broker wakes the request as soon as a notification is published where it can hear it;
+            # polling catches the rest
+            async with get_broker().asubscribe(user_id) as subscription:
+                while version == baseline and (remaining := deadline - time.monotonic()) > 0:
+                    await subscription.get(timeout=min(interval, remaining))
+                    version = await get_version(user_id)
+
+        unread_count = await sync_to_async(counters.get_unread_count)(user_id)
+        return json_response({'unread_count': unread_count, 'version': version})
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MembershipsConfig(AppConfig):
     name = 'memberships'
+
+    def ready(self):
+        import memberships.signals
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Membership
+
+CACHE_KEY = 'entitlements:{user_id}'
+PREMIUM_TIERS = ('premium', 'professional')
+
+
+class Entitlements:
+    """
+    Snapshot of a user's membership (tier, status, end_date).
+    Users without a Membership row get the free tier.
+    """
+    __slots__ = ('tier', 'status', 'end_date')
+
+    def __init__(self, tier='free', status=None, end_date=None):
+        self.tier = tier
+        self.status = status
+        self.end_date = end_date
+
+    @property
+    def is_active(self):
+        if self.status != 'active':
+            return False
+        return self.end_date is None or self.end_date > timezone.now()
+
+    @property
+    def effective_tier(self):
+        return self.tier if self.is_active else 'free'
+
+    @property
+    def is_premium(self):
+        return self.effective_tier in PREMIUM_TIERS
+
+    def has_tier(self, *tiers):
+        return self.effective_tier in tiers
+
+    def __repr__(self):
+        return f"<Entitlements {self.tier} {self.status} until {self.end_date}>"
+
+
+ANONYMOUS = Entitlements()
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def get_entitlements(user):
+    """
+    Return the user's Entitlements, hitting the database only on a cache miss.
+    Without a shared cache, a change made on another worker shows up here
+    within ENTITLEMENTS_CACHE_SECONDS.
+    """
+    if not user or not user.is_authenticated:
+        return ANONYMOUS
+
+    key = cache_key(user.pk)
+    values = cache.get(key)
+    if values is None:
+        row = Membership.objects.filter(user_id=user.pk).values_list('tier', 'status', 'end_date').first()
+        values = row or ('free', None, None)
+        cache.set(key, values, settings.ENTITLEMENTS_CACHE_SECONDS)
+    return Entitlements(*values)
+
+
+def invalidate_entitlements(*user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
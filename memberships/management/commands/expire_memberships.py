@@ -0,0 +1,28 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from memberships.services import RENEWAL_REMINDER_DAYS, expire_lapsed_memberships, send_renewal_reminders
+
+
+class Command(BaseCommand):
+    help = 'Expire lapsed memberships and queue renewal reminders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--remind-days', type=int, default=RENEWAL_REMINDER_DAYS, help='Days before end_date to send a renewal reminder')
+        parser.add_argument('--loop', action='store_true', help='Run the sweep repeatedly until interrupted')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between sweeps when looping')
+
+    def handle(self, *args, **options):
+        remind_before = timedelta(days=options['remind_days'])
+        while True:
+            expired = expire_lapsed_memberships(batch_size=options['batch_size'])
+            reminded = send_renewal_reminders(remind_before=remind_before, batch_size=options['batch_size'])
+            if expired or reminded or not options['loop']:
+                self.stdout.write(f"Expired {expired} membership(s), queued {reminded} renewal reminder(s)")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .entitlements import get_entitlements
+
+
+class EntitlementsMiddleware:
+    """
+    Exposes request.entitlements, resolved lazily on first access so
+    requests that never check a tier pay nothing. DRF views see it too,
+    after their own authentication has set request.user.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Nothing here blocks, so the async path is the same code
+        request.entitlements = SimpleLazyObject(lambda: get_entitlements(request.user))
+        return self.get_response(request)
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memberships', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membership',
+            name='renewal_reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['status', 'end_date'], name='memberships_status_e653e8_idx'),
+        ),
+    ]
@@ -0,0 +1,11 @@
+from rest_framework import permissions
+
+
+class IsPremiumMember(permissions.BasePermission):
+    """
+    Allows access only to users with an active premium or professional membership.
+    """
+    message = 'An active premium membership is required.'
+
+    def has_permission(self, request, view):
+        return request.entitlements.is_premium
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from medmap_notifications.events import MembershipExpiring, dispatch
+from .entitlements import invalidate_entitlements
+from .models import Membership
+
+RENEWAL_REMINDER_DAYS = 7
+# Paid memberships are quarterly
+MEMBERSHIP_PERIOD = timedelta(days=90)
+
+
+def expire_lapsed_memberships(now=None, batch_size=1000):
+    """
+    Flip active memberships past their end_date to 'expired'.
+    Each batch is a bounded primary-key SELECT on the (status, end_date)
+    index followed by one UPDATE, so locks stay short.
+    """
+    now = now or timezone.now()
+    lapsed = Membership.objects.filter(status='active', end_date__lt=now)
+
+    total = 0
+    while True:
+        batch = list(lapsed.order_by('end_date').values_list('pk', 'user_id')[:batch_size])
+        if not batch:
+            break
+        pks = [pk for pk, _ in batch]
+        total += Membership.objects.filter(pk__in=pks, status='active').update(status='expired', updated_at=now)
+        # update() bypasses post_save, so drop the cached entitlements here
+        invalidate_entitlements(*(user_id for _, user_id in batch))
+    return total
+
+
+def send_renewal_reminders(now=None, remind_before=timedelta(days=RENEWAL_REMINDER_DAYS), batch_size=500):
+    """
+    Notify members whose membership ends within `remind_before`, once per
+    billing period. renewal_reminder_sent_at is cleared when the membership
+    is renewed.
+    """
+    now = now or timezone.now()
+    expiring = Membership.objects.filter(
+        status='active',
+        end_date__gte=now,
+        end_date__lt=now + remind_before,
+        renewal_reminder_sent_at__isnull=True,
+    ).order_by('end_date')
+
+    total = 0
+    while True:
+        batch = list(
+            expiring.values_list('pk', 'user_id', 'user__email', 'user__first_name', 'tier', 'end_date')[:batch_size]
+        )
+        if not batch:
+            break
+
+        with transaction.atomic():
+            dispatch(*(
+                MembershipExpiring(user_id=user_id, email=email, first_name=first_name, tier=tier, end_date=end_date)
+                for _, user_id, email, first_name, tier, end_date in batch
+            ))
+            Membership.objects.filter(pk__in=[pk for pk, _, _, _, _, _ in batch]).update(renewal_reminder_sent_at=now)
+        total += len(batch)
+    return total
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from medmap_notifications.models import Notification, OutboundEmail
+from .entitlements import get_entitlements
+from .models import Membership
+from .services import MEMBERSHIP_PERIOD, expire_lapsed_memberships, send_renewal_reminders
+
+
+class EntitlementsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='patient', password='x')
+
+    def test_free_without_membership(self):
+        self.assertEqual(get_entitlements(self.user).effective_tier, 'free')
+
+    def test_membership_change_invalidates(self):
+        self.assertFalse(get_entitlements(self.user).is_premium)
+        Membership.objects.create(user=self.user, tier='premium', status='active')
+        self.assertTrue(get_entitlements(self.user).is_premium)
+
+    @override_settings(ENTITLEMENTS_CACHE_SECONDS=30)
+    def test_cached_for_configured_seconds(self):
+        # Other workers only see this process's invalidation through a shared cache; the TTL bounds the rest
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            get_entitlements(self.user)
+        self.assertEqual(cache_set.call_args.args[2], 30)
+
+
+class MembershipServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.user = get_user_model().objects.create_user(
+            username='member', email='member@example.com', password='x', first_name='Mo',
+        )
+        self.membership, _ = Membership.objects.update_or_create(
+            user=self.user, defaults={'tier': 'premium', 'status': 'active', 'end_date': self.now + timedelta(days=3)},
+        )
+
+    def reload(self):
+        return Membership.objects.get(pk=self.membership.pk)
+
+    def test_expire_lapsed_memberships(self):
+        other = get_user_model().objects.create_user(username='other', password='x')
+        Membership.objects.update_or_create(
+            user=other, defaults={'tier': 'premium', 'status': 'cancelled', 'end_date': self.now - timedelta(days=1)},
+        )
+        self.assertEqual(expire_lapsed_memberships(now=self.now), 0)
+
+        self.assertTrue(get_entitlements(self.user).is_premium)
+        later = self.now + timedelta(days=4)
+        self.assertEqual(expire_lapsed_memberships(now=later, batch_size=1), 1)
+        self.assertEqual(self.reload().status, 'expired')
+        self.assertEqual(Membership.objects.get(user=other).status, 'cancelled')
+        # The update bypasses post_save, so the cached entitlements are dropped by hand
+        self.assertFalse(get_entitlements(self.user).is_premium)
+
+    def test_renewal_reminder_is_sent_once(self):
+        self.assertEqual(send_renewal_reminders(now=self.now), 1)
+        self.assertEqual(self.reload().renewal_reminder_sent_at, self.now)
+        self.assertEqual(send_renewal_reminders(now=self.now + timedelta(days=1)), 0)
+
+        self.assertEqual(Notification.objects.filter(recipient=self.user, type='membership_expiring').count(), 1)
+        email = OutboundEmail.objects.get(subject='Your MedMap membership is expiring')
+        self.assertEqual(email.to, 'member@example.com')
+
+    def test_renewal_reminder_waits_for_the_window(self):
+        self.assertEqual(send_renewal_reminders(now=self.now, remind_before=timedelta(days=2)), 0)
+        self.assertIsNone(self.reload().renewal_reminder_sent_at)
+
+    def test_renewal_clears_the_reminder(self):
+        send_renewal_reminders(now=self.now)
+        # As the PayFast ITN does on renewal
+        membership = self.reload()
+        membership.end_date += MEMBERSHIP_PERIOD
+        membership.renewal_reminder_sent_at = None
+        membership.save()
+        self.assertEqual(send_renewal_reminders(now=membership.end_date - timedelta(days=1)), 1)
+
+    def test_command_loop_runs_each_iteration(self):
+        Membership.objects.filter(pk=self.membership.pk).update(end_date=self.now - timedelta(days=1))
+        out = StringIO()
+        # Interrupt the loop at its first sleep
+        with mock.patch('memberships.management.commands.expire_memberships.time.sleep', side_effect=KeyboardInterrupt) as sleep:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('expire_memberships', '--loop', '--interval=5', stdout=out)
+        sleep.assert_called_once_with(5.0)
+        self.assertEqual(out.getvalue(), 'Expired 1 membership(s), queued 0 renewal reminder(s)\n')
+        self.assertEqual(self.reload().status, 'expired')
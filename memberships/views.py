@@ -6,12 +6,14 @@ class MembershipViewSet(viewsets.ModelViewSet):
     queryset = Membership.objects.all()
     serializer_class = MembershipSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Reads authenticate from token claims (see users.authentication)
+    stateless_auth = True
 
     def get_queryset(self):
         user = self.request.user
         if user.is_superuser or user.is_staff:
             return Membership.objects.all()
-        return Membership.objects.filter(user=user)
+        return Membership.objects.filter(user_id=user.pk)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
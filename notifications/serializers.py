@@ -1,8 +0,0 @@
-from rest_framework import serializers
-from .models import Notification
-
-class NotificationSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Notification
-        fields = ['id', 'recipient', 'type', 'title', 'message', 'data', 'read', 'created_at']
-        read_only_fields = ['recipient', 'created_at']
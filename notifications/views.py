@@ -1,32 +0,0 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from .models import Notification
-from .serializers import NotificationSerializer
-
-class NotificationViewSet(viewsets.ModelViewSet):
-    serializer_class = NotificationSerializer
-    permission_classes = [permissions.IsAuthenticated]
-
-    def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
-
-    def perform_create(self, serializer):
-        # Only admin or system logic should create notifications usually, 
-        # but if user creates it, it must be for themselves or we handle logic elsewhere.
-        # For now, we restrict creation to be backend-driven mostly, but standard viewset allows create.
-        # We enforce recipient to be current user if not admin? 
-        # Actually, let's just allow it for now, usually creating notifications via API is for testing or specific flows.
-        serializer.save(recipient=self.request.user)
-
-    @action(detail=True, methods=['post'])
-    def mark_read(self, request, pk=None):
-        notification = self.get_object()
-        notification.read = True
-        notification.save()
-        return Response({'status': 'marked as read'})
-
-    @action(detail=False, methods=['post'])
-    def mark_all_read(self, request):
-        self.get_queryset().update(read=True)
-        return Response({'status': 'all marked as read'})
@@ -0,0 +1,184 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import Booking
+from memberships.entitlements import invalidate_entitlements
+from memberships.models import Membership
+from memberships.services import MEMBERSHIP_PERIOD, expire_lapsed_memberships
+from payments.models import PaymentTransaction
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_booking_id(custom_str1):
+    # PayFast custom_str1 for bookings is "booking_<id>" (see InitiatePaymentView)
+    if not custom_str1 or not custom_str1.startswith('booking_'):
+        return None
+    booking_id = custom_str1.split('_')[1]
+    return int(booking_id) if booking_id.isdigit() else None
+
+
+def parse_membership(custom_str1):
+    # PayFast custom_str1 for memberships is "membership_<user id>_<plan>" (see CreateMembershipPaymentView)
+    if not custom_str1 or not custom_str1.startswith('membership_'):
+        return None
+    parts = custom_str1.split('_')
+    if len(parts) < 3 or not parts[1].isdigit() or parts[2] not in dict(Membership.TIER_CHOICES):
+        return None
+    return int(parts[1]), parts[2]
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconcile completed PaymentTransactions against Booking.payment_status and Membership, '
+        'and expire memberships whose end_date has passed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without fixing them')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched and fixed per batch')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: no changes will be written'))
+
+        scanned, pending, missing = self.reconcile_bookings(chunk_size, dry_run)
+        self.stdout.write(f"Scanned {scanned} completed booking payments")
+        self.stdout.write(f"Paid but not marked paid: {pending} booking(s) {'found' if dry_run else 'fixed'}")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Payments referencing missing bookings: {missing}"))
+
+        scanned, fixed = self.reconcile_membership_payments(chunk_size, dry_run)
+        self.stdout.write(f"Scanned {scanned} completed membership payments")
+        self.stdout.write(f"Paid but not active: {fixed} membership(s) {'found' if dry_run else 'fixed'}")
+
+        # After the payments, so a membership paid for but never renewed isn't expired first
+        expired = self.reconcile_memberships(chunk_size, dry_run)
+        self.stdout.write(f"Expired but active: {expired} membership(s) {'found' if dry_run else 'fixed'}")
+
+        self.stdout.write(self.style.SUCCESS('Reconciliation complete'))
+
+    def reconcile_bookings(self, chunk_size, dry_run):
+        """
+        Stream completed booking payments and mark any booking still unpaid as paid.
+        Only one chunk of references is held in memory at a time.
+        """
+        references = (
+            PaymentTransaction.objects
+            .filter(status='complete', transaction_type='booking')
+            .order_by('pk')
+            .values_list('metadata__custom_str1', flat=True)
+            .iterator(chunk_size=chunk_size)
+        )
+
+        scanned = pending_total = missing_total = 0
+        for chunk in chunked(references, chunk_size):
+            scanned += len(chunk)
+            booking_ids = {booking_id for booking_id in map(parse_booking_id, chunk) if booking_id}
+            if not booking_ids:
+                continue
+
+            statuses = dict(
+                Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'payment_status')
+            )
+            missing_total += len(booking_ids - statuses.keys())
+            pending_ids = [pk for pk, payment_status in statuses.items() if payment_status != 'COMPLETE']
+            pending_total += len(pending_ids)
+
+            if dry_run:
+                for pk in pending_ids:
+                    self.stdout.write(f"  booking {pk}: payment complete but payment_status={statuses[pk]!r}")
+                continue
+
+            if pending_ids:
+                now = timezone.now()
+                with transaction.atomic():
+                    Booking.objects.filter(pk__in=pending_ids).update(payment_status='COMPLETE', updated_at=now)
+                    # Only pending bookings are confirmed; cancelled/completed ones keep their status
+                    Booking.objects.filter(pk__in=pending_ids, status='pending').update(status='confirmed', updated_at=now)
+
+        return scanned, pending_total, missing_total
+
+    def reconcile_membership_payments(self, chunk_size, dry_run):
+        """
+        Stream completed membership payments from the last membership period
+        and activate any membership the ITN didn't: missing, or ending before
+        the paid period does. A membership is only ever extended.
+        """
+        now = timezone.now()
+        payments = (
+            PaymentTransaction.objects
+            .filter(status='complete', transaction_type='membership', created_at__gt=now - MEMBERSHIP_PERIOD)
+            .order_by('pk')
+            .values_list('metadata__custom_str1', 'created_at')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        scanned = fixed_total = 0
+        for chunk in chunked(payments, chunk_size):
+            scanned += len(chunk)
+            # user_id -> (plan, end of the paid period); later payments win
+            paid = {}
+            for custom_str1, created_at in chunk:
+                parsed = parse_membership(custom_str1)
+                if parsed:
+                    paid[parsed[0]] = (parsed[1], created_at + MEMBERSHIP_PERIOD)
+            if not paid:
+                continue
+
+            user_ids = set(get_user_model().objects.filter(pk__in=paid).values_list('pk', flat=True))
+            memberships = {membership.user_id: membership for membership in Membership.objects.filter(user_id__in=user_ids)}
+            missing = [user_id for user_id in user_ids if user_id not in memberships]
+            stale = [
+                membership for user_id, membership in memberships.items()
+                if membership.end_date is None or membership.end_date < paid[user_id][1]
+            ]
+            fixed_total += len(missing) + len(stale)
+
+            if dry_run:
+                for user_id in missing:
+                    self.stdout.write(f"  user {user_id}: membership paid but missing")
+                for membership in stale:
+                    self.stdout.write(f"  membership {membership.pk}: paid until {paid[membership.user_id][1]:%Y-%m-%d} but end_date={membership.end_date}")
+                continue
+
+            for membership in stale:
+                membership.tier, membership.end_date = paid[membership.user_id]
+                membership.status = 'active'
+                membership.renewal_reminder_sent_at = None
+                membership.updated_at = now
+            with transaction.atomic():
+                Membership.objects.bulk_create([
+                    Membership(user_id=user_id, tier=paid[user_id][0], status='active', end_date=paid[user_id][1])
+                    for user_id in missing
+                ])
+                Membership.objects.bulk_update(stale, ['tier', 'status', 'end_date', 'renewal_reminder_sent_at', 'updated_at'])
+            # bulk_create/bulk_update bypass post_save, so drop the cached entitlements here
+            invalidate_entitlements(*missing, *(membership.user_id for membership in stale))
+
+        return scanned, fixed_total
+
+    def reconcile_memberships(self, chunk_size, dry_run):
+        """
+        Expire active memberships past their end_date.
+        """
+        if not dry_run:
+            return expire_lapsed_memberships(batch_size=chunk_size)
+
+        lapsed = Membership.objects.filter(status='active', end_date__lt=timezone.now()).order_by('pk')
+        total = 0
+        for pk in lapsed.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+            self.stdout.write(f"  membership {pk}: active but end_date has passed")
+            total += 1
+        return total
@@ -1,82 +1,168 @@
+import bisect
 import hashlib
 import urllib.parse
+from functools import lru_cache
+
 from django.conf import settings
-import os
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+SANDBOX_MERCHANT_ID = '10000100'
+SANDBOX_MERCHANT_KEY = '46f0cd694581a'
+
+
+def _clean(value):
+    return "" if value is None else str(value).strip()
+
+
+def _encode_field(key, value):
+    return f"{key}={urllib.parse.quote_plus(value)}"
+
+
+def encode_payload(data):
+    """
+    Canonical PayFast payload: keys sorted, blank values dropped, values URL-encoded.
+    """
+    fragments = []
+    for key in sorted(data.keys()):
+        value = _clean(data[key])
+        if value != "":
+            fragments.append(_encode_field(key, value))
+    return "&".join(fragments)
+
+
+def sign_payload(encoded, passphrase=None):
+    if passphrase:
+        separator = "&" if encoded else ""
+        encoded = f"{encoded}{separator}passphrase={urllib.parse.quote_plus(passphrase)}"
+    return hashlib.md5(encoded.encode("utf-8")).hexdigest()
+
+
+class PayFastConfig:
+    """
+    Merchant settings resolved once per process. The static fields are kept
+    both raw (for the form data) and pre-encoded (for signing).
+    """
 
-class PayFastService:
     def __init__(self):
-        self.merchant_id = settings.MERCHANT_ID
-        self.merchant_key = settings.MERCHANT_KEY
+        self.sandbox = settings.PAYFAST_SANDBOX
         self.passphrase = settings.PASSPHRASE
-        self.base_url = 'https://sandbox.payfast.co.za' if settings.PAYFAST_SANDBOX else 'https://www.payfast.co.za'
-        if settings.PAYFAST_SANDBOX:
+        self.base_url = 'https://sandbox.payfast.co.za' if self.sandbox else 'https://www.payfast.co.za'
+        self.process_url = f"{self.base_url}/eng/process"
+        if self.sandbox:
             # Always use test credentials in sandbox mode
-            self.merchant_id = '10000100'
-            self.merchant_key = '46f0cd694581a'
-
-    def _generate_signature(self, data):
-        payload = ""
-        for key in sorted(data.keys()):
-            if data[key] is not None and data[key] != "":
-                value = urllib.parse.quote_plus(str(data[key]))
-                payload += f"{key}={value}&"
-        if self.passphrase:
-            payload += f"passphrase={urllib.parse.quote_plus(self.passphrase)}"
-        elif payload.endswith('&'):
-            payload = payload[:-1]
-        return hashlib.md5(payload.encode()).hexdigest()
+            self.merchant_id = SANDBOX_MERCHANT_ID
+            self.merchant_key = SANDBOX_MERCHANT_KEY
+        else:
+            self.merchant_id = settings.MERCHANT_ID
+            self.merchant_key = settings.MERCHANT_KEY
+        self.notify_url = self._resolve_notify_url()
+        self.merchant_fields = {
+            'merchant_id': self.merchant_id,
+            'merchant_key': self.merchant_key,
+        }
+        self.encoded_fields = {
+            key: _encode_field(key, _clean(value))
+            for key, value in self.merchant_fields.items()
+        }
+        self.encoded_notify_url = _encode_field('notify_url', self.notify_url)
 
-    def create_payment_form_data(self, amount, item_name, return_url, cancel_url, email=None, first_name=None, last_name=None, custom_str1=None, notify_url=None):
-        if not notify_url:
-            notify_url = os.environ.get('PAYFAST_NOTIFY_URL')
-        if not notify_url and hasattr(settings, 'PAYFAST_NOTIFY_URL'):
-            notify_url = settings.PAYFAST_NOTIFY_URL
+    @staticmethod
+    def _resolve_notify_url():
+        notify_url = getattr(settings, 'PAYFAST_NOTIFY_URL', '')
         if not notify_url:
             base_domain = settings.CORS_ALLOWED_ORIGINS[0] if settings.CORS_ALLOWED_ORIGINS else 'http://localhost:8000'
             if 'supabase.co' in base_domain:
                 base_domain = 'http://localhost:8000'
             notify_url = f"{base_domain}/api/payments/notify/"
+        return notify_url
 
-        data = {
-            'merchant_id': self.merchant_id,
-            'merchant_key': self.merchant_key,
+
+@lru_cache(maxsize=1)
+def get_payfast_config():
+    return PayFastConfig()
+
+
+@receiver(setting_changed)
+def _reset_payfast_config(setting, **kwargs):
+    if setting in ('MERCHANT_ID', 'MERCHANT_KEY', 'PASSPHRASE', 'PAYFAST_SANDBOX', 'PAYFAST_NOTIFY_URL', 'CORS_ALLOWED_ORIGINS'):
+        get_payfast_config.cache_clear()
+
+
+class PaymentForm:
+    """
+    A signed PayFast form. The encoded payload is built once and shared by
+    the signature and the redirect URL.
+    """
+
+    def __init__(self, fields, encoded_fields, config):
+        self.fields = fields
+        self._fragments = sorted(encoded_fields.items())
+        self.encoded = "&".join(fragment for _, fragment in self._fragments)
+        self.signature = sign_payload(self.encoded, config.passphrase)
+        self.process_url = config.process_url
+
+    @property
+    def data(self):
+        return {**self.fields, 'signature': self.signature}
+
+    @property
+    def url(self):
+        fragments = list(self._fragments)
+        bisect.insort(fragments, ('signature', f"signature={self.signature}"))
+        return f"{self.process_url}?{'&'.join(fragment for _, fragment in fragments)}"
+
+
+class PayFastService:
+    def __init__(self):
+        self.config = get_payfast_config()
+        self.merchant_id = self.config.merchant_id
+        self.merchant_key = self.config.merchant_key
+        self.passphrase = self.config.passphrase
+        self.base_url = self.config.base_url
+        self.process_url = self.config.process_url
+
+    def _generate_signature(self, data):
+        return sign_payload(encode_payload(data), self.passphrase)
+
+    def build_payment_form(self, amount, item_name, return_url, cancel_url, email=None, first_name=None, last_name=None, custom_str1=None, notify_url=None):
+        fields = dict(self.config.merchant_fields)
+        encoded_fields = dict(self.config.encoded_fields)
+
+        dynamic = {
             'return_url': return_url,
             'cancel_url': cancel_url,
             'notify_url': notify_url,
             'amount': f"{amount:.2f}",
             'item_name': item_name,
+            'email_address': email,
+            'name_first': first_name,
+            'name_last': last_name,
+            'custom_str1': custom_str1,
         }
-        if email:
-            data['email_address'] = email
-        if first_name:
-            data['name_first'] = first_name
-        if last_name:
-            data['name_last'] = last_name
-        if custom_str1:
-            data['custom_str1'] = custom_str1
-
-        data['signature'] = self._generate_signature(data)
-        return data
+        for key, value in dynamic.items():
+            value = _clean(value)
+            if value != "":
+                fields[key] = value
+                encoded_fields[key] = _encode_field(key, value)
+            elif key == 'notify_url':
+                fields[key] = self.config.notify_url
+                encoded_fields[key] = self.config.encoded_notify_url
+
+        return PaymentForm(fields, encoded_fields, self.config)
+
+    def create_payment_form_data(self, amount, item_name, return_url, cancel_url, email=None, first_name=None, last_name=None, custom_str1=None, notify_url=None):
+        return self.build_payment_form(
+            amount, item_name, return_url, cancel_url,
+            email=email, first_name=first_name, last_name=last_name,
+            custom_str1=custom_str1, notify_url=notify_url,
+        ).data
 
     def generate_payment_url(self, data):
         if 'signature' not in data:
             data['signature'] = self._generate_signature(data)
-        sorted_keys = sorted(data.keys())
-        query_parts = []
-        for key in sorted_keys:
-            if data[key] is not None and data[key] != "":
-                value = urllib.parse.quote_plus(str(data[key]))
-                query_parts.append(f"{key}={value}")
-        query_string = "&".join(query_parts)
-        return f"{self.base_url}/eng/process?{query_string}"
+        return f"{self.process_url}?{encode_payload(data)}"
+
 
 def generate_payfast_signature(data: dict) -> str:
-    payload = ""
-    for key in sorted(data.keys()):
-        value = str(data[key]).strip()
-        if value != "":
-            payload += f"{key}={urllib.parse.quote_plus(value)}&"
-    payload = payload.rstrip("&")
-    if settings.PASSPHRASE:
-        payload += f"&passphrase={urllib.parse.quote_plus(settings.PASSPHRASE)}"
-    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+    return sign_payload(encode_payload(data), get_payfast_config().passphrase)
@@ -0,0 +1,228 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from bookings.models import Booking
+from bookings.transitions import InvalidTransition
+from doctors.models import Doctor
+from memberships.models import Membership
+from memberships.services import MEMBERSHIP_PERIOD
+from .models import PaymentTransaction
+from .services import PayFastService, encode_payload, generate_payfast_signature, get_payfast_config, sign_payload
+
+# The payload from test_signature.py, with signatures produced by the original implementation
+GOLDEN_DATA = {
+    'amount': '39.00',
+    'cancel_url': 'https://medmap.co.za/memberships?status=cancelled',
+    'custom_str1': 'membership_47_premium',
+    'email_address': 'kuhlulamadumo@gmail.com',
+    'item_name': 'Premium membership (quarterly)',
+    'merchant_id': '32963323',
+    'merchant_key': '16d8hpaaicfyc',
+    'name_first': 'Kuhlula',
+    'name_last': 'Madumo',
+    'notify_url': 'https://medmap-backend-6t7y.onrender.com/api/payments/notify/',
+    'return_url': 'https://medmap.co.za/memberships?status=success',
+}
+GOLDEN_PAYLOAD = (
+    'amount=39.00&cancel_url=https%3A%2F%2Fmedmap.co.za%2Fmemberships%3Fstatus%3Dcancelled'
+    '&custom_str1=membership_47_premium&email_address=kuhlulamadumo%40gmail.com'
+    '&item_name=Premium+membership+%28quarterly%29&merchant_id=32963323&merchant_key=16d8hpaaicfyc'
+    '&name_first=Kuhlula&name_last=Madumo'
+    '&notify_url=https%3A%2F%2Fmedmap-backend-6t7y.onrender.com%2Fapi%2Fpayments%2Fnotify%2F'
+    '&return_url=https%3A%2F%2Fmedmap.co.za%2Fmemberships%3Fstatus%3Dsuccess'
+)
+GOLDEN_SIGNATURES = {
+    None: '52d5b9c4171b99aff11baf8e4fb37952',
+    'test': 'c51bff5edaf4dd5a706736901cbe3ec2',
+    'MedMap.2025.': '04580a8b3e4343a0eb91682c5a647ee5',
+}
+
+MERCHANT = {
+    'MERCHANT_ID': '32963323',
+    'MERCHANT_KEY': '16d8hpaaicfyc',
+    'PASSPHRASE': 'MedMap.2025.',
+    'PAYFAST_SANDBOX': False,
+}
+
+
+class SignatureTests(SimpleTestCase):
+    def test_encode_payload(self):
+        self.assertEqual(encode_payload(GOLDEN_DATA), GOLDEN_PAYLOAD)
+
+    def test_encode_payload_drops_blank_values(self):
+        data = {**GOLDEN_DATA, 'name_last': '', 'custom_str2': None, 'custom_str3': '  '}
+        self.assertEqual(encode_payload(data), GOLDEN_PAYLOAD.replace('&name_last=Madumo', ''))
+
+    def test_golden_signatures(self):
+        for passphrase, signature in GOLDEN_SIGNATURES.items():
+            with self.subTest(passphrase=passphrase):
+                self.assertEqual(sign_payload(GOLDEN_PAYLOAD, passphrase), signature)
+
+    @override_settings(**MERCHANT)
+    def test_generate_payfast_signature_uses_the_passphrase(self):
+        self.assertEqual(generate_payfast_signature(GOLDEN_DATA), GOLDEN_SIGNATURES['MedMap.2025.'])
+
+
+@override_settings(**MERCHANT)
+class PaymentFormTests(SimpleTestCase):
+    def build(self, **kwargs):
+        return PayFastService().build_payment_form(
+            amount=39.0,
+            item_name=GOLDEN_DATA['item_name'],
+            return_url=GOLDEN_DATA['return_url'],
+            cancel_url=GOLDEN_DATA['cancel_url'],
+            email=GOLDEN_DATA['email_address'],
+            first_name=GOLDEN_DATA['name_first'],
+            last_name=GOLDEN_DATA['name_last'],
+            custom_str1=GOLDEN_DATA['custom_str1'],
+            **kwargs,
+        )
+
+    def test_form_is_signed(self):
+        form = self.build(notify_url=GOLDEN_DATA['notify_url'])
+        self.assertEqual(form.data, {**GOLDEN_DATA, 'signature': GOLDEN_SIGNATURES['MedMap.2025.']})
+
+    def test_url_carries_the_signed_payload(self):
+        form = self.build(notify_url=GOLDEN_DATA['notify_url'])
+        fragments = GOLDEN_PAYLOAD.split('&') + [f"signature={GOLDEN_SIGNATURES['MedMap.2025.']}"]
+        self.assertEqual(form.url, 'https://www.payfast.co.za/eng/process?' + '&'.join(sorted(fragments)))
+
+    def test_url_matches_generate_payment_url(self):
+        form = self.build(notify_url=GOLDEN_DATA['notify_url'])
+        self.assertEqual(form.url, PayFastService().generate_payment_url(dict(form.data)))
+
+    @override_settings(PAYFAST_NOTIFY_URL='https://api.example.com/api/payments/notify/')
+    def test_notify_url_defaults_to_the_setting(self):
+        form = self.build()
+        self.assertEqual(form.fields['notify_url'], 'https://api.example.com/api/payments/notify/')
+        self.assertEqual(form.signature, sign_payload(encode_payload(form.fields), 'MedMap.2025.'))
+
+    @override_settings(PAYFAST_SANDBOX=True)
+    def test_sandbox_uses_test_credentials(self):
+        config = get_payfast_config()
+        self.assertEqual(config.merchant_id, '10000100')
+        self.assertEqual(config.process_url, 'https://sandbox.payfast.co.za/eng/process')
+
+
+@override_settings(**MERCHANT)
+class PayFastNotifyTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        patient = User.objects.create_user(username='patient', password='x')
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='doctor', password='x'), speciality='GP', city='Durban', province='KZN',
+        )
+        self.booking = Booking.objects.create(
+            user=patient, doctor=doctor,
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9),
+        )
+
+    def notify(self, **fields):
+        data = {
+            'pf_payment_id': '1089250', 'payment_status': 'COMPLETE', 'amount_gross': '10.00',
+            'item_name': 'Booking fee', 'custom_str1': f'booking_{self.booking.pk}', **fields,
+        }
+        data['signature'] = generate_payfast_signature(data)
+        return self.client.post('/api/payments/notify/', data)
+
+    def test_complete_payment_confirms_the_booking(self):
+        self.assertEqual(self.notify().status_code, 200)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('confirmed', 'COMPLETE'))
+
+    def test_payment_is_kept_when_the_status_changes_concurrently(self):
+        with mock.patch('payments.views.transition', side_effect=InvalidTransition):
+            self.assertEqual(self.notify().status_code, 200)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('pending', 'COMPLETE'))
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.patient = User.objects.create_user(username='patient', password='x')
+        doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='doctor', password='x'), speciality='GP', city='Durban', province='KZN',
+        )
+        self.booking = Booking.objects.create(
+            user=self.patient, doctor=doctor,
+            appointment_date=datetime.date(2026, 1, 5), appointment_time=datetime.time(9),
+        )
+
+    def pay(self, transaction_type, custom_str1, status='complete'):
+        return PaymentTransaction.objects.create(
+            user=self.patient, amount='39.00', status=status, transaction_type=transaction_type,
+            metadata={'custom_str1': custom_str1},
+        )
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_payments', *args, '--chunk-size=2', stdout=out)
+        return out.getvalue()
+
+    def test_marks_paid_bookings_paid(self):
+        self.pay('booking', f'booking_{self.booking.pk}')
+        self.pay('booking', 'booking_999999')
+        out = self.reconcile()
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('confirmed', 'COMPLETE'))
+        self.assertIn('Paid but not marked paid: 1 booking(s) fixed', out)
+        self.assertIn('Payments referencing missing bookings: 1', out)
+
+    def test_activates_paid_memberships(self):
+        payment = self.pay('membership', f'membership_{self.patient.pk}_premium')
+        membership = Membership.objects.get_or_create(user=self.patient)[0]
+        Membership.objects.filter(pk=membership.pk).update(tier='free', status='expired', end_date=payment.created_at)
+
+        out = self.reconcile()
+        membership.refresh_from_db()
+        self.assertEqual(
+            (membership.tier, membership.status, membership.end_date),
+            ('premium', 'active', payment.created_at + MEMBERSHIP_PERIOD),
+        )
+        self.assertIn('Paid but not active: 1 membership(s) fixed', out)
+        self.assertIn('Paid but not active: 0 membership(s)', self.reconcile())
+
+    def test_creates_missing_memberships(self):
+        user = get_user_model().objects.create_user(username='member', password='x')
+        Membership.objects.filter(user=user).delete()
+        self.pay('membership', f'membership_{user.pk}_professional')
+        self.pay('membership', 'membership_999999_premium')
+        self.pay('membership', f'membership_{user.pk}_premium', status='failed')
+
+        self.reconcile()
+        membership = Membership.objects.get(user=user)
+        self.assertEqual((membership.tier, membership.status), ('professional', 'active'))
+
+    def test_keeps_memberships_paid_further_ahead(self):
+        payment = self.pay('membership', f'membership_{self.patient.pk}_premium')
+        end_date = payment.created_at + MEMBERSHIP_PERIOD * 2
+        Membership.objects.update_or_create(user=self.patient, defaults={'tier': 'professional', 'end_date': end_date})
+        self.reconcile()
+        membership = Membership.objects.get(user=self.patient)
+        self.assertEqual((membership.tier, membership.end_date), ('professional', end_date))
+
+    def test_expires_lapsed_memberships(self):
+        Membership.objects.update_or_create(
+            user=self.patient, defaults={'tier': 'premium', 'status': 'active', 'end_date': timezone.now() - datetime.timedelta(days=1)},
+        )
+        self.assertIn('Expired but active: 1 membership(s) fixed', self.reconcile())
+        self.assertEqual(Membership.objects.get(user=self.patient).status, 'expired')
+
+    def test_dry_run_writes_nothing(self):
+        self.pay('booking', f'booking_{self.booking.pk}')
+        self.pay('membership', f'membership_{self.patient.pk}_premium')
+        Membership.objects.filter(user=self.patient).delete()
+
+        out = self.reconcile('--dry-run')
+        self.assertIn('Paid but not marked paid: 1 booking(s) found', out)
+        self.assertIn('Paid but not active: 1 membership(s) found', out)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, 'unpaid')
+        self.assertFalse(Membership.objects.filter(user=self.patient).exists())
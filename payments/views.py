@@ -4,12 +4,14 @@ from rest_framework import permissions, viewsets
 from django.conf import settings
 from django.http import HttpResponse
 from django.utils import timezone
-from datetime import timedelta
 import hashlib
+from core.authentication import PUBLIC
 from .models import PaymentTransaction
 from .serializers import PaymentTransactionSerializer
 from memberships.models import Membership
+from memberships.services import MEMBERSHIP_PERIOD
 from bookings.models import Booking
+from bookings.transitions import InvalidTransition, can_transition, transition
 from django.contrib.auth import get_user_model
 from .services import generate_payfast_signature, PayFastService
 import traceback
@@ -47,31 +49,17 @@ class CreateMembershipPaymentView(APIView):
                 item_name = description
                 custom_str1 = f"membership_{user.id}_{plan}"
 
-            return_url = "https://medmap.co.za/memberships?status=success"
-            cancel_url = "https://medmap.co.za/memberships?status=cancelled"
-            notify_url = settings.PAYFAST_NOTIFY_URL
-            
-            data = {
-                "merchant_id": service.merchant_id,
-                "merchant_key": service.merchant_key,
-                "return_url": return_url,
-                "cancel_url": cancel_url,
-                "notify_url": notify_url,
-                "amount": f"{amount_rands:.2f}",
-                "item_name": item_name,
-                "custom_str1": custom_str1,
-                "email_address": user.email,
-            }
-            
-            # Add name fields only if they exist
-            if user.first_name:
-                data["name_first"] = user.first_name
-            if user.last_name:
-                data["name_last"] = user.last_name
-
-            # Remove empty values
-            clean_data = {k: v for k, v in data.items() if v is not None and v != ""}
-            clean_data['signature'] = generate_payfast_signature(clean_data)
+            form = service.build_payment_form(
+                amount=amount_rands,
+                item_name=item_name,
+                return_url="https://medmap.co.za/memberships?status=success",
+                cancel_url="https://medmap.co.za/memberships?status=cancelled",
+                email=user.email,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                custom_str1=custom_str1,
+            )
+            clean_data = form.data
 
             # Debug logging
             print("=" * 80)
@@ -79,14 +67,14 @@ class CreateMembershipPaymentView(APIView):
             print(f"Merchant ID: {service.merchant_id}")
             print(f"Amount: {clean_data['amount']}")
             print(f"Sandbox Mode: {settings.PAYFAST_SANDBOX}")
-            print(f"Payment URL: {service.base_url}/eng/process")
+            print(f"Payment URL: {service.process_url}")
             print(f"Signature: {clean_data['signature']}")
             print(f"All data keys: {list(clean_data.keys())}")
             print("=" * 80)
 
             # Return JSON instead of HTML form
             return Response({
-                "payment_url": f"{service.base_url}/eng/process",
+                "payment_url": service.process_url,
                 "payment_data": clean_data
             })
 
@@ -117,36 +105,21 @@ class InitiatePaymentView(APIView):
             except ValueError:
                 return Response({"error": "Invalid amount"}, status=400)
 
-            return_url = "https://medmap.co.za/bookings?status=success"
-            cancel_url = "https://medmap.co.za/bookings?status=cancelled"
-            notify_url = settings.PAYFAST_NOTIFY_URL
-
-            data = {
-                "merchant_id": service.merchant_id,
-                "merchant_key": service.merchant_key,
-                "return_url": return_url,
-                "cancel_url": cancel_url,
-                "notify_url": notify_url,
-                "amount": f"{amount_val:.2f}",
-                "item_name": description,
-                "email_address": user.email,
-            }
-            
-            # Add optional fields
-            if booking_id:
-                data["custom_str1"] = f"booking_{booking_id}"
-            if user.first_name:
-                data["name_first"] = user.first_name
-            if user.last_name:
-                data["name_last"] = user.last_name
-
-            # Remove empty values
-            clean_data = {k: v for k, v in data.items() if v is not None and v != ""}
-            clean_data['signature'] = generate_payfast_signature(clean_data)
+            form = service.build_payment_form(
+                amount=amount_val,
+                item_name=description,
+                return_url="https://medmap.co.za/bookings?status=success",
+                cancel_url="https://medmap.co.za/bookings?status=cancelled",
+                email=user.email,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                custom_str1=f"booking_{booking_id}" if booking_id else None,
+            )
+            clean_data = form.data
 
             # Return JSON instead of HTML form
             return Response({
-                "payment_url": f"{service.base_url}/eng/process",
+                "payment_url": service.process_url,
                 "payment_data": clean_data
             })
         except Exception as e:
@@ -156,6 +129,8 @@ class InitiatePaymentView(APIView):
 
 
 class PayFastNotifyView(APIView):
+    # PayFast posts the ITN without credentials. Its signature is only checked and logged below
+    authentication_classes = PUBLIC
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
@@ -216,7 +191,8 @@ class PayFastNotifyView(APIView):
                         membership, created = Membership.objects.get_or_create(user=user)
                         membership.tier = plan
                         membership.status = 'active'
-                        membership.end_date = timezone.now() + timedelta(days=90)  # quarterly
+                        membership.end_date = timezone.now() + MEMBERSHIP_PERIOD
+                        membership.renewal_reminder_sent_at = None
                         membership.save()
                     except Exception as e:
                         print(f"Error updating membership: {e}")
@@ -226,9 +202,14 @@ class PayFastNotifyView(APIView):
                     booking_id = parts[1]
                     try:
                         booking = Booking.objects.get(id=booking_id)
-                        booking.payment_status = 'COMPLETE'
-                        booking.status = 'confirmed'
-                        booking.save()
+                        # Recorded first, so a status change racing this ITN can't lose the payment
+                        Booking.objects.filter(pk=booking.pk).update(payment_status='COMPLETE', updated_at=timezone.now())
+                        if can_transition(booking.status, 'confirmed'):
+                            try:
+                                transition(booking, 'confirmed', payment_status='COMPLETE')
+                            except InvalidTransition:
+                                # Confirmed or cancelled concurrently; the payment is already recorded
+                                pass
                     except Exception as e:
                         print(f"Error updating booking: {e}")
 
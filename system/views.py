@@ -10,19 +10,26 @@ from datetime import timedelta
 from doctors.models import Doctor
 from bookings.models import Booking
 from memberships.models import Membership
+from core.authentication import ADMIN_SESSION
+from core.connections import connection_stats
+from core.replicas import ReplicaReadMixin
 from .models import SystemSetting
 from .serializers import SystemSettingSerializer
 
 User = get_user_model()
 
-class SystemSettingViewSet(viewsets.ModelViewSet):
+class SystemSettingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = SystemSetting.objects.all()
     serializer_class = SystemSettingSerializer
+    # Aggregates over the whole database; a few seconds of replica lag is fine
+    replica_actions = ('admin_stats', 'analytics_dashboard')
+    # Staff also use these from the browsable API while logged into the admin
+    authentication_classes = ADMIN_SESSION
     # Allow read for authenticated, write for admin
     permission_classes = [permissions.IsAuthenticated]
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'admin_stats', 'analytics_dashboard']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'admin_stats', 'analytics_dashboard', 'diagnostics']:
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
     
@@ -65,7 +72,10 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
         total_revenue = sum([b.doctor.price for b in completed_bookings if b.doctor.price])
 
         total_users = User.objects.count()
-        premium_members = Membership.objects.filter(tier='premium', status='active').count()
+        # Exclude lapsed memberships the expiry sweeper has not reached yet
+        premium_members = Membership.objects.filter(tier='premium', status='active')\
+            .filter(Q(end_date__isnull=True) | Q(end_date__gte=timezone.now()))\
+            .count()
         
         return Response({
             'total_doctors': total_doctors,
@@ -97,7 +107,7 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
          .order_by('month')
 
         # Booking Status
-        booking_status = Booking.objects.values('status').annotate(count=Count('id'))
+        booking_status = list(Booking.objects.values('status').annotate(count=Count('id')))
         
         # Inactive Users (No login in last 30 days)
         thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -120,3 +130,8 @@ class SystemSettingViewSet(viewsets.ModelViewSet):
             'total_patients': User.objects.filter(is_patient=True).count(),
             'total_signups': User.objects.count()
         })
+
+    @action(detail=False, methods=['get'])
+    def diagnostics(self, request):
+        # Database connection reuse for the worker that serves this request
+        return Response({'database': connection_stats()})
@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import CallRecord, OutboundSMS
 
-# Register your models here.
+
+@admin.register(OutboundSMS)
+class OutboundSMSAdmin(admin.ModelAdmin):
+    list_display = ('to', 'status', 'attempts', 'error_code', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'message_sid')
+
+
+@admin.register(CallRecord)
+class CallRecordAdmin(admin.ModelAdmin):
+    list_display = ('agent_number', 'customer_number', 'doctor', 'status', 'duration', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('call_sid', 'agent_number', 'customer_number')
+    raw_id_fields = ('initiated_by', 'doctor', 'patient')
@@ -0,0 +1,138 @@
+"""
+Click-to-call initiation.
+
+place_call() talks to Twilio synchronously and aplace_call() is its async
+twin for async views. start_call_job() hands the work to a small thread
+pool and returns a job id straight away. Either way the call is tracked in
+a CallRecord (see records.py), which Twilio's status callbacks update; an
+async call's job is read back from that record, so it does not matter
+which worker answers the poll.
+"""
+import logging
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .client import get_async_twilio_client, get_twilio_client
+from .models import CallRecord
+from .records import attach_call, finish_call
+
+logger = logging.getLogger(__name__)
+
+# How long a queued call may wait for its sid before the job counts as lost
+CALL_JOB_TIMEOUT = timedelta(minutes=2)
+
+
+def connect_url(customer_number):
+    # When the agent answers, Twilio fetches TwiML from here to dial the customer
+    encoded_customer_number = urllib.parse.quote_plus(customer_number)
+    return f"{settings.BACKEND_URL}/api/telecommunications/voice/connect/?customer_number={encoded_customer_number}"
+
+
+def status_callback_url(record_id):
+    return f"{settings.BACKEND_URL}/api/telecommunications/voice/status/?{urllib.parse.urlencode({'record': record_id})}"
+
+
+def call_params(record):
+    return {
+        'to': record.agent_number,
+        'from_': settings.TWILIO_PHONE_NUMBER,
+        'url': connect_url(record.customer_number),
+        'status_callback': status_callback_url(record.pk),
+        'status_callback_event': ['initiated', 'ringing', 'answered', 'completed'],
+    }
+
+
+def place_call(record):
+    """
+    Call the agent first; the customer is dialled once the agent answers.
+    Returns the Twilio call resource; failures close the record as failed.
+    """
+    try:
+        call = get_twilio_client().calls.create(**call_params(record))
+    except Exception:
+        finish_call(record.pk, None, 'failed')
+        raise
+    attach_call(record.pk, call.sid, call.status)
+    return call
+
+
+async def aplace_call(record):
+    """
+    Async place_call(): the worker serves other requests while Twilio answers.
+    """
+    try:
+        call = await get_async_twilio_client().calls.create_async(**call_params(record))
+    except Exception:
+        await sync_to_async(finish_call)(record.pk, None, 'failed')
+        raise
+    await sync_to_async(attach_call)(record.pk, call.sid, call.status)
+    return call
+
+
+@lru_cache(maxsize=1)
+def get_executor():
+    return ThreadPoolExecutor(max_workers=settings.TWILIO_CALL_WORKERS, thread_name_prefix='twilio-call')
+
+
+def job_payload(record):
+    return {
+        'id': record.job_id,
+        'user_id': record.initiated_by_id,
+        'record_id': record.pk,
+        'status': record.status,
+        'call_sid': record.call_sid or None,
+        'error': record.error or None,
+        'created_at': record.created_at,
+        'ended_at': record.ended_at,
+    }
+
+
+def get_call_job(job_id):
+    """
+    The job as clients poll it, or None if unknown. A job still without a
+    call sid after CALL_JOB_TIMEOUT was lost with the worker that queued
+    it, so it is closed as failed rather than left pending forever.
+    """
+    record = CallRecord.objects.filter(job_id=job_id).first()
+    if record is None:
+        return None
+    if record.status == 'pending' and not record.call_sid and record.created_at < timezone.now() - CALL_JOB_TIMEOUT:
+        fail_call(record.pk, "The call was not placed in time; please try again")
+        record.refresh_from_db()
+    return job_payload(record)
+
+
+def fail_call(record_id, error):
+    if finish_call(record_id, None, 'failed'):
+        CallRecord.objects.filter(pk=record_id).update(error=error[:255])
+
+
+def start_call_job(record, user_id=None):
+    """
+    Queue a call and return its job id without waiting for Twilio. The job
+    is the CallRecord itself, so any worker can answer a poll or a callback.
+    """
+    get_twilio_client()  # Fail fast if Twilio is not configured
+    record.job_id = uuid.uuid4().hex
+    record.save(update_fields=['job_id'])
+    get_executor().submit(_run_call_job, record)
+    return record.job_id
+
+
+def _run_call_job(record):
+    try:
+        place_call(record)
+    except Exception as e:
+        logger.error(f"Error initiating call for job {record.job_id}: {e}")
+        CallRecord.objects.filter(pk=record.pk).update(error=str(e)[:255])
+    finally:
+        # Runs outside the request cycle, so tidy up this thread's connection
+        close_old_connections()
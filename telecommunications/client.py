@@ -0,0 +1,79 @@
+"""
+Process-wide Twilio REST client.
+
+twilio.rest.Client is cheap to use but expensive to build per request: each
+instance gets its own HTTP session, so every call paid for a fresh TLS
+handshake. One client per process keeps the pooled session warm.
+
+Async views use get_async_twilio_client(), one per event loop, since an
+aiohttp session belongs to the loop it was created on.
+
+twilio is imported on first use, so management commands and the email
+worker never load it; the web master preloads it (see gunicorn.conf.py).
+"""
+import asyncio
+import weakref
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class TwilioNotConfigured(Exception):
+    pass
+
+
+def build_http_client():
+    dotted_path = getattr(settings, 'TWILIO_HTTP_CLIENT', '')
+    if dotted_path:
+        return import_string(dotted_path)()
+    from twilio.http.http_client import TwilioHttpClient
+    return TwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_HTTP_TIMEOUT)
+
+
+def build_async_http_client():
+    dotted_path = getattr(settings, 'TWILIO_ASYNC_HTTP_CLIENT', '')
+    if dotted_path:
+        return import_string(dotted_path)()
+    # Imports aiohttp, which only async views need
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+    return AsyncTwilioHttpClient(pool_connections=True, timeout=settings.TWILIO_HTTP_TIMEOUT)
+
+
+def check_configured():
+    if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN or not settings.TWILIO_PHONE_NUMBER:
+        raise TwilioNotConfigured("Twilio credentials are not configured")
+
+
+@lru_cache(maxsize=1)
+def get_twilio_client():
+    check_configured()
+    from twilio.rest import Client
+    return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=build_http_client())
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_twilio_client():
+    """
+    Twilio client for the running event loop. Call from async code only.
+    """
+    check_configured()
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from twilio.rest import Client
+        client = _async_clients[loop] = Client(
+            settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=build_async_http_client(),
+        )
+    return client
+
+
+@receiver(setting_changed)
+def _reset_client(setting, **kwargs):
+    if setting.startswith('TWILIO_'):
+        get_twilio_client.cache_clear()
+        _async_clients.clear()
@@ -0,0 +1,85 @@
+"""
+In-memory Twilio transport for tests and local development.
+
+Enable with TWILIO_HTTP_CLIENT = 'telecommunications.fake.FakeTwilioHttpClient'
+(and TWILIO_ASYNC_HTTP_CLIENT = 'telecommunications.fake.FakeAsyncTwilioHttpClient').
+Requests never leave the process; each one is recorded on `requests` and
+answered with a minimal, well-formed Twilio resource after `latency` seconds.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import re
+import time
+
+from twilio.http import AsyncHttpClient, HttpClient
+from twilio.http.request import Request
+from twilio.http.response import Response
+
+logger = logging.getLogger(__name__)
+
+_sids = itertools.count(1)
+
+
+def fake_response(method, uri, data, auth):
+    account_sid = auth[0] if auth else 'AC00000000000000000000000000000000'
+    data = data or {}
+    if method == 'POST' and uri.endswith('/Calls.json'):
+        body = _resource('CA', account_sid, data, status='queued')
+    elif method == 'POST' and uri.endswith('/Messages.json'):
+        body = _resource('SM', account_sid, data, status='queued', body=data.get('Body'))
+    else:
+        match = re.search(r'/(CA|SM)\w+\.json$', uri)
+        body = {'sid': match.group(0)[1:-5] if match else None, 'account_sid': account_sid, 'status': 'completed'}
+    return Response(201 if method == 'POST' else 200, json.dumps(body))
+
+
+def _resource(prefix, account_sid, data, **extra):
+    return {
+        'sid': f"{prefix}{next(_sids):032x}",
+        'account_sid': account_sid,
+        'to': data.get('To'),
+        'from': data.get('From'),
+        'uri': None,
+        **extra,
+    }
+
+
+class FakeTwilioHttpClient(HttpClient):
+    # Shared across instances so tests can inspect what the cached client sent
+    requests = []
+    latency = 0
+
+    def __init__(self, timeout=None):
+        super().__init__(logger, is_async=False, timeout=timeout)
+
+    @classmethod
+    def reset(cls):
+        cls.requests.clear()
+
+    def request(self, method, uri, params=None, data=None, headers=None, auth=None, timeout=None, allow_redirects=False):
+        request = Request(method=method, url=uri, auth=auth, params=params, data=data, headers=headers)
+        self.requests.append(request)
+        self._test_only_last_request = request
+        if self.latency:
+            time.sleep(self.latency)
+        self._test_only_last_response = fake_response(method, uri, data, auth)
+        return self._test_only_last_response
+
+
+class FakeAsyncTwilioHttpClient(AsyncHttpClient):
+    requests = FakeTwilioHttpClient.requests
+    latency = 0
+
+    def __init__(self, timeout=None):
+        super().__init__(logger, is_async=True, timeout=timeout)
+
+    async def request(self, method, uri, params=None, data=None, headers=None, auth=None, timeout=None, allow_redirects=False):
+        request = Request(method=method, url=uri, auth=auth, params=params, data=data, headers=headers)
+        self.requests.append(request)
+        self._test_only_last_request = request
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._test_only_last_response = fake_response(method, uri, data, auth)
+        return self._test_only_last_response
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from telecommunications.sms import send_queued_sms
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued SMS in batches, paced to TWILIO_SMS_PER_SECOND'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = send_queued_sms(batch_size=batch_size)
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < batch_size:
+                    break
+
+            if total_sent or total_failed:
+                self.stdout.write(f"Sent {total_sent} SMS, {total_failed} failed")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to', models.CharField(max_length=20)),
+                ('body', models.CharField(max_length=480)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('undelivered', 'Undelivered'), ('failed', 'Failed')], default='queued', max_length=11)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('message_sid', models.CharField(blank=True, db_index=True, max_length=34)),
+                ('error_code', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('status_updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'outbound SMS',
+                'verbose_name_plural': 'outbound SMS',
+                'indexes': [models.Index(fields=['status', 'id'], name='telecommuni_status_4403f5_idx')],
+            },
+        ),
+    ]
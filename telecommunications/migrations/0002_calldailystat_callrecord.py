@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0007_alter_doctorschedule_unique_together'),
+        ('telecommunications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveIntegerField(default=0, help_text='Seconds across answered calls')),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='call_stats', to='doctors.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='telecommuni_date_9e3101_idx')],
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_sid', models.CharField(blank=True, db_index=True, max_length=34)),
+                ('agent_number', models.CharField(max_length=20)),
+                ('customer_number', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued'), ('initiated', 'Initiated'), ('ringing', 'Ringing'), ('in-progress', 'In progress'), ('completed', 'Completed'), ('busy', 'Busy'), ('no-answer', 'No answer'), ('canceled', 'Canceled'), ('failed', 'Failed')], default='pending', max_length=11)),
+                ('duration', models.PositiveIntegerField(blank=True, help_text='Seconds, as reported by Twilio', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls', to='doctors.doctor')),
+                ('initiated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls_initiated', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'created_at'], name='telecommuni_doctor__8e5905_idx'), models.Index(fields=['created_at'], name='telecommuni_created_4b98a2_idx')],
+            },
+        ),
+    ]
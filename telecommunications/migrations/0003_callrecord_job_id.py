@@ -0,0 +1,23 @@
+# Generated by Django 5.0.3 on 2026-10-19 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecommunications', '0002_calldailystat_callrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrecord',
+            name='error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='callrecord',
+            name='job_id',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
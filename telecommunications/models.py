@@ -1,3 +1,103 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class OutboundSMS(models.Model):
+    """
+    Outbox for SMS. Rows are queued by the request or job that produces them
+    and delivered in paced batches by send_queued_sms. Twilio delivery
+    callbacks update status/error_code in place; the raw payload is not kept.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('undelivered', 'Undelivered'),
+        ('failed', 'Failed'),
+    )
+
+    to = models.CharField(max_length=20)
+    body = models.CharField(max_length=480)
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    message_sid = models.CharField(max_length=34, blank=True, db_index=True)
+    error_code = models.PositiveIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    status_updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'outbound SMS'
+        verbose_name_plural = 'outbound SMS'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"SMS -> {self.to} ({self.status})"
+
+
+class CallRecord(models.Model):
+    """
+    One click-to-call bridge. Created when the call is placed and completed
+    from Twilio status callbacks; finished calls are added to CallDailyStat.
+    Calls queued in async mode carry a job_id, which is what clients poll.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('queued', 'Queued'),
+        ('initiated', 'Initiated'),
+        ('ringing', 'Ringing'),
+        ('in-progress', 'In progress'),
+        ('completed', 'Completed'),
+        ('busy', 'Busy'),
+        ('no-answer', 'No answer'),
+        ('canceled', 'Canceled'),
+        ('failed', 'Failed'),
+    )
+
+    call_sid = models.CharField(max_length=34, blank=True, db_index=True)
+    job_id = models.CharField(max_length=32, unique=True, null=True, blank=True)
+    initiated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='calls_initiated')
+    doctor = models.ForeignKey('doctors.Doctor', on_delete=models.SET_NULL, null=True, blank=True, related_name='calls')
+    patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='calls_received')
+    agent_number = models.CharField(max_length=20)
+    customer_number = models.CharField(max_length=20)
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default='pending')
+    duration = models.PositiveIntegerField(null=True, blank=True, help_text='Seconds, as reported by Twilio')
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_number} -> {self.customer_number} ({self.status})"
+
+
+class CallDailyStat(models.Model):
+    """
+    Per-doctor, per-day call totals, incremented as calls finish so the
+    analytics endpoints never scan CallRecord. doctor is null for calls
+    not attributed to a doctor.
+    """
+    doctor = models.ForeignKey('doctors.Doctor', on_delete=models.CASCADE, null=True, blank=True, related_name='call_stats')
+    date = models.DateField()
+    calls = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveIntegerField(default=0, help_text='Seconds across answered calls')
+
+    class Meta:
+        unique_together = ('doctor', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor_id or '-'} {self.date}: {self.answered}/{self.calls}"
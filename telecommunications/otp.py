@@ -0,0 +1,70 @@
+"""
+One-time codes sent by SMS to verify a user's phone number.
+
+Codes live in the cache (hashed) for OTP_TTL seconds and allow a few
+attempts. Sends are limited per phone number so the endpoint cannot be
+used to flood a handset or run up the SMS bill.
+"""
+import secrets
+
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .sms import queue_sms
+
+OTP_LENGTH = 6
+OTP_TTL = 60 * 10
+OTP_MAX_ATTEMPTS = 5
+OTP_SENDS_PER_NUMBER = 3  # per OTP_TTL window
+
+CODE_KEY = 'phone_otp:{}'
+SENDS_KEY = 'phone_otp_sends:{}'
+
+
+class OTPError(Exception):
+    pass
+
+
+def _digest(user_id, phone_number, code):
+    return salted_hmac('phone-verify', f"{user_id}:{phone_number}:{code}").hexdigest()
+
+
+def send_code(user_id, phone_number):
+    """
+    Queue a verification code for `phone_number`. Raises OTPError when the
+    number has had too many codes recently.
+    """
+    sends_key = SENDS_KEY.format(phone_number)
+    cache.add(sends_key, 0, OTP_TTL)
+    if cache.incr(sends_key) > OTP_SENDS_PER_NUMBER:
+        raise OTPError("Too many codes requested for this number. Try again later.")
+
+    code = ''.join(secrets.choice('0123456789') for _ in range(OTP_LENGTH))
+    cache.set(CODE_KEY.format(user_id), {
+        'phone_number': phone_number,
+        'digest': _digest(user_id, phone_number, code),
+        'attempts': 0,
+    }, OTP_TTL)
+    queue_sms([(phone_number, f"Your MedMap verification code is {code}. It expires in {OTP_TTL // 60} minutes.")])
+
+
+def check_code(user_id, phone_number, code):
+    """
+    Return True if `code` is the one last sent to `phone_number` for this user.
+    The code is consumed on success; too many wrong guesses discard it.
+    """
+    key = CODE_KEY.format(user_id)
+    pending = cache.get(key)
+    if not pending or pending['phone_number'] != phone_number:
+        raise OTPError("No pending verification for this number. Request a new code.")
+
+    if constant_time_compare(pending['digest'], _digest(user_id, phone_number, str(code).strip())):
+        cache.delete(key)
+        return True
+
+    pending['attempts'] += 1
+    if pending['attempts'] >= OTP_MAX_ATTEMPTS:
+        cache.delete(key)
+    else:
+        cache.set(key, pending, OTP_TTL)
+    return False
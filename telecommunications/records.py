@@ -0,0 +1,104 @@
+"""
+Call detail records and their daily rollup.
+
+finish_call() closes a CallRecord exactly once and bumps the matching
+CallDailyStat row with F() increments, so reports read a handful of
+rollup rows instead of scanning every call.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from doctors.models import Doctor
+from .models import CallDailyStat, CallRecord
+
+# Twilio statuses after which a call will not change again
+FINAL_STATUSES = {'completed', 'busy', 'failed', 'no-answer', 'canceled'}
+# Of those, the ones where the agent picked up
+ANSWERED_STATUSES = {'completed'}
+
+
+def open_call_record(user, agent_number, customer_number, booking=None):
+    """
+    Create the record for a call about to be placed. The doctor and patient
+    come from `booking` when given, otherwise from the caller's doctor profile.
+    """
+    if booking is not None:
+        doctor_id, patient_id = booking.doctor_id, booking.user_id
+    else:
+        doctor_id = Doctor.objects.filter(user=user).values_list('pk', flat=True).first() if user.is_doctor else None
+        patient_id = None
+    return CallRecord.objects.create(
+        initiated_by=user,
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        agent_number=agent_number,
+        customer_number=customer_number,
+    )
+
+
+def attach_call(record_id, call_sid, status):
+    """
+    Store the sid Twilio assigned. The status is only taken if no callback
+    has reported a later one already.
+    """
+    CallRecord.objects.filter(pk=record_id).update(call_sid=call_sid)
+    CallRecord.objects.filter(pk=record_id, status='pending').update(status=status)
+
+
+def update_call(record_id, call_sid, status):
+    """
+    Record progress of a call that has not finished yet.
+    """
+    fields = {'status': status}
+    if call_sid:
+        fields['call_sid'] = call_sid
+    return CallRecord.objects.filter(pk=record_id, ended_at__isnull=True).update(**fields)
+
+
+def finish_call(record_id, call_sid, status, duration=None):
+    """
+    Close the record and add it to the day's rollup. Repeated callbacks for
+    the same call are ignored. Returns True if this call closed the record.
+    """
+    now = timezone.now()
+    duration = int(duration) if duration and str(duration).isdigit() else 0
+    answered = status in ANSWERED_STATUSES
+    fields = {'status': status, 'duration': duration, 'ended_at': now}
+    if call_sid:
+        fields['call_sid'] = call_sid
+
+    with transaction.atomic():
+        if not CallRecord.objects.filter(pk=record_id, ended_at__isnull=True).update(**fields):
+            return False
+        record = CallRecord.objects.values('doctor_id', 'created_at').get(pk=record_id)
+        add_to_daily_stats(
+            record['doctor_id'], timezone.localdate(record['created_at']),
+            answered=answered, duration=duration if answered else 0,
+        )
+    return True
+
+
+def add_to_daily_stats(doctor_id, date, answered, duration):
+    increments = {
+        'calls': F('calls') + 1,
+        'answered': F('answered') + int(answered),
+        'total_duration': F('total_duration') + duration,
+    }
+    stats = CallDailyStat.objects.filter(doctor_id=doctor_id, date=date)
+    if stats.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            CallDailyStat.objects.create(
+                doctor_id=doctor_id, date=date, calls=1, answered=int(answered), total_duration=duration,
+            )
+    except IntegrityError:
+        # Another callback created the row first
+        stats.update(**increments)
+
+
+def record_call_progress(record_id, call_sid, status, duration=None):
+    if status in FINAL_STATUSES:
+        return finish_call(record_id, call_sid, status, duration)
+    return bool(update_call(record_id, call_sid, status))
@@ -0,0 +1,52 @@
+"""
+X-Twilio-Signature verification for the Twilio webhooks.
+
+Twilio signs the public URL it called plus the POSTed form fields. Behind
+a proxy the request's own host/scheme may differ, so the URL is rebuilt
+from BACKEND_URL. Validation is skipped when TWILIO_VALIDATE_SIGNATURES is
+off or no auth token is configured (local development).
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponseForbidden
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from twilio.request_validator import RequestValidator
+
+
+def signature_is_valid(request):
+    if not settings.TWILIO_VALIDATE_SIGNATURES or not settings.TWILIO_AUTH_TOKEN:
+        return True
+    signature = request.META.get('HTTP_X_TWILIO_SIGNATURE', '')
+    if not signature:
+        return False
+    url = f"{settings.BACKEND_URL}{request.get_full_path()}"
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, request.POST, signature)
+
+
+def twilio_signature_required(view):
+    """
+    Decorator for plain Django webhook views.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not signature_is_valid(request):
+            return HttpResponseForbidden('Invalid Twilio signature')
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+class TwilioSignatureAuthentication(BaseAuthentication):
+    """
+    Rejects requests without a valid Twilio signature. A valid request stays
+    anonymous, so pair it with AllowAny.
+    """
+
+    def authenticate(self, request):
+        if not signature_is_valid(request._request):
+            raise AuthenticationFailed('Invalid Twilio signature')
+        return None
+
+
+TWILIO_WEBHOOK = [TwilioSignatureAuthentication]
@@ -0,0 +1,117 @@
+"""
+SMS outbox.
+
+queue_sms() stores messages with one INSERT; send_queued_sms() delivers them
+through the shared Twilio client, paced to TWILIO_SMS_PER_SECOND so bursts
+(e.g. a morning of reminders) stay within the sender's throughput. Delivery
+receipts arrive at SMSStatusCallbackView and only ever move a message forward.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .client import get_twilio_client
+from .models import OutboundSMS
+
+logger = logging.getLogger(__name__)
+
+MAX_SMS_ATTEMPTS = 3
+
+# Later statuses win; callbacks can arrive out of order
+STATUS_RANK = {'queued': 0, 'sending': 1, 'sent': 2, 'delivered': 3, 'undelivered': 3, 'failed': 3}
+
+
+def status_callback_url():
+    return f"{settings.BACKEND_URL}/api/telecommunications/sms/status/"
+
+
+def queue_sms(messages):
+    """
+    Queue (to, body) tuples in the outbox with one INSERT.
+    Messages without a number are dropped.
+    """
+    return OutboundSMS.objects.bulk_create([
+        OutboundSMS(to=to, body=body)
+        for to, body in messages
+        if to
+    ])
+
+
+def sender_options():
+    # A messaging service spreads traffic over its number pool; fall back to the single number
+    if settings.TWILIO_MESSAGING_SERVICE_SID:
+        return {'messaging_service_sid': settings.TWILIO_MESSAGING_SERVICE_SID}
+    return {'from_': settings.TWILIO_PHONE_NUMBER}
+
+
+def send_queued_sms(batch_size=50):
+    """
+    Deliver one batch of queued SMS. Returns (sent, failed) counts. Failed
+    messages are requeued until MAX_SMS_ATTEMPTS is reached.
+    """
+    with transaction.atomic():
+        messages = list(
+            OutboundSMS.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('pk')[:batch_size]
+        )
+        if not messages:
+            return 0, 0
+        OutboundSMS.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status='sending', attempts=F('attempts') + 1
+        )
+
+    client = get_twilio_client()
+    options = {**sender_options(), 'status_callback': status_callback_url()}
+    interval = 1 / settings.TWILIO_SMS_PER_SECOND
+    next_send = time.monotonic()
+
+    sent = []
+    failed = []
+    for message in messages:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = max(next_send, time.monotonic()) + interval
+
+        try:
+            result = client.messages.create(to=message.to, body=message.body, **options)
+        except Exception as e:
+            message.error = str(e)[:255]
+            message.error_code = getattr(e, 'code', None)
+            message.status = 'queued' if message.attempts + 1 < MAX_SMS_ATTEMPTS else 'failed'
+            failed.append(message)
+            continue
+        message.message_sid = result.sid
+        message.status = 'sent'
+        message.sent_at = timezone.now()
+        message.error = ''
+        sent.append(message)
+
+    if sent:
+        OutboundSMS.objects.bulk_update(sent, ['status', 'message_sid', 'sent_at', 'error'])
+    if failed:
+        OutboundSMS.objects.bulk_update(failed, ['status', 'error', 'error_code'])
+    return len(sent), len(failed)
+
+
+def record_sms_status(message_sid, message_status, error_code=None):
+    """
+    Apply a delivery receipt. Returns the number of rows updated (0 when the
+    message is unknown or already in a later state).
+    """
+    rank = STATUS_RANK.get(message_status)
+    if rank is None:
+        # accepted/scheduled/read etc. carry nothing we store
+        return 0
+    earlier = [status for status, status_rank in STATUS_RANK.items() if status_rank < rank]
+    return OutboundSMS.objects.filter(message_sid=message_sid, status__in=earlier).update(
+        status=message_status,
+        error_code=int(error_code) if error_code and str(error_code).isdigit() else None,
+        status_updated_at=timezone.now(),
+    )
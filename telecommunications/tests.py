@@ -1,3 +1,399 @@
-from django.test import TestCase
+import re
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient, APITestCase
+from twilio.twiml.voice_response import Dial, VoiceResponse
+
+from doctors.models import Doctor
+from .calls import get_executor
+from .fake import FakeTwilioHttpClient
+from .models import CallDailyStat, CallRecord, OutboundSMS
+from .otp import OTP_LENGTH, OTP_MAX_ATTEMPTS, OTP_SENDS_PER_NUMBER, OTP_TTL, OTPError, check_code, send_code
+from .records import finish_call
+from .sms import MAX_SMS_ATTEMPTS, queue_sms, send_queued_sms
+from .twiml import TWIML_CONTENT_TYPE, connect_call_twiml, incoming_call_twiml
+
+TWILIO = {
+    'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+    'TWILIO_AUTH_TOKEN': 'test',
+    'TWILIO_PHONE_NUMBER': '+15550000000',
+    'TWILIO_HTTP_CLIENT': 'telecommunications.fake.FakeTwilioHttpClient',
+    'TWILIO_ASYNC_HTTP_CLIENT': 'telecommunications.fake.FakeAsyncTwilioHttpClient',
+    'TWILIO_VALIDATE_SIGNATURES': False,
+}
+CALL = {'agent_number': '+27110000001', 'customer_number': '+27820000002'}
+
+
+@override_settings(**TWILIO)
+class MakeCallTests(APITestCase):
+    def setUp(self):
+        cache.clear()  # Throttle buckets
+        FakeTwilioHttpClient.reset()
+        self.user = get_user_model().objects.create_user(username='doctor', password='x', is_doctor=True)
+        self.client.force_authenticate(self.user)
+
+    def test_places_the_call(self):
+        response = self.client.post('/api/telecommunications/call/', CALL, format='json')
+        self.assertEqual(response.status_code, 200)
+        record = CallRecord.objects.get()
+        self.assertEqual((record.call_sid, record.status), (response.json()['call_sid'], 'queued'))
+
+        request, = FakeTwilioHttpClient.requests
+        self.assertEqual((request.data['To'], request.data['From']), (CALL['agent_number'], '+15550000000'))
+        self.assertTrue(request.data['StatusCallback'].endswith(f'/voice/status/?record={record.pk}'))
+
+    def test_status_callbacks_finish_the_call(self):
+        self.client.post('/api/telecommunications/call/', CALL, format='json')
+        record = CallRecord.objects.get()
+        for status in ('ringing', 'completed', 'completed'):
+            response = self.client.post(
+                f'/api/telecommunications/voice/status/?record={record.pk}',
+                {'CallSid': record.call_sid, 'CallStatus': status, 'CallDuration': '42'},
+            )
+            self.assertEqual(response.status_code, 204)
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.duration), ('completed', 42))
+        self.assertEqual(CallDailyStat.objects.get().calls, 1)
+
+    def test_calls_are_throttled(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'calls': '1/min'}):
+            self.assertEqual(self.client.post('/api/telecommunications/call/', CALL, format='json').status_code, 200)
+            response = self.client.post('/api/telecommunications/call/', CALL, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(CallRecord.objects.count(), 1)
+
+    @override_settings(TWILIO_ACCOUNT_SID='')
+    def test_unconfigured_twilio_opens_no_record(self):
+        response = self.client.post('/api/telecommunications/call/', {**CALL, 'async': True}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(CallRecord.objects.exists())
+        self.assertEqual(FakeTwilioHttpClient.requests, [])
+
+
+@override_settings(**TWILIO)
+class CallJobTests(TransactionTestCase):
+    # The job runs on the call pool's own thread and connection, so its writes must be committed
+    def setUp(self):
+        cache.clear()  # Throttle buckets
+        FakeTwilioHttpClient.reset()
+        self.user = get_user_model().objects.create_user(username='doctor', password='x', is_doctor=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queue_call(self):
+        response = self.client.post('/api/telecommunications/call/', {**CALL, 'async': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        # Let the pool finish the job
+        get_executor().shutdown(wait=True)
+        get_executor.cache_clear()
+        return response.json()['job_id']
+
+    def test_job_is_read_back_from_the_record(self):
+        job_id = self.queue_call()
+        record = CallRecord.objects.get()
+        self.assertEqual((record.job_id, record.status), (job_id, 'queued'))
+        self.client.post(
+            f'/api/telecommunications/voice/status/?record={record.pk}', {'CallSid': record.call_sid, 'CallStatus': 'ringing'},
+        )
+
+        response = self.client.get(f'/api/telecommunications/call/{job_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('id', 'record_id', 'status', 'call_sid', 'error')},
+            {'id': job_id, 'record_id': record.pk, 'status': 'ringing', 'call_sid': record.call_sid, 'error': None},
+        )
+
+    def test_other_users_cannot_see_the_job(self):
+        job_id = self.queue_call()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='patient', password='x'))
+        self.assertEqual(self.client.get(f'/api/telecommunications/call/{job_id}/').status_code, 404)
+
+    def test_lost_job_fails_once_it_times_out(self):
+        record = CallRecord.objects.create(initiated_by=self.user, job_id='a' * 32, **CALL)
+        self.assertEqual(self.client.get(f'/api/telecommunications/call/{record.job_id}/').data['status'], 'pending')
+
+        CallRecord.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        job = self.client.get(f'/api/telecommunications/call/{record.job_id}/').data
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['error'])
+        self.assertEqual(CallDailyStat.objects.get().calls, 1)
+
+
+@override_settings(**TWILIO, TWILIO_SMS_PER_SECOND=1000)
+class SendQueuedSMSTests(TestCase):
+    def setUp(self):
+        FakeTwilioHttpClient.reset()
+
+    def test_sends_queued_sms(self):
+        queue_sms([('+27820000002', 'Hello'), ('', 'Dropped'), ('+27820000003', 'Again')])
+        self.assertEqual(send_queued_sms(), (2, 0))
+        self.assertEqual(send_queued_sms(), (0, 0))
+
+        for message in OutboundSMS.objects.all():
+            self.assertEqual((message.status, message.attempts), ('sent', 1))
+            self.assertTrue(message.message_sid.startswith('SM'))
+        first = FakeTwilioHttpClient.requests[0]
+        self.assertEqual((first.data['To'], first.data['Body'], first.data['From']), ('+27820000002', 'Hello', '+15550000000'))
+        self.assertTrue(first.data['StatusCallback'].endswith('/api/telecommunications/sms/status/'))
+
+    @override_settings(TWILIO_MESSAGING_SERVICE_SID='MG' + '0' * 32)
+    def test_messaging_service_replaces_the_number(self):
+        queue_sms([('+27820000002', 'Hello')])
+        send_queued_sms()
+        request, = FakeTwilioHttpClient.requests
+        self.assertEqual(request.data['MessagingServiceSid'], 'MG' + '0' * 32)
+        self.assertNotIn('From', request.data)
+
+    def test_failed_sms_is_retried_then_failed(self):
+        queue_sms([('+27820000002', 'Hello')])
+        with mock.patch.object(FakeTwilioHttpClient, 'request', side_effect=OSError('unreachable')):
+            for status in ('queued', 'queued', 'failed'):
+                self.assertEqual(send_queued_sms(), (0, 1))
+                message = OutboundSMS.objects.get()
+                self.assertEqual((message.status, message.error), (status, 'unreachable'))
+            self.assertEqual(send_queued_sms(), (0, 0))
+        self.assertEqual(message.attempts, MAX_SMS_ATTEMPTS)
+
+    @override_settings(TWILIO_SMS_PER_SECOND=2)
+    def test_sends_are_paced(self):
+        queue_sms([('+27820000002', str(i)) for i in range(3)])
+        with mock.patch('telecommunications.sms.time.sleep') as sleep:
+            self.assertEqual(send_queued_sms(), (3, 0))
+        # The clock doesn't move while sleep is mocked, so each wait covers the whole backlog
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertAlmostEqual(delays[0], 0.5, delta=0.05)
+        self.assertAlmostEqual(delays[1], 1.0, delta=0.05)
+
+    def test_command_drains_the_outbox(self):
+        queue_sms([('+27820000002', str(i)) for i in range(3)])
+        out = StringIO()
+        call_command('send_queued_sms', '--batch-size=2', stdout=out)
+        self.assertEqual(out.getvalue(), 'Sent 3 SMS, 0 failed\n')
+        self.assertFalse(OutboundSMS.objects.exclude(status='sent').exists())
+
+
+@override_settings(**TWILIO)
+class SMSStatusCallbackTests(TestCase):
+    url = '/api/telecommunications/sms/status/'
+
+    def setUp(self):
+        self.message = OutboundSMS.objects.create(to='+27820000002', body='Hello', status='sent', message_sid='SM' + '1' * 32)
+
+    def callback(self, status, **data):
+        return self.client.post(self.url, {'MessageSid': self.message.message_sid, 'MessageStatus': status, **data})
+
+    def test_receipts_only_move_forward(self):
+        self.assertEqual(self.callback('delivered').status_code, 204)
+        # A late 'sent' receipt doesn't undo the delivery
+        self.assertEqual(self.callback('sent').status_code, 204)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'delivered')
+        self.assertIsNotNone(self.message.status_updated_at)
+
+    def test_undelivered_keeps_the_error_code(self):
+        self.callback('undelivered', ErrorCode='30003')
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.error_code), ('undelivered', 30003))
+
+    def test_unknown_statuses_and_messages_are_ignored(self):
+        self.assertEqual(self.callback('accepted').status_code, 204)
+        response = self.client.post(self.url, {'MessageSid': 'SM' + '2' * 32, 'MessageStatus': 'delivered'})
+        self.assertEqual(response.status_code, 204)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'sent')
+
+    def test_missing_fields_are_a_400(self):
+        self.assertEqual(self.client.post(self.url, {'MessageStatus': 'delivered'}).status_code, 400)
+
+    @override_settings(TWILIO_VALIDATE_SIGNATURES=True)
+    def test_unsigned_receipts_are_rejected(self):
+        self.assertEqual(self.callback('delivered').status_code, 403)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.status, 'sent')
+
+
+def sent_code():
+    return re.search(r'\d{%d}' % OTP_LENGTH, OutboundSMS.objects.latest('pk').body).group()
+
+
+class OTPTests(TestCase):
+    number = '+27820000002'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_code_is_consumed_on_success(self):
+        send_code(1, self.number)
+        code = sent_code()
+        with self.assertRaises(OTPError):
+            check_code(2, self.number, code)
+        self.assertTrue(check_code(1, self.number, f' {code} '))
+        with self.assertRaises(OTPError):
+            check_code(1, self.number, code)
+
+    def test_code_is_tied_to_the_number(self):
+        send_code(1, self.number)
+        with self.assertRaises(OTPError):
+            check_code(1, '+27820000003', sent_code())
+
+    def test_sends_are_limited_per_number(self):
+        for user_id in range(OTP_SENDS_PER_NUMBER):
+            send_code(user_id, self.number)
+        with self.assertRaises(OTPError):
+            send_code(99, self.number)
+        send_code(99, '+27820000003')
+        self.assertEqual(OutboundSMS.objects.filter(to=self.number).count(), OTP_SENDS_PER_NUMBER)
+
+    def test_too_many_wrong_guesses_discard_the_code(self):
+        send_code(1, self.number)
+        code = sent_code()
+        wrong = str((int(code) + 1) % 10 ** OTP_LENGTH).zfill(OTP_LENGTH)
+        for _ in range(OTP_MAX_ATTEMPTS):
+            self.assertFalse(check_code(1, self.number, wrong))
+        with self.assertRaises(OTPError):
+            check_code(1, self.number, code)
+
+    def test_code_expires(self):
+        send_code(1, self.number)
+        with mock.patch('time.time', return_value=time.time() + OTP_TTL + 1):
+            with self.assertRaises(OTPError):
+                check_code(1, self.number, sent_code())
+            # The send limit expires with it
+            for user_id in range(OTP_SENDS_PER_NUMBER):
+                send_code(user_id, self.number)
+
+
+class CallStatsTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        self.patient = User.objects.create_user(username='patient', password='x', is_patient=True)
+        doctor_user = User.objects.create_user(username='doctor', password='x', first_name='Thandi', last_name='Khumalo', is_doctor=True)
+        self.doctor = Doctor.objects.create(user=doctor_user, speciality='GP', city='Durban', province='KZN')
+        other_user = User.objects.create_user(username='other', password='x', last_name='Naidoo', is_doctor=True)
+        self.other = Doctor.objects.create(user=other_user, speciality='GP', city='Durban', province='KZN')
+        self.today = timezone.localdate()
+
+    def call(self, doctor, status, duration=None):
+        record = CallRecord.objects.create(initiated_by=doctor.user, doctor=doctor, agent_number='+1', customer_number='+2')
+        return finish_call(record.pk, 'CA' + str(record.pk).zfill(32), status, duration)
+
+    def get(self, user, path, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(f'/api/telecommunications/stats/{path}/', params)
+
+    def test_finished_calls_roll_up_once(self):
+        self.call(self.doctor, 'completed', '60')
+        self.call(self.doctor, 'completed', '30')
+        self.call(self.doctor, 'no-answer', '5')
+        record = CallRecord.objects.first()
+        self.assertFalse(finish_call(record.pk, record.call_sid, 'completed', '60'))
+
+        stat = CallDailyStat.objects.get(doctor=self.doctor)
+        self.assertEqual(
+            (stat.date, stat.calls, stat.answered, stat.total_duration), (self.today, 3, 2, 90),
+        )
+
+    def test_daily_stats(self):
+        self.call(self.doctor, 'completed', '60')
+        self.call(self.doctor, 'busy')
+        CallDailyStat.objects.create(doctor=self.other, date=self.today - timedelta(days=1), calls=2)
+        CallDailyStat.objects.create(doctor=self.other, date=self.today - timedelta(days=40), calls=9)
+
+        response = self.get(self.staff, 'daily')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'date': str(self.today - timedelta(days=1)), 'calls': 2, 'answered': 0, 'answer_rate': 0.0, 'avg_duration': None},
+            {'date': str(self.today), 'calls': 2, 'answered': 1, 'answer_rate': 0.5, 'avg_duration': 60.0},
+        ])
+        since = self.today - timedelta(days=50)
+        self.assertEqual(sum(row['calls'] for row in self.get(self.staff, 'daily', **{'from': since}).json()), 13)
+        self.assertEqual(len(self.get(self.staff, 'daily', doctor=self.doctor.pk).json()), 1)
+
+    def test_doctor_stats(self):
+        self.call(self.doctor, 'completed', '60')
+        self.call(self.other, 'completed', '20')
+        self.call(self.other, 'failed')
+
+        response = self.get(self.staff, 'doctors')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'doctor_id': self.other.pk, 'doctor_name': 'Naidoo', 'calls': 2, 'answered': 1, 'answer_rate': 0.5, 'avg_duration': 20.0},
+            {'doctor_id': self.doctor.pk, 'doctor_name': 'Thandi Khumalo', 'calls': 1, 'answered': 1, 'answer_rate': 1.0, 'avg_duration': 60.0},
+        ])
+
+    def test_doctors_only_see_their_own_calls(self):
+        self.call(self.doctor, 'completed', '60')
+        self.call(self.other, 'completed', '20')
+        for path in ('daily', 'doctors'):
+            with self.subTest(path=path):
+                rows = self.get(self.doctor.user, path, doctor=self.other.pk).json()
+                self.assertEqual([row['calls'] for row in rows], [1])
+        self.assertEqual(self.get(self.doctor.user, 'doctors').json()[0]['doctor_id'], self.doctor.pk)
+
+    def test_other_users_may_not_read_stats(self):
+        for path in ('daily', 'doctors'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(self.patient, path).status_code, 403)
+                self.client.force_authenticate(None)
+                self.assertEqual(self.client.get(f'/api/telecommunications/stats/{path}/').status_code, 401)
+
+
+def baseline_twiml(message, number=None):
+    # How the views built their TwiML before it was cached
+    response = VoiceResponse()
+    response.say(message, voice='alice')
+    if number:
+        dial = Dial()
+        dial.number(number)
+        response.append(dial)
+    return str(response).encode()
+
+
+@override_settings(**TWILIO)
+class TwiMLTests(TestCase):
+    def setUp(self):
+        connect_call_twiml.cache_clear()
+        incoming_call_twiml.cache_clear()
+
+    def test_connect_twiml_matches_the_baseline(self):
+        for number in ('+27820000002', '+27 82 000 0003', '<+1>'):
+            with self.subTest(number=number):
+                response = self.client.post('/api/telecommunications/voice/connect/?' + urlencode({'customer_number': number}))
+                self.assertEqual(response['Content-Type'], TWIML_CONTENT_TYPE)
+                self.assertEqual(response.content, baseline_twiml('Connecting you to the patient now.', number))
+        response = self.client.post('/api/telecommunications/voice/connect/')
+        self.assertEqual(response.content, baseline_twiml('Error. No customer number provided.'))
+
+    def test_connect_twiml_is_cached_per_number(self):
+        first = connect_call_twiml('+27820000002')
+        self.assertIs(connect_call_twiml('+27820000002'), first)
+        connect_call_twiml('+27820000003')
+        info = connect_call_twiml.cache_info()
+        self.assertEqual((info.hits, info.currsize, info.maxsize), (1, 2, 1024))
+
+    @override_settings(SUPPORT_PHONE_NUMBER='+27110000001')
+    def test_incoming_twiml_follows_the_support_number(self):
+        response = self.client.post('/api/telecommunications/voice/incoming/')
+        self.assertEqual(response.content, baseline_twiml('Welcome to MedMap. Connecting you to support.', '+27110000001'))
+        self.assertEqual(incoming_call_twiml.cache_info().currsize, 1)
+
+        with override_settings(SUPPORT_PHONE_NUMBER=''):
+            self.assertEqual(incoming_call_twiml.cache_info().currsize, 0)
+            response = self.client.post('/api/telecommunications/voice/incoming/')
+            self.assertEqual(response.content, baseline_twiml(
+                'Welcome to MedMap. Our support line is currently unavailable. Please try again later.',
+            ))
+        self.assertEqual(incoming_call_twiml.cache_info().currsize, 0)
@@ -0,0 +1,46 @@
+"""
+TwiML documents for the voice webhooks.
+
+The documents depend only on configuration (the support number) or on the
+number being dialled, so each is built once and cached as encoded bytes.
+"""
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from twilio.twiml.voice_response import Dial, VoiceResponse
+
+TWIML_CONTENT_TYPE = 'application/xml'
+
+
+@lru_cache(maxsize=8)
+def incoming_call_twiml(support_number):
+    response = VoiceResponse()
+    if support_number:
+        response.say("Welcome to MedMap. Connecting you to support.", voice='alice')
+        dial = Dial()
+        dial.number(support_number)
+        response.append(dial)
+    else:
+        # Fallback if no support number is configured
+        response.say("Welcome to MedMap. Our support line is currently unavailable. Please try again later.", voice='alice')
+    return str(response).encode()
+
+
+@lru_cache(maxsize=1024)
+def connect_call_twiml(customer_number):
+    response = VoiceResponse()
+    if customer_number:
+        response.say("Connecting you to the patient now.", voice='alice')
+        dial = Dial()
+        dial.number(customer_number)
+        response.append(dial)
+    else:
+        response.say("Error. No customer number provided.", voice='alice')
+    return str(response).encode()
+
+
+@receiver(setting_changed)
+def _reset_twiml(setting, **kwargs):
+    if setting == 'SUPPORT_PHONE_NUMBER':
+        incoming_call_twiml.cache_clear()
@@ -1,8 +1,13 @@
 from django.urls import path
-from .views import MakeCallView, IncomingCallView, ConnectCallView
+from .views import MakeCallView, IncomingCallView, ConnectCallView, CallJobView, CallStatusCallbackView, SMSStatusCallbackView, DailyCallStatsView, DoctorCallStatsView
 
 urlpatterns = [
     path('call/', MakeCallView.as_view(), name='make-call'),
     path('voice/incoming/', IncomingCallView.as_view(), name='incoming-call'),
+    path('call/<str:job_id>/', CallJobView.as_view(), name='call-job'),
+    path('voice/status/', CallStatusCallbackView.as_view(), name='call-status'),
+    path('stats/daily/', DailyCallStatsView.as_view(), name='call-stats-daily'),
+    path('stats/doctors/', DoctorCallStatsView.as_view(), name='call-stats-doctors'),
+    path('sms/status/', SMSStatusCallbackView.as_view(), name='sms-status'),
     path('voice/connect/', ConnectCallView.as_view(), name='connect-call'),
 ]
@@ -1,52 +1,84 @@
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
 from django.conf import settings
-from twilio.twiml.voice_response import VoiceResponse, Dial
-from twilio.rest import Client
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from bookings.models import Booking
+from core.async_views import AsyncAPIView, json_response
+from doctors.models import Doctor
+from .calls import aplace_call, get_call_job, start_call_job
+from .client import check_configured
+from .models import CallDailyStat
+from .records import open_call_record, record_call_progress
+from .signatures import TWILIO_WEBHOOK, twilio_signature_required
+from .sms import record_sms_status
+from .twiml import TWIML_CONTENT_TYPE, connect_call_twiml, incoming_call_twiml
 import logging
-import urllib.parse
 
 logger = logging.getLogger(__name__)
 
-class MakeCallView(APIView):
+class MakeCallView(AsyncAPIView):
     """
     Initiates a "Click-to-Call" bridge.
     1. System calls the 'agent_number' (e.g., Doctor or Admin).
     2. When Agent answers, system dials 'customer_number' (e.g., Patient).
+
+    An async view: under ASGI the worker keeps serving other requests while
+    Twilio answers. Pass "async": true to queue the call and get a job id
+    back immediately; poll CallJobView for its status. Pass "booking" to
+    attribute the call to that booking's doctor and patient.
     """
-    permission_classes = [permissions.IsAuthenticated]
+    # Each call costs money
+    throttle_scope = 'calls'
 
-    def post(self, request):
+    async def post(self, request):
         # The person initiating the call (e.g., Doctor)
         agent_number = request.data.get('agent_number')
         # The person receiving the call (e.g., Patient)
         customer_number = request.data.get('customer_number')
         
         if not agent_number or not customer_number:
-            return Response({"error": "Both 'agent_number' and 'customer_number' are required"}, status=400)
+            return json_response({"error": "Both 'agent_number' and 'customer_number' are required"}, status=400)
+
+        run_async = str(request.data.get('async', request.query_params.get('async', ''))).lower() in ('1', 'true')
+
+        booking = None
+        booking_id = request.data.get('booking')
+        if booking_id:
+            booking = await Booking.objects.filter(pk=booking_id).select_related('doctor').afirst()
+            if booking is None or not (
+                request.user.is_staff or booking.user_id == request.user.pk or booking.doctor.user_id == request.user.pk
+            ):
+                return json_response({"error": "Booking not found"}, status=404)
 
         try:
-            if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN or not settings.TWILIO_PHONE_NUMBER:
-                raise ValueError("Twilio credentials are not configured")
-
-            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-
-            # URL encoded customer number to pass as a query param
-            encoded_customer_number = urllib.parse.quote_plus(customer_number)
-            
-            # Initiate call to the Agent first
-            call = client.calls.create(
-                to=agent_number,
-                from_=settings.TWILIO_PHONE_NUMBER,
-                # When Agent answers, fetch TwiML from this URL to dial the Customer
-                url=f"{settings.BACKEND_URL}/api/telecommunications/voice/connect/?customer_number={encoded_customer_number}"
-            )
-
-            return Response({
+            check_configured()  # Raises before a record is opened if Twilio is not configured
+            record = await sync_to_async(open_call_record)(request.user, agent_number, customer_number, booking=booking)
+
+            if run_async:
+                job_id = await sync_to_async(start_call_job)(record, user_id=request.user.pk)
+                return json_response({
+                    "success": True,
+                    "message": "Call queued. Connection to customer will follow once the agent answers.",
+                    "job_id": job_id,
+                    "call_id": record.pk
+                }, status=202)
+
+            call = await aplace_call(record)
+
+            return json_response({
                 "success": True,
                 "message": "Calling agent... Connection to customer will follow.",
-                "call_sid": call.sid
+                "call_sid": call.sid,
+                "call_id": record.pk
             })
         except Exception as e:
             logger.error(f"Error initiating call: {e}")
@@ -54,49 +86,154 @@ class MakeCallView(APIView):
             # Add hint for common trial account error
             if "verify" in error_message.lower() or "unverified" in error_message.lower():
                 error_message += " (Hint: On a Twilio Trial account, you can only call verified numbers. Check your Twilio Console 'Verified Caller IDs'.)"
-            return Response({"error": error_message}, status=500)
+            return json_response({"error": error_message}, status=500)
 
-class IncomingCallView(APIView):
+@method_decorator([csrf_exempt, twilio_signature_required], name='dispatch')
+class IncomingCallView(View):
     """
     Webhook for inbound calls to the MedMap number.
     Forwards the call to the SUPPORT_PHONE_NUMBER (e.g., Reception/Admin).
+    Plain Django view: the TwiML is cached and needs no DRF negotiation.
     """
-    permission_classes = [permissions.AllowAny]
+    http_method_names = ['post']
 
     def post(self, request):
-        response = VoiceResponse()
-        
-        support_number = getattr(settings, 'SUPPORT_PHONE_NUMBER', None)
-        
-        if support_number:
-            response.say("Welcome to MedMap. Connecting you to support.", voice='alice')
-            dial = Dial()
-            dial.number(support_number)
-            response.append(dial)
-        else:
-            # Fallback if no support number is configured
-            response.say("Welcome to MedMap. Our support line is currently unavailable. Please try again later.", voice='alice')
-        
-        return Response(str(response), content_type='application/xml')
+        twiml = incoming_call_twiml(getattr(settings, 'SUPPORT_PHONE_NUMBER', None))
+        return HttpResponse(twiml, content_type=TWIML_CONTENT_TYPE)
 
-class ConnectCallView(APIView):
+@method_decorator([csrf_exempt, twilio_signature_required], name='dispatch')
+class ConnectCallView(View):
     """
     TwiML instructions to bridge the call to the Customer.
     This is hit after the Agent answers.
     """
+    http_method_names = ['post']
+
+    def post(self, request):
+        twiml = connect_call_twiml(request.GET.get('customer_number'))
+        return HttpResponse(twiml, content_type=TWIML_CONTENT_TYPE)
+
+class CallJobView(APIView):
+    """
+    Status of a call queued with MakeCallView in async mode.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_call_job(job_id)
+        if job is None or (job['user_id'] != request.user.pk and not request.user.is_staff):
+            return Response({"error": "Call job not found"}, status=404)
+        return Response(job)
+
+class CallStatusCallbackView(APIView):
+    """
+    Twilio status callback for placed calls. Updates the CallRecord, which
+    also holds the job of an async call.
+    """
+    authentication_classes = TWILIO_WEBHOOK
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        customer_number = request.query_params.get('customer_number')
-        
-        response = VoiceResponse()
-        
-        if customer_number:
-            response.say("Connecting you to the patient now.", voice='alice')
-            dial = Dial()
-            dial.number(customer_number)
-            response.append(dial)
+        record_id = request.query_params.get('record', '')
+        call_status = request.data.get('CallStatus')
+        if not record_id.isdigit() or not call_status:
+            return Response(status=400)
+
+        record_call_progress(int(record_id), request.data.get('CallSid'), call_status, request.data.get('CallDuration'))
+        return Response(status=204)
+
+@method_decorator([csrf_exempt, twilio_signature_required], name='dispatch')
+class SMSStatusCallbackView(View):
+    """
+    Twilio delivery receipts for messages sent from the SMS outbox.
+    """
+    http_method_names = ['post']
+
+    def post(self, request):
+        message_sid = request.POST.get('MessageSid')
+        message_status = request.POST.get('MessageStatus')
+        if not message_sid or not message_status:
+            return HttpResponse(status=400)
+        record_sms_status(message_sid, message_status, request.POST.get('ErrorCode'))
+        return HttpResponse(status=204)
+
+
+def summarize(row):
+    calls, answered, total_duration = row.pop('calls'), row.pop('answered'), row.pop('total_duration')
+    row.update(
+        calls=calls,
+        answered=answered,
+        answer_rate=round(answered / calls, 3) if calls else None,
+        avg_duration=round(total_duration / answered, 1) if answered else None,
+    )
+    return row
+
+
+class CallStatsMixin:
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_stats(self, request):
+        """
+        CallDailyStat rows in the ?from=&to= date range (default: last 30 days).
+        Doctors only see their own calls; staff may filter with ?doctor=.
+        """
+        today = timezone.localdate()
+        date_to = parse_date(request.query_params.get('to', '')) or today
+        date_from = parse_date(request.query_params.get('from', '')) or date_to - timedelta(days=29)
+        stats = CallDailyStat.objects.filter(date__gte=date_from, date__lte=date_to)
+
+        if request.user.is_staff:
+            doctor_id = request.query_params.get('doctor')
+            if doctor_id:
+                stats = stats.filter(doctor_id=doctor_id)
         else:
-            response.say("Error. No customer number provided.", voice='alice')
-            
-        return Response(str(response), content_type='application/xml')
+            doctor_id = Doctor.objects.filter(user=request.user).values_list('pk', flat=True).first()
+            if doctor_id is None:
+                return None
+            stats = stats.filter(doctor_id=doctor_id)
+        return stats
+
+    @staticmethod
+    def totals():
+        return {
+            'calls': Sum('calls'),
+            'answered': Sum('answered'),
+            'total_duration': Sum('total_duration'),
+        }
+
+
+class DailyCallStatsView(CallStatsMixin, APIView):
+    """
+    Calls per day with answer rate and average answered duration.
+    """
+
+    def get(self, request):
+        stats = self.get_stats(request)
+        if stats is None:
+            return Response({"error": "Only doctors and staff can view call statistics"}, status=403)
+        rows = stats.values('date').annotate(**self.totals()).order_by('date')
+        return Response([summarize(row) for row in rows])
+
+
+class DoctorCallStatsView(CallStatsMixin, APIView):
+    """
+    Call totals per doctor over the date range.
+    """
+
+    def get(self, request):
+        stats = self.get_stats(request)
+        if stats is None:
+            return Response({"error": "Only doctors and staff can view call statistics"}, status=403)
+        rows = (
+            stats.values('doctor_id', 'doctor__user__first_name', 'doctor__user__last_name')
+            .annotate(**self.totals())
+            .order_by('-calls')
+        )
+        return Response([
+            summarize({
+                'doctor_id': row.pop('doctor_id'),
+                'doctor_name': f"{row.pop('doctor__user__first_name')} {row.pop('doctor__user__last_name')}".strip() or None,
+                **row,
+            })
+            for row in rows
+        ])
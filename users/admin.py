@@ -1,11 +1,26 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from .emails import queue_verification_emails
 from .models import User
 
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'is_patient', 'is_doctor', 'is_staff')
+    list_display = ('username', 'email', 'is_patient', 'is_doctor', 'is_staff', 'email_verified')
+    list_filter = UserAdmin.list_filter + ('email_verified',)
     fieldsets = UserAdmin.fieldsets + (
-        ('Role Info', {'fields': ('is_patient', 'is_doctor', 'phone_number')}),
+        ('Role Info', {'fields': ('is_patient', 'is_doctor', 'phone_number', 'phone_verified', 'email_verified')}),
     )
+    actions = ['resend_verification_emails']
+
+    @admin.action(description='Resend verification email to unverified users')
+    def resend_verification_emails(self, request, queryset):
+        # Streams the selection rather than loading thousands of users at once
+        rows = (
+            queryset.filter(email_verified=False, is_active=True)
+            .exclude(email='')
+            .values_list('id', 'email', 'first_name')
+            .iterator(chunk_size=2000)
+        )
+        queued = queue_verification_emails(rows)
+        self.message_user(request, f"Queued {queued} verification email(s).", messages.SUCCESS)
 
 admin.site.register(User, CustomUserAdmin)
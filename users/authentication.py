@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.models import TokenUser
+
+from .tokens import VERSION_CLAIM, StreamTicket, is_current
+
+
+class RoleTokenUser(TokenUser):
+    """
+    User built from an access token's role claims, with no database row behind it.
+    """
+    is_anonymous = False
+
+    @cached_property
+    def is_doctor(self):
+        return self.token.get('is_doctor', False)
+
+    @cached_property
+    def is_patient(self):
+        return self.token.get('is_patient', False)
+
+    @cached_property
+    def doctor_id(self):
+        return self.token.get('doctor_id')
+
+
+class RoleJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that rejects revoked tokens and, for safe methods on
+    views that set `stateless_auth = True`, returns a RoleTokenUser instead
+    of loading the User. Such views must only use request.user.pk and the
+    role flags. Every other request gets the full User as before, and its
+    token is checked against the loaded row at no extra cost.
+
+    Stateless requests check the token version in the cache, so they need
+    a shared one: a per-process cache can't see revocations made by other
+    workers. Without one they load the User like any other request.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        token = self.get_validated_token(raw_token)
+        if (
+            VERSION_CLAIM in token and settings.CACHE_SHARED
+            and request.method in SAFE_METHODS and self.allows_stateless(request)
+        ):
+            if not is_current(token):
+                raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+            return RoleTokenUser(token), token
+
+        user = self.get_user(token)
+        if VERSION_CLAIM in token and token[VERSION_CLAIM] != user.token_version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return user, token
+
+    @staticmethod
+    def allows_stateless(request):
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        return getattr(view, 'stateless_auth', False)
+
+
+class StreamTicketAuthentication(BaseAuthentication):
+    """
+    Authenticates ?ticket= with a StreamTicket, as a RoleTokenUser. Only for
+    event streams, which browsers open without custom headers.
+    """
+    www_authenticate_realm = 'api'
+
+    def authenticate(self, request):
+        raw_ticket = request.query_params.get('ticket')
+        if not raw_ticket:
+            return None
+        try:
+            ticket = StreamTicket(raw_ticket)
+        except TokenError as e:
+            raise AuthenticationFailed(str(e), code='ticket_not_valid')
+        if not is_current(ticket):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return RoleTokenUser(ticket), ticket
+
+    def authenticate_header(self, request):
+        return f'Bearer realm="{self.www_authenticate_realm}"'
@@ -0,0 +1,61 @@
+"""
+Email verification links and their emails.
+
+Tokens are signed user ids, so verifying needs no stored state. Emails go
+through the notifications outbox (see medmap_notifications.services) and
+are sent by the send_queued_emails worker, never inside the request.
+"""
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.template.loader import get_template
+
+from medmap_notifications.services import queue_emails
+
+VERIFY_SALT = 'email-verify'
+VERIFY_MAX_AGE = 60 * 60 * 24
+VERIFY_SUBJECT = 'Confirm your MedMap email address'
+VERIFY_TEMPLATE = 'users/verification_email.txt'
+
+
+def make_verification_token(user_id):
+    return signing.dumps(user_id, salt=VERIFY_SALT)
+
+
+def read_verification_token(token):
+    """
+    Return the user id in `token`. Raises signing.SignatureExpired or
+    signing.BadSignature.
+    """
+    return signing.loads(token, salt=VERIFY_SALT, max_age=VERIFY_MAX_AGE)
+
+
+def verification_link(user_id):
+    query = urlencode({'type': 'email_confirmation', 'token': make_verification_token(user_id)})
+    return f"{settings.FRONTEND_URL}/email-verification?{query}"
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    # Compiled once per process, whichever template loaders are configured
+    return get_template(name)
+
+
+def verification_email(user_id, email, first_name=''):
+    body = _template(VERIFY_TEMPLATE).render({'first_name': first_name, 'link': verification_link(user_id)})
+    return email, VERIFY_SUBJECT, body
+
+
+def queue_verification_emails(users, chunk_size=500):
+    """
+    Queue verification emails for (id, email, first_name) rows, one INSERT
+    per chunk. `users` can be a lazy iterator. Returns the number queued.
+    """
+    queued = 0
+    iterator = iter(users)
+    while chunk := list(islice(iterator, chunk_size)):
+        queued += len(queue_emails([verification_email(*row) for row in chunk]))
+    return queued
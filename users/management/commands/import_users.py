@@ -0,0 +1,264 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from users.tokens import revoke_tokens
+
+User = get_user_model()
+
+ROLES = ('patient', 'doctor', 'admin')
+UPDATE_FIELDS = ['first_name', 'last_name', 'phone_number', 'is_patient', 'is_doctor', 'is_staff', 'is_superuser']
+# Supabase (GoTrue) stores bare bcrypt hashes
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def read_records(stream, fmt):
+    """
+    Yield one dict per user. CSV and JSON Lines are streamed; a JSON array
+    has to be parsed whole.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        data = json.load(stream)
+        yield from (data.get('users', []) if isinstance(data, dict) else data)
+
+
+def role_flags(role):
+    return {
+        'is_patient': role == 'patient',
+        'is_doctor': role == 'doctor',
+        'is_staff': role == 'admin',
+        'is_superuser': role == 'admin',
+    }
+
+
+def import_password_hash(password_hash):
+    """
+    Return `password_hash` in Django's "<algorithm>$..." format, or None if
+    no enabled hasher (with its library installed) can verify it.
+    """
+    if password_hash.startswith(BCRYPT_PREFIXES):
+        password_hash = f'bcrypt${password_hash}'
+    try:
+        hasher = identify_hasher(password_hash)
+    except ValueError:
+        return None
+    library = getattr(hasher, 'library', None)
+    module = library[1] if isinstance(library, tuple) else library
+    if module and find_spec(module) is None:
+        return None
+    return password_hash
+
+
+def _setup_worker(settings_module):
+    # Needed when worker processes are spawned rather than forked
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from CSV, JSON Lines or a JSON array. Existing users (matched by email, ignoring case) '
+        'are skipped or, with --update, updated in bulk. Passwords are hashed in a process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument('--format', choices=('csv', 'jsonl', 'json'), help='Defaults to the file extension')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Records resolved and written per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Password hashing processes')
+        parser.add_argument('--default-role', choices=ROLES, default='patient', help='Role for new users whose record has none')
+        parser.add_argument('--update', action='store_true', help='Update names, phone and role of existing users')
+        parser.add_argument('--fix-roles', action='store_true', help='Afterwards, make every user without a role a patient')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and match without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl', 'json'):
+            raise CommandError('Cannot tell the input format; pass --format')
+
+        self.options = options
+        self.created = self.updated = self.skipped = self.invalid = self.rejected_hashes = 0
+
+        stream = sys.stdin if path == '-' else open(path, encoding=options['encoding'], newline='')
+        executor = None
+        if options['workers'] > 1 and not options['dry_run']:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=_setup_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'medmap_backend.settings'),),
+            )
+        try:
+            for chunk in chunked(read_records(stream, fmt), options['chunk_size']):
+                self.import_chunk(chunk, executor)
+                self.stdout.write(f"  {self.created} created, {self.updated} updated, {self.skipped} skipped", ending='\r')
+        finally:
+            if executor:
+                executor.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write('')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was written'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {self.created}, updated {self.updated}, skipped {self.skipped} existing, {self.invalid} invalid"
+        ))
+        if self.rejected_hashes:
+            self.stdout.write(self.style.WARNING(
+                f"{self.rejected_hashes} password hash(es) could not be imported; those users must reset their password"
+            ))
+
+        if options['fix_roles']:
+            self.fix_roles()
+
+    def normalize(self, record):
+        email = (record.get('email') or '').strip().lower()
+        if not email or '@' not in email:
+            return None
+
+        password_hash = record.get('password_hash') or None
+        if password_hash:
+            password_hash = import_password_hash(password_hash)
+            if password_hash is None:
+                self.rejected_hashes += 1
+                self.stderr.write(f"  {email}: unsupported password hash, importing without a password")
+
+        metadata = record.get('user_metadata') or {}
+        first_name = record.get('first_name') or ''
+        last_name = record.get('last_name') or ''
+        full_name = record.get('full_name') or metadata.get('full_name')
+        if full_name and not (first_name or last_name):
+            first_name, _, last_name = full_name.strip().partition(' ')
+
+        # None leaves an existing user's role alone
+        role = (record.get('role') or '').strip().lower()
+        return {
+            'email': email,
+            'first_name': first_name[:150],
+            'last_name': last_name[:150],
+            'phone_number': (record.get('phone_number') or record.get('phone') or metadata.get('phone_number') or '')[:20] or None,
+            'role': role if role in ROLES else None,
+            'password': record.get('password') or None,
+            'password_hash': password_hash,
+        }
+
+    def import_chunk(self, records, executor):
+        rows = {}
+        for record in records:
+            row = self.normalize(record)
+            if row is None:
+                self.invalid += 1
+            else:
+                rows.setdefault(row['email'], row)  # First occurrence wins within a chunk
+
+        # Email is not unique on User and username defaults to the email, so match on either, ignoring case
+        existing = {}
+        users = (
+            User.objects.annotate(email_lower=Lower('email'), username_lower=Lower('username'))
+            .filter(Q(email_lower__in=rows) | Q(username_lower__in=rows))
+            .only('pk', 'email', 'username', *UPDATE_FIELDS)
+        )
+        for user in users:
+            if user.email_lower:
+                existing.setdefault(user.email_lower, user)
+            existing.setdefault(user.username_lower, user)
+
+        new_rows = [row for email, row in rows.items() if email not in existing]
+        found = [(existing[email], row) for email, row in rows.items() if email in existing]
+
+        if self.options['dry_run']:
+            self.created += len(new_rows)
+            if self.options['update']:
+                self.updated += len(found)
+            else:
+                self.skipped += len(found)
+            return
+
+        hashes = self.hash_passwords([row['password'] for row in new_rows if not row['password_hash']], executor)
+        new_users = []
+        for row in new_rows:
+            password = row['password_hash'] or next(hashes)
+            new_users.append(User(
+                username=row['email'],
+                email=row['email'],
+                password=password,
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                phone_number=row['phone_number'],
+                **role_flags(row['role'] or self.options['default_role']),
+            ))
+
+        changed = []
+        role_changed = []
+        if self.options['update']:
+            for user, row in found:
+                if row['role']:
+                    flags = role_flags(row['role'])
+                    if any(getattr(user, field) != value for field, value in flags.items()):
+                        role_changed.append(user.pk)
+                    for field, value in flags.items():
+                        setattr(user, field, value)
+                for field in ('first_name', 'last_name', 'phone_number'):
+                    if row[field]:
+                        setattr(user, field, row[field])
+                changed.append(user)
+
+        with transaction.atomic():
+            User.objects.bulk_create(new_users, batch_size=500)
+            if changed:
+                User.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=500)
+            if role_changed:
+                # Existing tokens must not keep the old role claims
+                revoke_tokens(*role_changed)
+
+        self.created += len(new_users)
+        self.updated += len(changed)
+        self.skipped += len(found) - len(changed)
+
+    def hash_passwords(self, passwords, executor):
+        """
+        Return an iterator of hashes in input order. Missing passwords become
+        unusable passwords, which need no hashing work.
+        """
+        if executor is None:
+            return iter([make_password(password) for password in passwords])
+        chunksize = max(1, len(passwords) // (self.options['workers'] * 4))
+        return executor.map(make_password, passwords, chunksize=chunksize)
+
+    def fix_roles(self):
+        without_role = User.objects.filter(is_patient=False, is_doctor=False, is_superuser=False, is_staff=False)
+        if self.options['dry_run']:
+            self.stdout.write(f"{without_role.count()} user(s) without a role would become patients")
+            return
+        fixed = 0
+        with transaction.atomic():
+            for user_ids in chunked(list(without_role.values_list('pk', flat=True)), 500):
+                fixed += User.objects.filter(pk__in=user_ids).update(is_patient=True)
+                revoke_tokens(*user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Set {fixed} user(s) without a role to patient"))
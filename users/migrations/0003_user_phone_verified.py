@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_email_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_verified',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -10,6 +10,9 @@ class User(AbstractUser):
     is_doctor = models.BooleanField(default=False)
     email_verified = models.BooleanField(default=False)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
+    phone_verified = models.BooleanField(default=False)
+    # Bumped whenever roles, password or active status change; tokens carrying an older value are rejected
+    token_version = models.PositiveIntegerField(default=0)
     
     # Address/Contact info could go here or in a separate Profile model
     
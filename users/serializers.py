@@ -9,8 +9,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'password', 'is_patient', 'is_doctor', 'phone_number', 'role', 'first_name', 'last_name')
-        read_only_fields = ('is_staff', 'is_superuser')
+        fields = ('id', 'username', 'email', 'password', 'is_patient', 'is_doctor', 'phone_number', 'phone_verified', 'role', 'first_name', 'last_name')
+        read_only_fields = ('is_staff', 'is_superuser', 'phone_verified')
 
     def get_role(self, obj):
         if obj.is_superuser or obj.is_staff:
@@ -20,18 +20,17 @@ class UserSerializer(serializers.ModelSerializer):
         return 'patient'
 
     def create(self, validated_data):
-        password = validated_data.pop('password')
         # Ensure username is set to email if not provided
         if 'username' not in validated_data and 'email' in validated_data:
             validated_data['username'] = validated_data['email']
-            
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+
+        # create_user hashes the password once; without one the password is unusable
+        return User.objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        if 'phone_number' in validated_data and validated_data['phone_number'] != instance.phone_number:
+            instance.phone_verified = False
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if password:
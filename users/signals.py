@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .tokens import forget_token_versions
+
+User = get_user_model()
+
+# Changes to these revoke the user's existing tokens
+TOKEN_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser', 'is_doctor', 'is_patient')
+
+
+def is_rehash(instance, update_fields):
+    """
+    True for the save check_password() makes after upgrading a hash to the
+    preferred hasher: it clears the raw password and writes only the hash.
+    Password changes through set_password() keep the raw password until saved.
+    """
+    return getattr(instance, '_password', None) is None and update_fields is not None and set(update_fields) == {'password'}
+
+
+@receiver(pre_save, sender=User)
+def bump_token_version(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not set(update_fields) & set(TOKEN_FIELDS):
+        return
+    current = User.objects.filter(pk=instance.pk).values(*TOKEN_FIELDS, 'token_version').first()
+    if current is None:
+        return
+    changed = {field for field in TOKEN_FIELDS if current[field] != getattr(instance, field)}
+    if changed == {'password'} and is_rehash(instance, update_fields):
+        return
+    if changed:
+        instance.token_version = current['token_version'] + 1
+        if update_fields is not None:
+            # token_version is not among the fields this save writes
+            User.objects.filter(pk=instance.pk).update(token_version=instance.token_version)
+
+
+@receiver(post_save, sender=User)
+def token_version_saved(sender, instance, created, **kwargs):
+    if not created:
+        forget_token_versions(instance.pk)
@@ -0,0 +1,300 @@
+import csv
+import os
+import re
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import BCryptPasswordHasher, identify_hasher, make_password
+from django.contrib.messages import get_messages
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from medmap_notifications.models import OutboundEmail
+from telecommunications.models import OutboundSMS
+from telecommunications.otp import OTP_LENGTH, OTP_SENDS_PER_NUMBER
+from .authentication import RoleJWTAuthentication, RoleTokenUser
+from .emails import (
+    VERIFY_MAX_AGE, VERIFY_SUBJECT, make_verification_token, queue_verification_emails, read_verification_token,
+)
+from .tokens import RoleRefreshToken, get_token_version, revoke_tokens
+
+
+class TokenVersionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='patient', password='x', is_patient=True)
+        self.access = str(RoleRefreshToken.for_user(self.user).access_token)
+
+    def get(self):
+        return self.client.get('/api/notifications/notifications/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_without_shared_cache_revocation_is_read_from_the_database(self):
+        self.assertEqual(self.get().status_code, 200)
+        # As if another worker had revoked them: nothing here hears about it
+        get_user_model().objects.filter(pk=self.user.pk).update(token_version=1)
+        self.assertEqual(self.get().status_code, 401)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_with_shared_cache_revocation_clears_the_cached_version(self):
+        self.assertEqual(get_token_version(self.user.pk), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token_version(self.user.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke_tokens(self.user.pk)
+        self.assertEqual(get_token_version(self.user.pk), 1)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_inactive_user_has_no_version(self):
+        user = get_user_model().objects.create_user(username='inactive', password='x', is_active=False)
+        for shared in (False, True):
+            with self.subTest(shared=shared), override_settings(CACHE_SHARED=shared):
+                self.assertIsNone(get_token_version(user.pk))
+
+
+class StatelessView:
+    stateless_auth = True
+
+
+class RoleJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='patient', password='x', is_patient=True)
+        self.access = str(RoleRefreshToken.for_user(self.user).access_token)
+
+    def authenticate(self, view=None):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        return RoleJWTAuthentication().authenticate(Request(request, parser_context={'view': view}))
+
+    @override_settings(CACHE_SHARED=True)
+    def test_stateless_reads_use_the_cached_version(self):
+        self.authenticate(StatelessView())
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(StatelessView())
+        self.assertIsInstance(user, RoleTokenUser)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_stateless_reads_load_the_user_without_shared_cache(self):
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(StatelessView())
+        self.assertEqual(user, self.user)
+
+        get_user_model().objects.filter(pk=self.user.pk).update(token_version=1)
+        with self.assertNumQueries(1), self.assertRaises(AuthenticationFailed):
+            self.authenticate(StatelessView())
+
+    def test_other_requests_check_the_loaded_user(self):
+        for shared in (False, True):
+            with self.subTest(shared=shared), override_settings(CACHE_SHARED=shared):
+                cache.clear()
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.authenticate()[0], self.user)
+
+
+# A bcrypt hash as GoTrue stores it
+SUPABASE_HASH = '$2a$10$NUdUPx4H2cGNgk0EaRU1LO7PbbjRUXlNjYd3L2G0fRAjBkcV0xk6m'
+
+
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_user(
+            username='admin@example.com', email='admin@example.com', password='x', is_staff=True, is_superuser=True,
+        )
+        self.doctor = User.objects.create_user(username='doc@example.com', email='doc@example.com', password='x', is_doctor=True)
+
+    def run_import(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            writer = csv.DictWriter(f, fieldnames=['email', 'first_name', 'role', 'password_hash'])
+            writer.writeheader()
+            writer.writerows(rows)
+        self.addCleanup(os.remove, f.name)
+        stderr = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_users', f.name, '--workers=1', *args, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_update_without_a_role_keeps_the_role(self):
+        self.run_import([
+            {'email': 'admin@example.com', 'first_name': 'Ada'},
+            {'email': 'doc@example.com', 'first_name': 'Dan', 'role': 'unknown'},
+            {'email': 'new@example.com', 'first_name': 'Nia'},
+        ], '--update', '--default-role=doctor')
+        self.admin.refresh_from_db()
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.admin.first_name, self.admin.is_staff, self.admin.is_superuser), ('Ada', True, True))
+        self.assertEqual((self.doctor.first_name, self.doctor.is_doctor, self.doctor.is_patient), ('Dan', True, False))
+        self.assertEqual((self.admin.token_version, self.doctor.token_version), (0, 0))
+        self.assertTrue(get_user_model().objects.get(email='new@example.com').is_doctor)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_role_change_revokes_tokens(self):
+        self.assertEqual(get_token_version(self.doctor.pk), 0)
+        self.run_import([{'email': 'doc@example.com', 'role': 'patient'}], '--update')
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.is_doctor, self.doctor.is_patient), (False, True))
+        self.assertEqual(get_token_version(self.doctor.pk), 1)
+
+    def test_emails_are_matched_ignoring_case(self):
+        get_user_model().objects.filter(pk=self.doctor.pk).update(email='Doc@Example.com')
+        self.run_import([
+            {'email': ' DOC@example.COM ', 'first_name': 'Dan'},
+            {'email': 'New@Example.com', 'first_name': 'Nia'},
+            {'email': 'new@example.com', 'first_name': 'Duplicate'},
+        ], '--update')
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.first_name, 'Dan')
+        new = get_user_model().objects.get(username='new@example.com')
+        self.assertEqual((new.email, new.first_name), ('new@example.com', 'Nia'))
+        self.assertEqual(get_user_model().objects.count(), 3)
+
+    def test_supabase_bcrypt_hashes_are_imported(self):
+        # bcrypt isn't required to run the tests, so pretend its library is installed
+        with mock.patch('users.management.commands.import_users.find_spec', return_value=object()):
+            stderr = self.run_import([{'email': 'ann@example.com', 'password_hash': SUPABASE_HASH}])
+        self.assertEqual(stderr, '')
+        password = get_user_model().objects.get(email='ann@example.com').password
+        self.assertEqual(password, f'bcrypt${SUPABASE_HASH}')
+        self.assertIsInstance(identify_hasher(password), BCryptPasswordHasher)
+
+    def test_unverifiable_hashes_are_rejected(self):
+        django_hash = make_password('secret')
+        with mock.patch('users.management.commands.import_users.find_spec', return_value=None):
+            stderr = self.run_import([
+                {'email': 'ann@example.com', 'password_hash': SUPABASE_HASH},
+                {'email': 'bob@example.com', 'password_hash': 'plain-text'},
+                {'email': 'cat@example.com', 'password_hash': django_hash},
+            ])
+        self.assertEqual(stderr.count('unsupported password hash'), 2)
+        users = {user.email: user for user in get_user_model().objects.all()}
+        self.assertFalse(users['ann@example.com'].has_usable_password())
+        self.assertFalse(users['bob@example.com'].has_usable_password())
+        self.assertEqual(users['cat@example.com'].password, django_hash)
+
+    def test_fix_roles_revokes_tokens(self):
+        user = get_user_model().objects.create_user(username='nobody', password='x')
+        self.run_import([], '--fix-roles')
+        user.refresh_from_db()
+        self.assertEqual((user.is_patient, user.token_version), (True, 1))
+
+
+class PhoneVerificationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='patient', password='x', phone_number='+27820000002')
+        self.client.force_authenticate(self.user)
+
+    def send(self):
+        return self.client.post('/api/users/send_phone_code/')
+
+    def verify(self, code):
+        return self.client.post('/api/users/verify_phone/', {'code': code}, format='json')
+
+    def test_verifies_the_number(self):
+        self.assertEqual(self.send().data, {'status': 'sent'})
+        message = OutboundSMS.objects.get(to='+27820000002')
+        code = re.search(r'\d{%d}' % OTP_LENGTH, message.body).group()
+
+        self.assertEqual(self.verify('000000' if code != '000000' else '111111').status_code, 400)
+        self.assertEqual(self.verify(code).data, {'status': 'verified'})
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.phone_verified)
+        self.assertEqual(self.send().data, {'status': 'verified'})
+
+    def test_requires_a_number(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(phone_number='')
+        self.user.refresh_from_db()
+        self.assertEqual(self.send().status_code, 400)
+
+    def test_verify_without_a_pending_code_is_a_400(self):
+        self.assertEqual(self.verify('123456').status_code, 400)
+        self.assertEqual(self.client.post('/api/users/verify_phone/').status_code, 400)
+
+    def test_too_many_codes_for_the_number_is_a_429(self):
+        for _ in range(OTP_SENDS_PER_NUMBER):
+            self.assertEqual(self.send().status_code, 200)
+        self.assertEqual(self.send().status_code, 429)
+        self.assertEqual(OutboundSMS.objects.count(), OTP_SENDS_PER_NUMBER)
+
+
+class VerificationEmailTests(TestCase):
+    def setUp(self):
+        OutboundEmail.objects.all().delete()
+
+    def queued(self):
+        return OutboundEmail.objects.filter(subject=VERIFY_SUBJECT).order_by('pk')
+
+    def test_token_round_trip(self):
+        token = make_verification_token(42)
+        self.assertEqual(read_verification_token(token), 42)
+        with self.assertRaises(signing.BadSignature):
+            read_verification_token(token[:-1] + ('A' if token[-1] != 'A' else 'B'))
+        # Signed with another salt, e.g. a password reset token
+        with self.assertRaises(signing.BadSignature):
+            read_verification_token(signing.dumps(42))
+        with mock.patch('time.time', return_value=time.time() + VERIFY_MAX_AGE + 1):
+            with self.assertRaises(signing.SignatureExpired):
+                read_verification_token(token)
+
+    @override_settings(FRONTEND_URL='https://app.example.com')
+    def test_email_links_to_the_frontend(self):
+        self.assertEqual(queue_verification_emails([(42, 'ann@example.com', 'Ann')]), 1)
+        email = self.queued().get()
+        self.assertEqual(email.to, 'ann@example.com')
+        self.assertIn('Hi Ann,', email.body)
+
+        link = re.search(r'https://\S+', email.body).group()
+        url = urlparse(link)
+        self.assertEqual(f'{url.scheme}://{url.netloc}{url.path}', 'https://app.example.com/email-verification')
+        query = parse_qs(url.query)
+        self.assertEqual(query['type'], ['email_confirmation'])
+        self.assertEqual(read_verification_token(query['token'][0]), 42)
+
+    def test_emails_are_queued_in_chunks(self):
+        rows = ((pk, f'user{pk}@example.com', '') for pk in range(1, 6))
+        with self.assertNumQueries(3):
+            self.assertEqual(queue_verification_emails(rows, chunk_size=2), 5)
+        self.assertEqual([email.to for email in self.queued()], [f'user{pk}@example.com' for pk in range(1, 6)])
+        self.assertIn('Hi there,', self.queued().first().body)
+
+    def test_link_verifies_the_user(self):
+        user = get_user_model().objects.create_user(username='ann', email='ann@example.com', password='x')
+        token = make_verification_token(user.pk)
+        response = self.client.post('/api/users/verify_email/', {'token': token}, content_type='application/json')
+        self.assertEqual(response.json(), {'status': 'verified', 'role': 'patient'})
+        user.refresh_from_db()
+        self.assertTrue(user.email_verified)
+
+
+class ResendVerificationActionTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        self.users = [
+            User.objects.create_user(username='unverified', email='unverified@example.com', password='x'),
+            User.objects.create_user(username='verified', email='verified@example.com', password='x', email_verified=True),
+            User.objects.create_user(username='inactive', email='inactive@example.com', password='x', is_active=False),
+            User.objects.create_user(username='no-email', password='x'),
+        ]
+        OutboundEmail.objects.all().delete()
+        self.client.force_login(self.admin)
+
+    def test_queues_emails_for_unverified_users(self):
+        response = self.client.post(reverse('admin:users_user_changelist'), {
+            'action': 'resend_verification_emails',
+            '_selected_action': [user.pk for user in self.users],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)], ['Queued 1 verification email(s).'])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.to, email.subject), ('unverified@example.com', VERIFY_SUBJECT))
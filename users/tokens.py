@@ -0,0 +1,135 @@
+"""
+JWTs carrying the user's role claims and token version.
+
+Access tokens embed is_doctor/is_patient/is_staff/is_superuser and the
+doctor profile id, so read endpoints can authenticate without loading the
+user (see users.authentication). The `ver` claim ties a token to
+User.token_version; bumping the version revokes every token issued before.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from doctors.models import Doctor
+
+VERSION_CLAIM = 'ver'
+ROLE_CLAIMS = ('is_doctor', 'is_patient', 'is_staff', 'is_superuser', 'doctor_id')
+
+VERSION_KEY = 'token_version:{}'
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+def role_claims(user):
+    return {
+        'is_doctor': user.is_doctor,
+        'is_patient': user.is_patient,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'doctor_id': Doctor.objects.filter(user_id=user.pk).values_list('pk', flat=True).first() if user.is_doctor else None,
+        VERSION_CLAIM: user.token_version,
+    }
+
+
+def get_token_version(user_id):
+    """
+    Current token version for `user_id`, or None if the user is gone or inactive.
+    Served from the cache when it is shared; the database is only read on a
+    miss. A per-process cache would keep accepting revoked tokens in every
+    worker but the one that revoked them, so without one it reads the database.
+    """
+    if not settings.CACHE_SHARED:
+        return read_token_version(user_id)
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = read_token_version(user_id)
+        cache.set(key, -1 if version is None else version, VERSION_TIMEOUT)
+    return None if version is None or version < 0 else version
+
+
+def read_token_version(user_id):
+    return get_user_model().objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+
+
+def forget_token_versions(*user_ids):
+    if settings.CACHE_SHARED:
+        transaction.on_commit(lambda: cache.delete_many([VERSION_KEY.format(user_id) for user_id in user_ids]))
+
+
+def revoke_tokens(*user_ids):
+    """
+    Invalidate every token issued so far to `user_ids`.
+    """
+    get_user_model().objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+    forget_token_versions(*user_ids)
+
+
+def is_current(token):
+    """
+    False if the token's version no longer matches its user's. Tokens issued
+    before versioning carry no claim and are accepted until they expire.
+    """
+    if VERSION_CLAIM not in token:
+        return True
+    return token[VERSION_CLAIM] == get_token_version(token[api_settings.USER_ID_CLAIM])
+
+
+class RoleRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in role_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class StreamTicket(AccessToken):
+    """
+    Short-lived token for the notification stream, passed as ?ticket=
+    because EventSource can't send an Authorization header. Its own token
+    type, so it is not accepted as an access token (nor the reverse).
+    """
+    token_type = 'stream'
+    lifetime = timedelta(seconds=60)
+
+    @classmethod
+    def for_token(cls, access):
+        ticket = cls()
+        for claim in (api_settings.USER_ID_CLAIM, *ROLE_CLAIMS, VERSION_CLAIM):
+            if claim in access:
+                ticket[claim] = access[claim]
+        return ticket
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RoleRefreshToken
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses revoked refresh tokens and re-reads the role claims, so access
+    tokens pick up role changes at the next refresh.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if not is_current(refresh):
+            raise InvalidToken('Token has been revoked')
+        user = get_user_model().objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise InvalidToken('User not found')
+
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        for claim, value in role_claims(user).items():
+            access[claim] = value
+        data['access'] = str(access)
+        return data
@@ -5,9 +5,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.core import signing
+from telecommunications.otp import OTPError, check_code, send_code
+from .emails import queue_verification_emails, read_verification_token
 from .serializers import UserSerializer, PasswordChangeSerializer
+from .tokens import RoleRefreshToken
+from core.throttling import IPBucketThrottle
 
 User = get_user_model()
 
@@ -17,6 +20,17 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['email', 'username', 'first_name', 'last_name']
+    throttle_scopes = {
+        'create': 'register',
+        'resend_verification': 'verification',
+        'send_phone_code': 'phone_code',
+    }
+
+    def get_throttles(self):
+        # Signup and verification emails are limited per IP, whoever is calling
+        if self.action in ('create', 'resend_verification'):
+            return [IPBucketThrottle()]
+        return super().get_throttles()
 
     def get_permissions(self):
         if self.action in ['create', 'verify_email', 'resend_verification']:
@@ -36,11 +50,11 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Token required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            user_id = signing.loads(token, salt='email-verify', max_age=86400) # 24h
+            user_id = read_verification_token(token)
             user = User.objects.get(id=user_id)
             if not user.email_verified:
                 user.email_verified = True
-                user.save()
+                user.save(update_fields=['email_verified'])
             
             role = 'patient'
             if user.is_staff or user.is_superuser:
@@ -62,16 +76,38 @@ class UserViewSet(viewsets.ModelViewSet):
         if not email:
             return Response({'error': 'Email required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Queued for the email worker; the response is the same whether or not the user exists
+        unverified = User.objects.filter(email=email, email_verified=False, is_active=True)
+        queue_verification_emails(unverified.values_list('id', 'email', 'first_name')[:1])
+        return Response({'status': 'sent'})
+
+    @action(detail=False, methods=['post'])
+    def send_phone_code(self, request):
+        user = request.user
+        if not user.phone_number:
+            return Response({'error': 'Add a phone number first'}, status=status.HTTP_400_BAD_REQUEST)
+        if user.phone_verified:
+            return Response({'status': 'verified'})
         try:
-            user = User.objects.get(email=email)
-            token = signing.dumps(user.id, salt='email-verify')
-            link = f"http://localhost:3000/email-verification?type=email_confirmation&token={token}"
-            print(f"VERIFICATION LINK for {email}: {link}")
-            # TODO: Integrate real email sending here (e.g. SendGrid, AWS SES, or Django SMTP)
-            return Response({'status': 'sent'})
-        except User.DoesNotExist:
-             # Don't reveal if user exists
-             return Response({'status': 'sent'})
+            send_code(user.pk, user.phone_number)
+        except OTPError as e:
+            return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return Response({'status': 'sent'})
+
+    @action(detail=False, methods=['post'])
+    def verify_phone(self, request):
+        code = request.data.get('code')
+        if not code:
+            return Response({'error': 'Code required'}, status=status.HTTP_400_BAD_REQUEST)
+        user = request.user
+        try:
+            verified = check_code(user.pk, user.phone_number, code)
+        except OTPError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not verified:
+            return Response({'error': 'Invalid code'}, status=status.HTTP_400_BAD_REQUEST)
+        User.objects.filter(pk=user.pk).update(phone_verified=True)
+        return Response({'status': 'verified'})
 
     @action(detail=False, methods=['get'])
     def me(self, request):
@@ -101,7 +137,7 @@ class UserViewSet(viewsets.ModelViewSet):
         # if user_to_impersonate.is_superuser:
         #     return Response({"error": "Cannot impersonate a superuser"}, status=403)
             
-        refresh = RefreshToken.for_user(user_to_impersonate)
+        refresh = RoleRefreshToken.for_user(user_to_impersonate)
         
         return Response({
             "access": str(refresh.access_token),